@@ -38,6 +38,13 @@ ONE_DOWNLOAD = 99
 #			0 - no automatic install
 #			1 - automatic install after download from GitHub or SD/USB
 #
+#		/Settings/PackageManager/SetupScriptNice		CPU priority (nice value) for setup scripts run by PackageManager
+#		/Settings/PackageManager/SetupScriptIoClass		IO scheduling class for setup scripts (ionice -c)
+#			0 - no change, 1 - realtime, 2 - best effort, 3 - idle
+#		/Settings/PackageManager/SetupScriptIoLevel		IO priority within the class (ionice -n) 0 (highest) to 7 (lowest)
+#		/Settings/PackageManager/SetupScriptTimeout		seconds a setup script may run before it is terminated
+#			0 - no timeout (default)
+#
 # Additional (volatile) parameters linking packageManager and the GUI are provided in a separate dbus service:
 #
 #	com.victronenergy.packageManager parameters
@@ -84,6 +91,11 @@ ONE_DOWNLOAD = 99
 #			'gitHubScan' - trigger GitHub version update
 #						sent when entering the package edit menu or when changing packages within that menu
 #						also used to trigger a Git Hub version refresh of all packages when entering the Active packages menu
+#			'cancel' - terminate the setup script currently running for the package
+#						or skip the package's install/uninstall if it has not started yet
+#			'profile:<seconds>' - profile all threads for <seconds> (default 30)
+#			'heapsnap' - write a heap snapshot report ('heapsnap:stop' stops heap tracing)
+#						reports are written to /data/log/PackageManager
 #
 #		the GUI must wait for PackageManager to signal completion of one operation before initiating another
 #
@@ -155,6 +167,14 @@ EXIT_ERROR =				255 # generic error
 #
 #			the GUI can respond by setting /GuiEditAction to 'reboot' or 'restartGui'
 #
+#		/Scheduler/<task>/NextDue	time (seconds since the epoch) the task runs next - for debugging
+#
+#		/Perf/MainLoop/<phase>/P50, /P95, /Max	recent mainLoop phase durations in milliseconds
+#		/Perf/MainLoop/Count		number of mainLoop runs
+#			phases: DeferredAck, PackageCheck, Aggregation, StatusUpdate, LockWait and Total
+#
+#		/Stats/...	download, setup script, GitHub fetch and work queue counters (see StatsClass)
+#
 # /Settings/PackageVersion/Edit/ is a section for the GUI to provide information about the a new package to be added
 #
 # /data/SetupHelper/defaultPackageList provides an initial list of packages
@@ -207,6 +227,8 @@ EXIT_ERROR =				255 # generic error
 #		it then sets /etc/venus/REINSTALL_PACKAGES
 # 	PackageManager tests this flag and if set, will reinstall all packages
 #		even if automatic installs are disabled.
+#	All packages are checked at once and the installs are run back to back
+#		followed by a single GUI restart or system reboot if any are needed
 #
 # Manual downloads and installs triggered from the GUI ignore version checks completely
 #
@@ -321,12 +343,36 @@ EXIT_ERROR =				255 # generic error
 #		A menu item with the same function as INITIALIZE_PACKAGE_MANAGER is also provided
 #
 # classes/instances:
+#	JobJournalClass
+#		JobJournal
+#
+#	ScriptCheckCacheClass
+#		ScriptCheckCache
+#
+#	SchedulerClass
+#		Scheduler
+#
+#	MainLoopPerfClass
+#		MainLoopPerf
+#
+#	ProfilerClass
+#		Profiler
+#
+#	StatsClass
+#		Stats
+#
 #	AddRemoveClass
 #		AddRemove runs as a separate thread
 #
+#	BatchContextClass
+#		one per DbusIf batch (BeginBatch / EndBatch)
+#
 #	DbusIfClass
 #		DbusIf
 #
+#	PackageSettingsClass
+#		PackageSettings
+#
 #	PackageClass
 #		PackageList [] one per package
 #
@@ -347,6 +393,7 @@ EXIT_ERROR =				255 # generic error
 #	VersionToNumber ()
 #	LocatePackagePath ()
 #	AutoRebootCheck ()
+#	GetFromQueue ()
 
 import platform
 import argparse
@@ -370,11 +417,23 @@ import time
 import re
 import glob
 import queue
+import hashlib
+import heapq
+import random
+import collections
+import resource
+import io
+import cProfile
+import pstats
+import tracemalloc
 from gi.repository import GLib
+from gi.repository import Gio
 # add the path to our own packages for import
-sys.path.insert(1, "/data/SetupHelper/velib_python")
-from vedbus import VeDbusService
+#	velib_python is next to this file (/data/SetupHelper on the GX device)
+sys.path.insert(1, os.path.join (os.path.dirname (os.path.abspath (__file__)), "velib_python"))
+from vedbus import VeDbusService, ServiceContext
 from settingsdevice import SettingsDevice
+from ve_utils import wrap_dbus_value, unwrap_dbus_value
 
 
 global DownloadGitHub
@@ -382,9 +441,22 @@ global InstallPackages
 global AddRemove
 global MediaScan
 global DbusIf
+global PackageSettings
+global JobJournal
+global ScriptCheckCache
+global Scheduler
+global MainLoopPerf
+global Profiler
+global Stats
 global Platform
 global VenusVersion
 global VenusVersionNumber
+global DataRoot
+global EtcVenusRoot
+global MediaRoot
+global VarRunRoot
+global OptVictronRoot
+global SystemRoot
 global SystemReboot	# initialized/used in main, set in mainloop
 global GuiRestart	# initialized in main, set in PushAction and InstallPackage, used in mainloop
 global WaitForGitHubVersions # initialized in main, set in UpdateGitHubVersion used in mainLoop 
@@ -467,17 +539,103 @@ def VersionToNumber (version):
 	return versionNumber
 
 
-# get venus version
-versionFile = "/opt/victronenergy/version"
-try:
-	file = open (versionFile, 'r')
-except:
-	VenusVersion = ""
-	VenusVersionNumber = 0
-else:
-	VenusVersion = file.readline().strip()
-	VenusVersionNumber = VersionToNumber (VenusVersion)
-	file.close()
+#	filesystem roots
+#
+# the Venus OS directories used by PackageManager can be relocated
+#	e.g., to run against a synthetic package tree or to run several instances side by side
+#
+#	PACKAGE_MANAGER_ROOT=<dir> (environment) or --root <dir> (command line)
+#		moves all of them below <dir> (<dir>/data, <dir>/etc/venus, ...)
+#	PACKAGE_MANAGER_ROOTS=<name>=<path>,... (environment) or --root-path <name>=<path> (command line)
+#		moves individual ones - the names are the keys of DEFAULT_FILE_ROOTS
+#	command line options override the environment
+#
+# 'system' is the prefix for the (absolute) replacement file paths in package file lists
+#
+# SetFileRoots is called from main before anything is read
+#	code must use the ...Root globals rather than literal paths
+
+DEFAULT_FILE_ROOTS = { 'data': "/data", 'etcVenus': "/etc/venus", 'media': "/media",
+						'varRun': "/var/run", 'optVictron': "/opt/victronenergy", 'system': "/" }
+
+DataRoot = DEFAULT_FILE_ROOTS['data']
+EtcVenusRoot = DEFAULT_FILE_ROOTS['etcVenus']
+MediaRoot = DEFAULT_FILE_ROOTS['media']
+VarRunRoot = DEFAULT_FILE_ROOTS['varRun']
+OptVictronRoot = DEFAULT_FILE_ROOTS['optVictron']
+SystemRoot = ""
+
+def SetFileRoots (root=None, paths={}):
+	global DataRoot
+	global EtcVenusRoot
+	global MediaRoot
+	global VarRunRoot
+	global OptVictronRoot
+	global SystemRoot
+
+	roots = {}
+	for name, path in DEFAULT_FILE_ROOTS.items ():
+		if root != None and root != "":
+			path = root + path
+		roots[name] = path
+	for name, path in paths.items ():
+		if name not in DEFAULT_FILE_ROOTS:
+			logging.error ("unknown filesystem root " + name + " - ignored")
+			continue
+		roots[name] = path
+	for name in roots:
+		roots[name] = os.path.abspath (roots[name])
+
+	DataRoot = roots['data']
+	EtcVenusRoot = roots['etcVenus']
+	MediaRoot = roots['media']
+	VarRunRoot = roots['varRun']
+	OptVictronRoot = roots['optVictron']
+	# prefix for absolute paths so "/" becomes ""
+	SystemRoot = roots['system'].rstrip ('/')
+
+	for name, path in roots.items ():
+		if path != DEFAULT_FILE_ROOTS[name]:
+			logging.warning ("filesystem root " + name + " is " + path)
+
+#	ParseFileRootPaths
+#
+# converts "<name>=<path>" strings (from the environment or command line) to a dictionary
+
+def ParseFileRootPaths (entries):
+	paths = {}
+	for entry in entries:
+		entry = entry.strip ()
+		if entry == "":
+			continue
+		name, separator, path = entry.partition ('=')
+		if separator == "" or path == "":
+			logging.error ("invalid filesystem root " + entry + " - ignored")
+			continue
+		paths[name.strip ()] = path.strip ()
+	return paths
+
+#	ReadVenusVersion
+#
+# get venus version - called from main after the filesystem roots are set
+
+def ReadVenusVersion ():
+	global VenusVersion
+	global VenusVersionNumber
+
+	versionFile = OptVictronRoot + "/version"
+	try:
+		file = open (versionFile, 'r')
+	except:
+		VenusVersion = ""
+		VenusVersionNumber = 0
+	else:
+		VenusVersion = file.readline().strip()
+		VenusVersionNumber = VersionToNumber (VenusVersion)
+		file.close()
+
+VenusVersion = ""
+VenusVersionNumber = 0
 
 #	PushAction
 #
@@ -502,7 +660,7 @@ else:
 #	packageName is the name of the package to receive the action
 #		for some actions this may be the null string
 #
-# the command and source are pushed on the queue as a tuple
+# the command, source, job journal id and time pushed are pushed on the queue as a tuple
 #
 # PushAction sets the ...Pending flag to prevent duplicate operations
 #	for a given package
@@ -585,10 +743,23 @@ def PushAction (command=None, source=None):
 		theQueue = UpdateGitHubVersion.GitHubVersionQueue
 		queueText = "GitHubVersion"
 
+	# cancel is handled here (not pushed on a queue) since the install queue is busy with the setup script
+	elif action == 'cancel':
+		canceled = InstallPackages.CancelSetup (packageName)
+		if source == 'GUI':
+			if canceled:
+				DbusIf.UpdateStatus ( message="canceling " + packageName, where='Editor' )
+				DbusIf.AcknowledgeGuiEditAction ( '', defer=True )
+			else:
+				DbusIf.UpdateStatus ( message="nothing to cancel for " + packageName, where='Editor' )
+				DbusIf.AcknowledgeGuiEditAction ( 'ERROR', defer=True )
+		return canceled
+
 	# the remaining actions are handled here (not pushed on a queue)
 	elif action == 'reboot':
 		global SystemReboot
 		SystemReboot = True
+		WakeMainLoop ()
 		logging.info ( "received Reboot request from " + source)
 		if source == 'GUI':
 			DbusIf.UpdateStatus ( message=action  + " pending " + packageName, where='Editor' )
@@ -598,6 +769,7 @@ def PushAction (command=None, source=None):
 		# set the flag - reboot is done in main_loop
 		global GuiRestart
 		GuiRestart = True
+		WakeMainLoop ()
 		logging.info ( "received GUI restart request from " + source)
 		if source == 'GUI':
 			DbusIf.UpdateStatus ( "GUI restart pending " + packageName, where='Editor' )
@@ -606,6 +778,7 @@ def PushAction (command=None, source=None):
 		# set the flag - Initialize will quit the main loop, then work is done in main
 		global InitializePackageManager
 		InitializePackageManager = True
+		WakeMainLoop ()
 		logging.info ( "received PackageManager INITIALIZE request from " + source)
 		if source == 'GUI':
 			DbusIf.UpdateStatus ( "PackageManager INITIALIZE pending " + packageName, where='Editor' )
@@ -614,10 +787,39 @@ def PushAction (command=None, source=None):
 		# set the flag - Initialize will quit the main loop, then work is done in main
 		global RestartPackageManager
 		RestartPackageManager = True
+		WakeMainLoop ()
 		logging.info ( "received PackageManager RESTART request from " + source)
 		if source == 'GUI':
 			DbusIf.UpdateStatus ( "PackageManager restart pending " + packageName, where='Editor' )
 		return True
+	# diagnostics - see ProfilerClass
+	elif action == 'profile':
+		try:
+			seconds = int (packageName) if packageName != "" else PROFILE_DEFAULT_TIME
+		except ValueError:
+			seconds = 0
+		if seconds <= 0:
+			started = False
+			message = "invalid profile time '" + packageName + "'"
+		elif Profiler.Start (seconds):
+			started = True
+			message = "profiling for " + str (min (seconds, PROFILE_MAX_TIME)) + " seconds"
+		else:
+			started = False
+			message = "profile already in progress"
+		logging.info ( "received profile request from " + source + ": " + message)
+		if source == 'GUI':
+			DbusIf.UpdateStatus ( message, where='Editor' )
+			DbusIf.AcknowledgeGuiEditAction ( '' if started else 'ERROR', defer=True )
+		return started
+	elif action == 'heapsnap':
+		stop = packageName == 'stop'
+		# snapshots can take a while - not done in the dbus handler
+		Scheduler.RunOnce ('heapSnapshot', 0, lambda: Profiler.HeapSnapshot (stop=stop))
+		logging.info ( "received heap snapshot request from " + source)
+		if source == 'GUI':
+			DbusIf.AcknowledgeGuiEditAction ( '', defer=True )
+		return True
 
 	else:
 		if source == 'GUI':
@@ -627,14 +829,24 @@ def PushAction (command=None, source=None):
 		return False
 
 	if theQueue != None:
+		# record the job in the journal so it can be replayed if PackageManager exits before it finishes
+		#	GitHub version refreshes are not journaled - they are repeated in the background anyway
+		if theQueue != UpdateGitHubVersion.GitHubVersionQueue:
+			jobId = JobJournal.Enqueue (command, source)
+		else:
+			jobId = None
 		try:
-			theQueue.put ( (command, source), block=False )
+			theQueue.put ( (command, source, jobId, time.monotonic ()), block=False )
+			Stats.Pushed (theQueue)
 			return True
 		except queue.Full:
 			logging.error ("command " + command + " from " + source + " lost - " + queueText + " - queue full")
+			JobJournal.Finish (jobId)
+			Stats.Dropped (theQueue)
 			return False
 		except:
 			logging.error ("command " + command + " from " + source + " lost - " + queueText + " - other queue error")
+			JobJournal.Finish (jobId)
 			return False
 	else:
 		return False
@@ -678,6 +890,1078 @@ def LocatePackagePath (origPath):
 	return None
 
 
+#	JobJournalClass
+#	Instances:
+#		JobJournal
+#	Methods:
+#		RepairPackageSwaps (class method)
+#		Enqueue
+#		Start
+#		Finish
+#		Replay
+#
+# commands pushed onto the download, install and add/remove queues only exist in memory
+#	so they are lost if PackageManager exits before they are processed
+#	(lock timeouts, INITIALIZE, RESTART_PM, SIGTERM)
+#
+# the journal is an append-only file that records each job as it moves through its queue:
+#	<jobId> ENQUEUE <command> <source>
+#	<jobId> START
+#	<jobId> FINISH
+#
+# each entry is written to flash before the call returns so the journal survives a crash
+# when no jobs are outstanding the journal is truncated to keep it small
+#
+# jobs that were enqueued but not finished when PackageManager exited are pushed again
+#	in their original order when Replay () is called from main
+#	they are replayed with source 'AUTO' since the GUI is no longer waiting for them
+#
+# the journal has it's own lock so it can be called with or without the package list LOCKED
+
+# relative to DataRoot
+JOB_JOURNAL_FILE = "setupOptions/SetupHelper/jobJournal"
+
+class JobJournalClass:
+
+	def __init__(self, journalFile=None):
+		if journalFile == None:
+			journalFile = DataRoot + "/" + JOB_JOURNAL_FILE
+		self.journalFile = journalFile
+		self.lock = threading.Lock ()
+		self.nextJobId = 1
+		# jobs enqueued but not finished - jobId: (command, source)
+		self.outstandingJobs = {}
+		# unfinished jobs from the previous run, in the order they were enqueued
+		self.replayJobs = []
+
+		# read the journal left behind by the previous run
+		try:
+			with open (self.journalFile, 'r') as fd:
+				for line in fd:
+					parts = line.split ()
+					if len (parts) < 2:
+						continue
+					try:
+						jobId = int (parts[0])
+					except:
+						continue
+					event = parts[1]
+					if event == 'ENQUEUE' and len (parts) >= 4:
+						self.outstandingJobs[jobId] = ( parts[2], parts[3] )
+					elif event == 'FINISH':
+						self.outstandingJobs.pop (jobId, None)
+					if jobId >= self.nextJobId:
+						self.nextJobId = jobId + 1
+		except FileNotFoundError:
+			pass
+		except:
+			logging.error ("could not read job journal " + self.journalFile)
+
+		for jobId in sorted (self.outstandingJobs.keys ()):
+			self.replayJobs.append ( ( jobId, ) + self.outstandingJobs[jobId] )
+		if len (self.replayJobs) == 0:
+			self.truncate ()
+
+
+	#	writeEntry (internal use only)
+	#
+	# appends one line to the journal and forces it to flash
+	# must be called with the journal lock held
+
+	def writeEntry (self, line):
+		try:
+			journalDir = os.path.dirname (self.journalFile)
+			if not os.path.isdir (journalDir):
+				os.makedirs (journalDir)
+			with open (self.journalFile, 'a') as fd:
+				fd.write (line + '\n')
+				fd.flush ()
+				os.fsync (fd.fileno ())
+		except:
+			logging.error ("could not write job journal entry: " + line)
+
+	def truncate (self):
+		try:
+			if os.path.exists (self.journalFile):
+				open (self.journalFile, 'w').close ()
+		except:
+			logging.error ("could not truncate job journal " + self.journalFile)
+
+
+	#	Enqueue
+	#
+	# records a new job and returns it's jobId
+	# the jobId travels with the command on the queue so that
+	#	the processing thread can report Start and Finish
+
+	def Enqueue (self, command, source):
+		self.lock.acquire ()
+		jobId = self.nextJobId
+		self.nextJobId += 1
+		self.outstandingJobs[jobId] = ( command, source )
+		self.writeEntry ( str (jobId) + " ENQUEUE " + command + " " + str (source) )
+		self.lock.release ()
+		return jobId
+
+	def Start (self, jobId):
+		if jobId == None:
+			return
+		self.lock.acquire ()
+		self.writeEntry ( str (jobId) + " START" )
+		self.lock.release ()
+
+	# Finish is also used for jobs that are discarded so they are not replayed
+	def Finish (self, jobId):
+		if jobId == None:
+			return
+		self.lock.acquire ()
+		self.outstandingJobs.pop (jobId, None)
+		if len (self.outstandingJobs) == 0:
+			self.truncate ()
+		else:
+			self.writeEntry ( str (jobId) + " FINISH" )
+		self.lock.release ()
+
+
+	#	Replay
+	#
+	# pushes unfinished jobs from the previous run onto their queues again
+	# the old job is marked finished only after the new one has been journaled
+	#	so a crash during replay does not lose it
+	#
+	# duplicate commands are only pushed once
+	#
+	# must be called after the package list and all queues have been created
+	#	and NOT with the package list LOCKED
+
+	def Replay (self):
+		if len (self.replayJobs) == 0:
+			return
+		logging.warning ("replaying " + str (len (self.replayJobs)) + " unfinished jobs from job journal")
+		replayedCommands = []
+		for ( jobId, command, source ) in self.replayJobs:
+			if command not in replayedCommands:
+				logging.info ("replaying " + command + " (from " + source + ")")
+				PushAction ( command=command, source='AUTO' )
+				replayedCommands.append (command)
+			self.Finish (jobId)
+		self.replayJobs = []
+
+
+	#	RepairPackageSwaps
+	#
+	# downloads and media transfers replace a package directory by:
+	#	renaming /data/<packageName> to /data/<packageName>-temp
+	#	moving the new package to /data/<packageName>
+	#	removing /data/<packageName>-temp
+	#
+	# if PackageManager exits part way through, the -temp directory is left behind:
+	#	if /data/<packageName> is missing, the swap did not complete and the original is restored
+	#	otherwise the new package is in place and the old copy is removed
+	#
+	# the download work area /data/PmDownloadTemp is also removed
+	#
+	# called from main before the package list is built
+
+	@classmethod
+	def RepairPackageSwaps (cls):
+		try:
+			directories = os.listdir (DataRoot)
+		except:
+			return
+		for directory in directories:
+			if not directory.endswith ("-temp"):
+				continue
+			tempPackagePath = DataRoot + "/" + directory
+			if not os.path.isdir (tempPackagePath):
+				continue
+			packageName = directory[:-len ("-temp")]
+			packagePath = DataRoot + "/" + packageName
+			if not PackageClass.PackageNameValid (packageName):
+				continue
+			try:
+				if os.path.exists (packagePath):
+					logging.warning ("removing " + tempPackagePath + " left by an interrupted package update")
+					shutil.rmtree (tempPackagePath, ignore_errors=True)
+				else:
+					logging.warning ("restoring " + packageName + " from " + tempPackagePath + " after an interrupted package update")
+					os.rename (tempPackagePath, packagePath)
+			except:
+				logging.error ("could not repair interrupted package update for " + packageName)
+
+		downloadTempDirectory = DataRoot + "/PmDownloadTemp"
+		if os.path.exists (downloadTempDirectory):
+			shutil.rmtree (downloadTempDirectory, ignore_errors=True)
+# end JobJournalClass
+
+
+#	ScriptCheckCacheClass
+#	Instances:
+#		ScriptCheckCache
+#	Methods:
+#		Lookup
+#		Store
+#
+# the setup script 'check' action is a full run of the setup script
+#	it is requested for every package each time PackageManager starts
+#	and again when any .package file related to the package changes
+#
+# the result of a check only depends on the check inputs:
+#	package version, installed version, Venus OS version, platform,
+#	the .package files of the package's active files and the patch sources
+#	(see PackageClass.ScriptCheckKey)
+#
+# the result of the last check is saved for each package along with a key (digest) of those inputs
+#	so that a check whose inputs have not changed can be skipped - even across restarts
+#	and the previous result is used instead
+#
+# results that depend on other conditions (e.g., free space) are not saved
+#
+# the message reported by a failed check is saved with it's return code
+#	so the same status can be shown when the check is skipped
+#
+# the cache file contains one line per package: <packageName> <key> <returnCode> <message>
+
+# relative to DataRoot
+SCRIPT_CHECK_CACHE_FILE = "setupOptions/SetupHelper/scriptCheckCache"
+
+class ScriptCheckCacheClass:
+
+	def __init__(self, cacheFile=None):
+		if cacheFile == None:
+			cacheFile = DataRoot + "/" + SCRIPT_CHECK_CACHE_FILE
+		self.cacheFile = cacheFile
+		self.lock = threading.Lock ()
+		# packageName: ( key, returnCode, message )
+		self.results = {}
+		try:
+			with open (self.cacheFile, 'r') as fd:
+				for line in fd:
+					parts = line.split (None, 3)
+					if len (parts) < 3:
+						continue
+					if len (parts) > 3:
+						message = parts[3].strip ()
+					else:
+						message = ""
+					try:
+						self.results[parts[0]] = ( parts[1], int (parts[2]), message )
+					except:
+						continue
+		except FileNotFoundError:
+			pass
+		except:
+			logging.error ("could not read script check cache " + self.cacheFile)
+
+	# return codes that are a result of the check inputs only
+	cacheableResults = [ EXIT_SUCCESS, EXIT_INCOMPATIBLE_VERSION, EXIT_INCOMPATIBLE_PLATFORM, EXIT_FILE_SET_ERROR,
+							EXIT_OPTIONS_NOT_SET, EXIT_NO_GUI_V1, EXIT_PACKAGE_CONFLICT, EXIT_PATCH_ERROR ]
+
+	#	Lookup
+	#
+	# returns ( returnCode, message ) of the previous check if it was made with the same key
+	#	otherwise returns None and a check must be run
+
+	def Lookup (self, packageName, key):
+		self.lock.acquire ()
+		result = self.results.get (packageName)
+		self.lock.release ()
+		if result == None or result[0] != key:
+			return None
+		return ( result[1], result[2] )
+
+	#	Store
+	#
+	# saves the result of a check and rewrites the cache file
+	#	results that can't be reused are removed from the cache
+
+	def Store (self, packageName, key, returnCode, message=""):
+		self.lock.acquire ()
+		if returnCode in self.cacheableResults:
+			# the message must fit on the package's line
+			self.results[packageName] = ( key, returnCode, " ".join (message.split ()) )
+		else:
+			self.results.pop (packageName, None)
+		try:
+			cacheDir = os.path.dirname (self.cacheFile)
+			if not os.path.isdir (cacheDir):
+				os.makedirs (cacheDir)
+			tempFile = self.cacheFile + ".new"
+			with open (tempFile, 'w') as fd:
+				for name, ( key, returnCode, message ) in self.results.items ():
+					fd.write ((name + " " + key + " " + str (returnCode) + " " + message).strip () + "\n")
+			os.replace (tempFile, self.cacheFile)
+		except:
+			logging.error ("could not write script check cache " + self.cacheFile)
+		self.lock.release ()
+# end ScriptCheckCacheClass
+
+
+#	SchedulerClass
+#	Instances:
+#		Scheduler
+#	Methods:
+#		AddTask
+#		RunOnce
+#		Reschedule
+#		RunBy
+#		Cancel
+#		NextDueTimes
+#		armTimer
+#		runDueTasks (GLib callback)
+#
+# all periodic work in PackageManager is driven from here
+#	so there is only one wakeup (a GLib timeout) for all of it:
+#		mainLoop
+#		paced thread work: AddRemove, MediaScan and UpdateGitHubVersion
+#			threads block on their queues and the scheduler posts a 'TICK' when it's time to run
+#		RTC save and GitHub version expiry
+#		delayed status clears
+#
+# tasks run in the GLib thread so callbacks must not take significant time
+#
+# each task has:
+#	a name (also used to publish /Scheduler/<name>/NextDue on dbus for debugging)
+#		tasks whose due time changed are published together after the scheduler runs
+#		so frequent RunBy / Reschedule calls don't each write to dbus
+#	an interval (None for a task that runs once)
+#	a callback which returns:
+#		None to run again after the interval (or remove a run once task)
+#		a number of seconds until the next run
+#		False to remove the task
+#	a jitter: a random 0 to jitter seconds is added to each interval
+#		so periodic work doesn't line up with other services
+#
+# tasks due within SCHEDULER_SLACK seconds of the one that woke the scheduler
+#	are run at the same time (coalesced) to reduce the number of wakeups
+#
+# the token passed to runDueTasks identifies the current timeout
+#	so a timeout that was replaced while it was being dispatched is ignored
+#
+# methods other than runDueTasks may be called from any thread
+#	(GLib timeout_add and source_remove are thread safe)
+#
+# due times use the monotonic clock so tasks keep running if the system time is changed
+#	(e.g., by NTP, the RTC restore at boot or the user)
+#	they are converted to wall clock time only for NextDueTimes
+
+SCHEDULER_SLACK = 0.5
+
+class SchedulerClass:
+
+	def __init__(self):
+		self.lock = threading.RLock ()
+		# name: { 'due', 'interval', 'callback', 'jitter', 'running', 'wakeBy' }
+		self.tasks = {}
+		self.sourceId = None
+		self.timerDue = 0
+		self.token = 0
+		# names of tasks whose NextDue needs to be published
+		self.dueChanged = set ()
+		# path: value last published
+		self.publishedDueTimes = {}
+
+	#	AddTask
+	#
+	# adds (or replaces) a task
+	#	delay is the time until the first run (the interval if not specified)
+
+	def AddTask (self, name, interval, callback, delay=None, jitter=0.0):
+		if delay == None:
+			delay = interval
+		with self.lock:
+			self.tasks[name] = { 'due': time.monotonic () + delay, 'interval': interval, 'callback': callback,
+									'jitter': jitter, 'running': False, 'wakeBy': None }
+			self.dueChanged.add (name)
+			self.armTimer ()
+
+	#	RunOnce
+	#
+	# runs callback once after delay
+	#	a pending run with the same name is replaced
+
+	def RunOnce (self, name, delay, callback):
+		self.AddTask (name, None, callback, delay=delay)
+
+	#	Reschedule
+	#
+	# sets the next run of an existing task to delay seconds from now
+
+	def Reschedule (self, name, delay):
+		with self.lock:
+			task = self.tasks.get (name)
+			if task == None:
+				return
+			if task['running']:
+				task['wakeBy'] = time.monotonic () + delay
+			else:
+				task['due'] = time.monotonic () + delay
+				self.dueChanged.add (name)
+				self.armTimer ()
+
+	#	RunBy
+	#
+	# makes sure an existing task runs within delay seconds
+	#	if it is already due sooner, nothing changes
+
+	def RunBy (self, name, delay):
+		dueTime = time.monotonic () + delay
+		with self.lock:
+			task = self.tasks.get (name)
+			if task == None:
+				return
+			# called from within the callback - the next run is set when the callback returns
+			if task['running']:
+				if task['wakeBy'] == None or dueTime < task['wakeBy']:
+					task['wakeBy'] = dueTime
+				return
+			if task['due'] <= dueTime:
+				return
+			task['due'] = dueTime
+			self.dueChanged.add (name)
+			self.armTimer ()
+
+	#	Cancel
+	#
+	# removes a task if it exists
+
+	def Cancel (self, name):
+		with self.lock:
+			if self.tasks.pop (name, None) != None:
+				self.dueChanged.add (name)
+				self.armTimer ()
+
+	#	NextDueTimes
+	#
+	# returns a dictionary of task name: next due time (seconds since the epoch)
+	#	a task that is running has no due time (None)
+
+	def NextDueTimes (self):
+		wallClockOffset = time.time () - time.monotonic ()
+		with self.lock:
+			dueTimes = {}
+			for name, task in self.tasks.items ():
+				if task['running']:
+					dueTimes[name] = None
+				else:
+					dueTimes[name] = task['due'] + wallClockOffset
+		return dueTimes
+
+	#	publishDueTimes
+	#
+	# updates /Scheduler/<name>/NextDue on dbus (0 if the task is not scheduled)
+	#	for the tasks in names whose due time (in whole seconds) has changed since last published
+	#	the path is created the first time the task is seen
+	#
+	# called from runDueTasks (GLib thread)
+
+	def publishDueTimes (self, names):
+		dueTimes = self.NextDueTimes ()
+		for name in names:
+			dueTime = dueTimes.get (name)
+			if dueTime == None:
+				dueTime = 0
+			path = "/Scheduler/" + name + "/NextDue"
+			value = int (dueTime)
+			if self.publishedDueTimes.get (path) == value:
+				continue
+			try:
+				if path not in self.publishedDueTimes:
+					DbusIf.DbusService.add_path (path, value)
+				else:
+					DbusIf.DbusService[path] = value
+				self.publishedDueTimes[path] = value
+			except:
+				pass
+
+	#	armTimer
+	#
+	# sets the GLib timeout for the earliest task
+	#	the timeout is only replaced if it needs to fire earlier or later than it is set for
+	#
+	# must be called with the lock held
+
+	def armTimer (self):
+		dueTimes = [ task['due'] for task in self.tasks.values () if not task['running'] ]
+		if len (dueTimes) == 0:
+			nextDue = None
+		else:
+			nextDue = min (dueTimes)
+		if self.sourceId != None:
+			if nextDue != None and nextDue == self.timerDue:
+				return
+			GLib.source_remove (self.sourceId)
+			self.sourceId = None
+		if nextDue == None:
+			return
+		self.token += 1
+		self.timerDue = nextDue
+		delay = max (0, nextDue - time.monotonic ())
+		self.sourceId = GLib.timeout_add (int (delay * 1000), self.runDueTasks, self.token)
+
+	#	runDueTasks
+	#
+	# GLib callback: runs all tasks that are due (plus those within SCHEDULER_SLACK)
+	#	then sets the timeout for the next task
+	# always returns False so the timeout is not repeated by GLib
+
+	def runDueTasks (self, token):
+		with self.lock:
+			if token != self.token:
+				return False
+			self.sourceId = None
+			currentTime = time.monotonic ()
+			dueTasks = []
+			for name, task in self.tasks.items ():
+				if not task['running'] and task['due'] <= currentTime + SCHEDULER_SLACK:
+					task['running'] = True
+					dueTasks.append ( ( name, task ) )
+
+		# callbacks run without the lock so they can change the schedule
+		#	a task removed or replaced while running is not rescheduled
+		for ( name, task ) in dueTasks:
+			try:
+				result = task['callback'] ()
+			except:
+				logging.exception ("scheduled task " + name + " failed")
+				result = None
+			with self.lock:
+				task['running'] = False
+				if result is False or ( result == None and task['interval'] == None ):
+					# remove the task unless it was replaced while running
+					if self.tasks.get (name) is task:
+						del self.tasks[name]
+				elif self.tasks.get (name) is task:
+					if result == None:
+						delay = task['interval']
+					else:
+						delay = result
+					if task['jitter'] > 0:
+						delay += random.uniform (0, task['jitter'])
+					task['due'] = time.monotonic () + delay
+					if task['wakeBy'] != None and task['wakeBy'] < task['due']:
+						task['due'] = task['wakeBy']
+				task['wakeBy'] = None
+
+		with self.lock:
+			self.armTimer ()
+			for ( name, task ) in dueTasks:
+				self.dueChanged.add (name)
+			dueChanged = self.dueChanged
+			self.dueChanged = set ()
+		self.publishDueTimes (dueChanged)
+		return False
+# end SchedulerClass
+
+
+#	MainLoopPerfClass
+#	Instances:
+#		MainLoopPerf
+#	Methods:
+#		Record
+#		Publish (Scheduler task)
+#
+# keeps the most recent PERF_SAMPLES durations for each mainLoop phase
+#	and publishes the median, 95th percentile and maximum of those samples on dbus:
+#		/Perf/MainLoop/<phase>/P50, /P95, /Max	(milliseconds)
+#		/Perf/MainLoop/Count	(number of mainLoop runs)
+#
+# phases:
+#	DeferredAck - sending a deferred GuiEditAction acknowledgement
+#	PackageCheck - checking dirty packages and pushing downloads/installs
+#	Aggregation - pending and action needed totals (section 2)
+#	StatusUpdate - updating the status shown in the GUI
+#	LockWait - time spent waiting for the package list lock within mainLoop
+#	Total - the whole mainLoop run
+#
+# Record is called from mainLoop so must be fast - percentiles are only computed by Publish
+#	and only if a sample has been recorded since the last publish
+# all calls are made from the GLib thread so no lock is needed
+
+PERF_SAMPLES = 500
+PERF_PUBLISH_INTERVAL = 10.0
+
+class MainLoopPerfClass:
+
+	phases = [ 'DeferredAck', 'PackageCheck', 'Aggregation', 'StatusUpdate', 'LockWait', 'Total' ]
+
+	def __init__(self):
+		self.samples = {}
+		for phase in self.phases:
+			self.samples[phase] = collections.deque (maxlen = PERF_SAMPLES)
+			for stat in [ 'P50', 'P95', 'Max' ]:
+				DbusIf.DbusService.add_path ( '/Perf/MainLoop/' + phase + '/' + stat, 0.0 )
+		self.runCount = 0
+		DbusIf.DbusService.add_path ( '/Perf/MainLoop/Count', 0 )
+		self.changed = False
+
+	#	Record
+	#
+	# saves one duration (seconds) for the phase
+
+	def Record (self, phase, duration):
+		self.samples[phase].append (duration)
+		if phase == 'Total':
+			self.runCount += 1
+		self.changed = True
+
+	#	Publish
+	#
+	# Scheduler task - updates the dbus values from the current samples
+	#	nothing is done if there are no new samples
+
+	def Publish (self):
+		if not self.changed:
+			return
+		self.changed = False
+		DbusIf.BeginBatch ()
+		try:
+			for phase in self.phases:
+				samples = sorted (self.samples[phase])
+				count = len (samples)
+				if count == 0:
+					continue
+				basePath = '/Perf/MainLoop/' + phase + '/'
+				DbusIf.SetServiceValue (basePath + 'P50', round (samples[count // 2] * 1000, 2))
+				DbusIf.SetServiceValue (basePath + 'P95', round (samples[min (count - 1, (count * 95) // 100)] * 1000, 2))
+				DbusIf.SetServiceValue (basePath + 'Max', round (samples[-1] * 1000, 2))
+			DbusIf.SetServiceValue ('/Perf/MainLoop/Count', self.runCount)
+		finally:
+			DbusIf.EndBatch ()
+# end MainLoopPerfClass
+
+
+#	ProfilerClass
+#	Instances:
+#		Profiler
+#	Methods:
+#		Start (GLib thread)
+#		ThreadUpdate (worker threads - called from GetFromQueue)
+#		HeapSnapshot (Scheduler task)
+#
+# on-demand diagnostics for a running PackageManager
+#	triggered by /GuiEditAction profile:<seconds> and heapsnap (see PushAction)
+#	or SIGUSR1 (profile for PROFILE_DEFAULT_TIME seconds)
+# reports are written to <DataRoot>/log/PackageManager so they are included in the log backup
+#	only the most recent REPORTS_KEPT reports of each kind are kept
+#
+# profile runs cProfile in the GLib thread and in each worker thread for the requested time
+#	cProfile only sees the thread it is enabled in so each worker thread enables and disables
+#	it's own profiler the next time it pulls from it's queue (GetFromQueue)
+#	PROFILER_WAKE is pushed onto the worker queues at the start and end of the profile
+#		so blocked threads see the change right away
+#	the report is written PROFILE_COLLECT_TIME after the profile ends
+#		threads still busy then are listed but not included
+# with Python 3.12 and later cProfile sees all threads and only one can be enabled at a time
+#	so only the GLib thread profiler is used and the report has one section for all threads
+#
+# heapsnap starts tracemalloc the first time (unless PYTHONTRACEMALLOC already started it)
+#	then reports the largest allocations by source line and the changes since the last snapshot
+#	heapsnap:stop stops tracing (tracing slows PackageManager and uses memory)
+
+PROFILE_DEFAULT_TIME = 30
+PROFILE_MAX_TIME = 600
+PROFILE_COLLECT_TIME = 5.0
+PROFILE_REPORT_LINES = 20
+HEAP_REPORT_LINES = 25
+REPORTS_KEPT = 10
+PROFILER_WAKE = ( 'PROFILE', 'local' )
+PROFILE_PROCESS_WIDE = sys.version_info >= (3, 12)
+
+class ProfilerClass:
+
+	def __init__(self):
+		self.lock = threading.Lock ()
+		# the worker thread's own profiler and the profile generation it belongs to
+		self.threadState = threading.local ()
+		self.generation = 0
+		self.active = False
+		self.collecting = False
+		self.startTime = 0
+		self.endTime = 0
+		self.glibProfile = None
+		# thread name: finished profile
+		self.profiles = {}
+		# thread name: reason the thread could not be profiled
+		self.profileErrors = {}
+		self.lastSnapshot = None
+
+	def workerThreads (self):
+		return [ UpdateGitHubVersion, DownloadGitHub, InstallPackages, AddRemove, MediaScan ]
+
+	def threadName (self, thread):
+		return type (thread).__name__.replace ("Class", "")
+
+	#	writeReport
+	#
+	# writes a report file and removes the oldest ones of the same kind
+	#	returns the file name or None if the report could not be written
+
+	def writeReport (self, kind, text):
+		reportDir = DataRoot + "/log/PackageManager"
+		reportFile = reportDir + "/" + kind + "-" + time.strftime ("%Y%m%d-%H%M%S") + ".txt"
+		try:
+			os.makedirs (reportDir, exist_ok=True)
+			with open (reportFile, 'w') as file:
+				file.write (text)
+			for oldReport in sorted (glob.glob (reportDir + "/" + kind + "-*.txt"))[:-REPORTS_KEPT]:
+				os.remove (oldReport)
+		except Exception as error:
+			logging.error ("could not write " + kind + " report " + reportFile + ": " + str (error))
+			return None
+		logging.warning (kind + " report written to " + reportFile)
+		return reportFile
+
+	def wakeThreads (self):
+		for thread in self.workerThreads ():
+			if isinstance (thread, UpdateGitHubVersionClass):
+				theQueue = thread.GitHubVersionQueue
+			elif isinstance (thread, DownloadGitHubPackagesClass):
+				theQueue = thread.DownloadQueue
+			elif isinstance (thread, InstallPackagesClass):
+				theQueue = thread.InstallQueue
+			elif isinstance (thread, AddRemoveClass):
+				theQueue = thread.AddRemoveQueue
+			else:
+				theQueue = thread.MediaQueue
+			try:
+				theQueue.put (PROFILER_WAKE, block=False)
+			except queue.Full:
+				pass	# thread is busy and will pull from the queue soon anyway
+
+	#	Start
+	#
+	# starts a profile of all threads for seconds
+	#	must be called from the GLib thread
+	#
+	# returns False if a profile is already in progress
+
+	def Start (self, seconds):
+		if self.active or self.collecting:
+			return False
+		seconds = min (max (1, seconds), PROFILE_MAX_TIME)
+		with self.lock:
+			self.generation += 1
+			self.active = True
+			self.profiles = {}
+			self.profileErrors = {}
+		self.startTime = time.time ()
+		self.glibProfile = cProfile.Profile ()
+		try:
+			self.glibProfile.enable ()
+		# Python 3.12 and later - another profiler (debugger, etc) is active
+		except ValueError as error:
+			self.profileErrors['GLib'] = str (error)
+			self.glibProfile = None
+		logging.warning ("profiling all threads for " + str (seconds) + " seconds")
+		if not PROFILE_PROCESS_WIDE:
+			self.wakeThreads ()
+		Scheduler.RunOnce ('profileEnd', seconds, self.finish)
+		return True
+
+	def finish (self):
+		if self.glibProfile != None:
+			self.glibProfile.disable ()
+			self.profiles['GLib'] = self.glibProfile
+			self.glibProfile = None
+		with self.lock:
+			self.active = False
+			self.collecting = True
+		self.endTime = time.time ()
+		if PROFILE_PROCESS_WIDE:
+			self.report ()
+			return
+		self.wakeThreads ()
+		Scheduler.RunOnce ('profileReport', PROFILE_COLLECT_TIME, self.report)
+
+	#	ThreadUpdate
+	#
+	# starts or stops the calling worker thread's profiler to match the profile in progress
+	#	a profile that finishes too late for the report is discarded
+
+	def ThreadUpdate (self):
+		if PROFILE_PROCESS_WIDE:
+			return
+		state = self.threadState
+		profile = getattr (state, 'profile', None)
+		with self.lock:
+			generation = self.generation
+			active = self.active
+		if profile == None:
+			if not active or getattr (state, 'generation', 0) == generation:
+				return
+			name = self.threadName (threading.current_thread ())
+			state.generation = generation
+			profile = cProfile.Profile ()
+			try:
+				profile.enable ()
+			except ValueError as error:
+				with self.lock:
+					self.profileErrors[name] = str (error)
+				return
+			state.profile = profile
+		elif not active or state.generation != generation:
+			profile.disable ()
+			state.profile = None
+			name = self.threadName (threading.current_thread ())
+			with self.lock:
+				if self.collecting and state.generation == self.generation:
+					self.profiles[name] = profile
+
+	def report (self):
+		with self.lock:
+			self.collecting = False
+			profiles = self.profiles
+			profileErrors = self.profileErrors
+			self.profiles = {}
+			self.profileErrors = {}
+		text = "PackageManager profile " + time.strftime ("%Y-%m-%d %H:%M:%S", time.localtime (self.startTime))\
+					+ " for %0.1f seconds\n" % ( self.endTime - self.startTime )
+		if PROFILE_PROCESS_WIDE:
+			names = [ 'GLib' ]
+		else:
+			names = [ 'GLib' ] + [ self.threadName (thread) for thread in self.workerThreads () ]
+		for name in names:
+			if PROFILE_PROCESS_WIDE:
+				text += "\n==== all threads (Python 3.12 and later profiles the whole process) ====\n"
+			else:
+				text += "\n==== " + name + " ====\n"
+			if name in profileErrors:
+				text += "not profiled: " + profileErrors[name] + "\n"
+				continue
+			elif name not in profiles:
+				text += "still busy - not included\n"
+				continue
+			stream = io.StringIO ()
+			try:
+				stats = pstats.Stats (profiles[name], stream=stream)
+				stats.strip_dirs ()
+				stats.sort_stats ('cumulative').print_stats (PROFILE_REPORT_LINES)
+				stats.sort_stats ('tottime').print_stats (PROFILE_REPORT_LINES)
+			except Exception as error:
+				stream.write ("no profile data: " + str (error) + "\n")
+			text += stream.getvalue ()
+		self.writeReport ('profile', text)
+
+	#	HeapSnapshot
+	#
+	# takes a tracemalloc snapshot and writes the report
+	#	or stops tracing if stop is True
+
+	def HeapSnapshot (self, stop=False):
+		if stop:
+			if tracemalloc.is_tracing ():
+				tracemalloc.stop ()
+				logging.warning ("heap tracing stopped")
+			self.lastSnapshot = None
+			return
+
+		text = "PackageManager heap snapshot " + time.strftime ("%Y-%m-%d %H:%M:%S") + "\n"
+		if not tracemalloc.is_tracing ():
+			tracemalloc.start ()
+			self.lastSnapshot = None
+			text += "tracing started now - only allocations made from now on are included\n"\
+					+ "\ttake another snapshot later to see what is growing\n"
+		snapshot = tracemalloc.take_snapshot ()
+		snapshot = snapshot.filter_traces ( ( tracemalloc.Filter (False, tracemalloc.__file__), ) )
+		( current, peak ) = tracemalloc.get_traced_memory ()
+		text += "traced memory %d KiB (peak %d KiB), max RSS %d KiB\n" \
+					% ( current // 1024, peak // 1024, resource.getrusage (resource.RUSAGE_SELF).ru_maxrss )
+
+		text += "\n==== largest allocations ====\n"
+		for stat in snapshot.statistics ('lineno')[:HEAP_REPORT_LINES]:
+			text += str (stat) + "\n"
+		if self.lastSnapshot != None:
+			text += "\n==== changes since last snapshot ====\n"
+			for stat in snapshot.compare_to (self.lastSnapshot, 'lineno')[:HEAP_REPORT_LINES]:
+				text += str (stat) + "\n"
+		self.lastSnapshot = snapshot
+		self.writeReport ('heapsnap', text)
+# end ProfilerClass
+
+
+#	StatsClass
+#	Instances:
+#		Stats
+#	Methods:
+#		Pushed, Dropped (PushAction)
+#		Pulled (GetFromQueue)
+#		DownloadStarted, DownloadDone (GitHubDownload)
+#		SetupDone (InstallPackage)
+#		GitHubFetch (updateGitHubVersion)
+#		Publish (Scheduler task)
+#
+# operational counters - published on dbus every STATS_PUBLISH_INTERVAL seconds if any have changed:
+#	/Stats/Downloads/Started, /Succeeded, /Failed, /Bytes	GitHub package downloads
+#	/Stats/Setup/<action>/<result>	setup script runs by action (Install, Uninstall, Check)
+#		result is the name in SETUP_RESULTS, Other for unlisted exit codes,
+#		Stopped if timed out or canceled or RunFailed if the script could not be run
+#		these paths are created when the first run with that result is counted
+#	/Stats/GitHub/Fetches, /Failures	GitHub version fetches
+#	/Stats/Queues/<queue>/Depth, /PeakDepth		jobs waiting now and the most ever waiting
+#	/Stats/Queues/<queue>/Dropped		jobs lost because the queue was full
+#	/Stats/Queues/<queue>/WaitP50, /WaitP95, /WaitMax
+#		time from PushAction to the worker thread pulling the job (milliseconds)
+#		for the last PERF_SAMPLES jobs
+#
+# jobs are the entries pushed by PushAction (the ones that include the time pushed)
+#	internal entries (scheduler TICKs, PROFILER_WAKE, STOP) are not counted
+# the time pushed is from the monotonic clock so waits are not affected by changes to the system time
+#
+# the counters are updated from all threads so access is protected by a lock
+#	only Publish (GLib thread) updates dbus
+
+STATS_PUBLISH_INTERVAL = 10.0
+
+SETUP_RESULTS = { EXIT_SUCCESS: 'Success', EXIT_REBOOT: 'Reboot', EXIT_RESTART_GUI: 'RestartGui',
+					EXIT_INCOMPATIBLE_VERSION: 'IncompatibleVersion', EXIT_INCOMPATIBLE_PLATFORM: 'IncompatiblePlatform',
+					EXIT_FILE_SET_ERROR: 'FileSetError', EXIT_OPTIONS_NOT_SET: 'OptionsNotSet',
+					EXIT_RUN_AGAIN: 'RunAgain', EXIT_ROOT_FULL: 'RootFull', EXIT_DATA_FULL: 'DataFull',
+					EXIT_NO_GUI_V1: 'NoGuiV1', EXIT_PACKAGE_CONFLICT: 'PackageConflict',
+					EXIT_PATCH_ERROR: 'PatchError', EXIT_ERROR: 'Error' }
+
+class StatsClass:
+
+	# queues is a dictionary of queue name: queue
+
+	def __init__(self, queues):
+		self.lock = threading.Lock ()
+		self.counters = {}
+		for path in [ '/Stats/Downloads/Started', '/Stats/Downloads/Succeeded', '/Stats/Downloads/Failed',
+						'/Stats/Downloads/Bytes', '/Stats/GitHub/Fetches', '/Stats/GitHub/Failures' ]:
+			self.counters[path] = 0
+		# queue: name
+		self.queueNames = {}
+		# name: queue statistics
+		self.queues = {}
+		for name, theQueue in queues.items ():
+			self.queueNames[theQueue] = name
+			self.queues[name] = { 'depth': 0, 'peak': 0, 'dropped': 0,
+									'waits': collections.deque (maxlen = PERF_SAMPLES) }
+		# dbus paths that have been created
+		self.servicePaths = set ()
+		# set when anything is counted so Publish only updates dbus if something has changed
+		self.changed = True
+		self.Publish ()
+
+	def count (self, path, increment=1):
+		with self.lock:
+			self.counters[path] = self.counters.get (path, 0) + increment
+			self.changed = True
+
+	def Pushed (self, theQueue):
+		name = self.queueNames.get (theQueue)
+		if name == None:
+			return
+		with self.lock:
+			stats = self.queues[name]
+			stats['depth'] += 1
+			stats['peak'] = max (stats['peak'], stats['depth'])
+			self.changed = True
+
+	def Dropped (self, theQueue):
+		name = self.queueNames.get (theQueue)
+		if name == None:
+			return
+		with self.lock:
+			self.queues[name]['dropped'] += 1
+			self.changed = True
+
+	#	Pulled
+	#
+	# records the wait for jobs and removes them from the queue depth
+
+	def Pulled (self, theQueue, entry):
+		name = self.queueNames.get (theQueue)
+		if name == None or not isinstance (entry, tuple) or len (entry) < 4:
+			return
+		with self.lock:
+			stats = self.queues[name]
+			# the job can be pulled before Pushed counts it
+			stats['depth'] -= 1
+			stats['waits'].append (time.monotonic () - entry[3])
+			self.changed = True
+
+	def DownloadStarted (self):
+		self.count ('/Stats/Downloads/Started')
+
+	def DownloadDone (self, success, downloadBytes=0):
+		if success:
+			self.count ('/Stats/Downloads/Succeeded')
+		else:
+			self.count ('/Stats/Downloads/Failed')
+		self.count ('/Stats/Downloads/Bytes', downloadBytes)
+
+	def SetupDone (self, action, returnCode=None, stopped=False, runFailed=False):
+		if runFailed:
+			result = 'RunFailed'
+		elif stopped:
+			result = 'Stopped'
+		else:
+			result = SETUP_RESULTS.get (returnCode, 'Other')
+		self.count ('/Stats/Setup/' + action.capitalize () + '/' + result)
+
+	def GitHubFetch (self, success):
+		self.count ('/Stats/GitHub/Fetches')
+		if not success:
+			self.count ('/Stats/GitHub/Failures')
+
+	#	Publish
+	#
+	# Scheduler task - updates the dbus values, creating paths the first time they are seen
+	#	nothing is done if nothing has been counted since the last publish
+
+	def Publish (self):
+		with self.lock:
+			if not self.changed:
+				return
+			self.changed = False
+			values = dict (self.counters)
+			for name, stats in self.queues.items ():
+				depth = max (0, stats['depth'])
+				basePath = '/Stats/Queues/' + name + '/'
+				values[basePath + 'Depth'] = depth
+				values[basePath + 'PeakDepth'] = stats['peak']
+				values[basePath + 'Dropped'] = stats['dropped']
+				waits = sorted (stats['waits'])
+				if len (waits) == 0:
+					waits = [ 0.0 ]
+				count = len (waits)
+				values[basePath + 'WaitP50'] = round (waits[count // 2] * 1000, 2)
+				values[basePath + 'WaitP95'] = round (waits[min (count - 1, (count * 95) // 100)] * 1000, 2)
+				values[basePath + 'WaitMax'] = round (waits[-1] * 1000, 2)
+
+		DbusIf.BeginBatch ()
+		try:
+			for path, value in values.items ():
+				if path in self.servicePaths:
+					DbusIf.SetServiceValue (path, value)
+				else:
+					DbusIf.AddServicePath (path, value)
+					self.servicePaths.add (path)
+		finally:
+			DbusIf.EndBatch ()
+# end StatsClass
+
+
+#	GetFromQueue
+#
+# pulls the next entry from a worker thread's queue
+#	and starts or stops the thread's profiler (see ProfilerClass)
+# PROFILER_WAKE entries are not returned
+#	when waiting with a timeout, queue.Empty is raised for them instead
+
+def GetFromQueue (theQueue, timeout=None):
+	while True:
+		entry = theQueue.get (timeout=timeout)
+		Profiler.ThreadUpdate ()
+		if entry is not PROFILER_WAKE:
+			Stats.Pulled (theQueue, entry)
+			return entry
+		if timeout != None:
+			raise queue.Empty
+
+
 #	AddRemoveClass
 #	Instances:
 #		AddRemove (a separate thread)
@@ -697,6 +1981,7 @@ class AddRemoveClass (threading.Thread):
 		threading.Thread.__init__(self)
 		self.AddRemoveQueue = queue.Queue (maxsize = 50)
 		self.threadRunning = True
+		self.tickPending = False
 		
 
 	
@@ -711,7 +1996,7 @@ class AddRemoveClass (threading.Thread):
 	#	the main method should catch the tread with join ()
 	#
 	# run () also serves as and idle loop to add packages found in /data (AddStoredPacakges)
-	#	this is only called every 3 seconds
+	#	this is only called every 3 seconds (when the Scheduler posts a 'TICK')
 	#	and may push add commands onto the AddRemoveQueue
 	#
 	# StopThread () is called to shut down the thread
@@ -720,6 +2005,20 @@ class AddRemoveClass (threading.Thread):
 		self.threadRunning = False
 		self.AddRemoveQueue.put ( ('STOP', ''), block=False )
 
+	#	PostTick
+	#
+	# Scheduler task - wakes run () for it's idle processing
+	#	a tick is not posted if the last one has not been processed yet
+
+	def PostTick (self):
+		if self.tickPending:
+			return
+		self.tickPending = True
+		try:
+			self.AddRemoveQueue.put ( ('TICK', ''), block=False )
+		except queue.Full:
+			self.tickPending = False
+
 	#	AddRemove run ()
 	#
 	# process package Add/Remove actions
@@ -730,13 +2029,24 @@ class AddRemoveClass (threading.Thread):
 		while self.threadRunning:
 			# if package was added or removed, don't wait for queue empty
 			# so package lists can be updated immediately
+			# otherwise wait for a command or a tick from the Scheduler
 			if changes:
 				delay = 0.0
 			else:
-				delay = 3.0
+				delay = None
+			idle = False
 			try:
-				command = self.AddRemoveQueue.get (timeout = delay)
+				command = GetFromQueue (self.AddRemoveQueue, timeout = delay)
 			except queue.Empty:
+				idle = True
+			except:
+				logging.error ("pull from AddRemoveQueue failed")
+				continue
+			else:
+				if len (command) > 0 and command[0] == 'TICK':
+					self.tickPending = False
+					idle = True
+			if idle:
 				# adds/removes since last queue empty
 				if changes:
 					DbusIf.UpdateDefaultPackages ()
@@ -767,9 +2077,6 @@ class AddRemoveClass (threading.Thread):
 
 				changes = False
 				continue
-			except:
-				logging.error ("pull from AddRemoveQueue failed")
-				continue
 			if len (command) == 0:
 				logging.error ("pull from AddRemove queue failed - empty comand")
 				continue
@@ -777,8 +2084,12 @@ class AddRemoveClass (threading.Thread):
 			if command [0] == 'STOP' or self.threadRunning == False:
 				return
 
-			# separate command, source tuple
+			# separate command, source, jobId tuple
 			# and separate action and packageName
+			if len (command) >= 3:
+				jobId = command[2]
+			else:
+				jobId = None
 			if len (command) >= 2:
 				parts = command[0].split (":")
 				if len (parts) >= 2:
@@ -786,14 +2097,18 @@ class AddRemoveClass (threading.Thread):
 					packageName = parts[1].strip ()
 				else:
 					logging.error ("AddRemoveQueue - no action or no package name - discarding", command)
+					JobJournal.Finish (jobId)
 					continue
 				source = command[1]
 			else:
 				logging.error ("AddRemoveQueue - no command and/or source - discarding", command)
+				JobJournal.Finish (jobId)
 				continue
 
+			JobJournal.Start (jobId)
+
 			if action == 'add':
-				packageDir = "/data/" + packageName
+				packageDir = DataRoot + "/" + packageName
 				if source == 'GUI':
 					user = DbusIf.EditPackage.GitHubUser
 					branch = DbusIf.EditPackage.GitHubBranch
@@ -823,30 +2138,63 @@ class AddRemoveClass (threading.Thread):
 				if PackageClass.AddPackage (packageName = packageName, source=source,
 								gitHubUser=user, gitHubBranch=branch ):
 					changes = True
+					MarkPackageDirty (packageName)
 
 			elif action == 'remove':
 				if PackageClass.RemovePackage ( packageName=packageName ):
 					changes = True
+					# update pending and action needed information
+					WakeMainLoop ()
 			else:
-				logging.warning ( "received invalid action " + command + " from " + source + " - discarding" )
+				logging.warning ( "received invalid action " + command[0] + " from " + source + " - discarding" )
+			JobJournal.Finish (jobId)
 		# end while True
 	# end run ()
 # end AddRemoveClass
 
 
+#	BatchContextClass
+#
+# collects dbus service changes for DbusIf.BeginBatch / EndBatch
+#
+# flush sends all changes in one ItemsChanged signal (GUI v2)
+#	then a PropertiesChanged signal for each changed path that still exists
+#	for older GUI versions and other services that only subscribe to PropertiesChanged
+# a path changed several times within a batch is sent once with it's final value
+
+class BatchContextClass (ServiceContext):
+
+	def flush (self):
+		changes = dict (self.changes)
+		super ().flush ()
+		for path, change in changes.items ():
+			item = self.parent._dbusobjects.get (path)
+			if item != None:
+				item.PropertiesChanged (change)
+# end BatchContextClass
+
+
 #	DbusIfClass
 #	Instances:
 #		DbusIf
 #	Methods:
 #		RemoveDbusSettings (class method)
+#		DeferSettingsRemoval (class method)
+#		FlushSettingsRemoval (class method)
 #		UpdateStatus
 #		various Gets and Sets for dbus parameters
 #		handleGuiEditAction (dbus change handler)
+#		settingChangedHandler (dbus Settings change handler)
 #		LocateRawDefaultPackage
 #		UpdateDefaultPackages ()
 #		ReadDefaultPackagelist ()
 #		LOCK ()
 #		UNLOCK ()
+#		BeginBatch ()
+#		EndBatch ()
+#		SetServiceValue ()
+#		AddServicePath ()
+#		RemoveServiceTree ()
 #		RemoveDbusService ()
 #
 #	Globals:
@@ -882,40 +2230,59 @@ class AddRemoveClass (threading.Thread):
 
 class DbusIfClass:
 
+	# settings waiting to be removed by FlushSettingsRemoval
+	#	None if removals are not being deferred
+	pendingSettingsRemoval = None
+
 	#		RemoveDbusSettings
 	# remove the dbus Settings paths for package
 	# package Settings are removed
 	# this is called when removing a package
 	# settings to be removed are passed as a list (settingsList)
-	# this gets reformatted for the call to dbus
+	#
+	# if removals are being deferred (DeferSettingsRemoval)
+	#	the settings are saved and removed later by FlushSettingsRemoval
 
 	@classmethod
 	def RemoveDbusSettings (cls, settingsList):
+		PackageSettings.Forget (settingsList)
+		if cls.pendingSettingsRemoval != None:
+			cls.pendingSettingsRemoval.extend (settingsList)
+		else:
+			cls.removeSettings (settingsList)
 
-		# format the list of settings to be removed
-		i = 0
-		while i < len (settingsList):
-			if i == 0:
-				settingsToRemove = '%[ "' + settingsList[i]
-			else:
-				settingsToRemove += '" , "' + settingsList[i]
-			i += 1
-		settingsToRemove += '" ]'
+	#		DeferSettingsRemoval / FlushSettingsRemoval
+	# collects the settings from several RemoveDbusSettings calls
+	#	so they can all be removed in one dbus call
+	# every DeferSettingsRemoval must be followed by FlushSettingsRemoval
+
+	@classmethod
+	def DeferSettingsRemoval (cls):
+		if cls.pendingSettingsRemoval == None:
+			cls.pendingSettingsRemoval = []
+
+	@classmethod
+	def FlushSettingsRemoval (cls):
+		settingsList = cls.pendingSettingsRemoval
+		cls.pendingSettingsRemoval = None
+		if settingsList:
+			cls.removeSettings (settingsList)
+
+	#		removeSettings
+	# removes the dbus Settings in settingsList with a single RemoveSettings call
+	#	the result is one value per setting: 0 if removed
 
-		# remove the dbus Settings paths - via the command line 
+	@classmethod
+	def removeSettings (cls, settingsList):
 		try:
-			proc = subprocess.Popen (['dbus', '-y', 'com.victronenergy.settings', '/',
-						'RemoveSettings', settingsToRemove  ],
-						bufsize=-1, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
-			_, stderr = proc.communicate ()
-			stderr = stderr.decode ().strip ()
-			returnCode = proc.returncode
-		except:
-			logging.error ("dbus RemoveSettings call failed")
-		else:
-			if returnCode != 0:
-				logging.error ("dbus RemoveSettings failed " + str (returnCode))
-				logging.error ("stderr: " + stderr)
+			results = dbus.SystemBus ().call_blocking ('com.victronenergy.settings', '/',
+						'com.victronenergy.Settings', 'RemoveSettings', 'as', [ settingsList ])
+		except dbus.exceptions.DBusException as e:
+			logging.error ("dbus RemoveSettings call failed " + str (e))
+			return
+		for (path, result) in zip (settingsList, results):
+			if result != 0:
+				logging.error ("dbus RemoveSettings failed for " + path + " " + str (result))
 	
 	#	UpdateStatus
 	#
@@ -949,6 +2316,18 @@ class DbusIfClass:
 		elif where == 'Media':
 			DbusIf.SetMediaStatus (message)
 
+	#	settingChangedHandler
+	#
+	# dbus Settings change handler
+	#	auto install changes require all packages to be checked
+	#	auto download changes are detected by mainLoop which then refreshes GitHub versions
+
+	def settingChangedHandler (self, name, old, new):
+		if name == 'autoInstall':
+			MarkPackageDirty ()
+		elif name == 'autoDownload':
+			WakeMainLoop ()
+
 	def UpdatePackageCount (self):
 		count = len(PackageClass.PackageList)
 		self.DbusSettings['packageCount'] = count
@@ -966,6 +2345,10 @@ class DbusIfClass:
 		else:
 			dbusValue = 0
 		self.DbusSettings['autoInstall'] = dbusValue
+	def GetSetupScriptPriority (self):
+		return ( self.DbusSettings['setupNice'], self.DbusSettings['setupIoClass'], self.DbusSettings['setupIoLevel'] )
+	def GetSetupScriptTimeout (self):
+		return self.DbusSettings['setupTimeout']
 	def SetPmStatus (self, value):
 		self.DbusService['/PmStatus'] = value
 	def SetMediaStatus (self, value):
@@ -1029,6 +2412,8 @@ class DbusIfClass:
 
 		if defer:
 			DeferredGuiEditAcknowledgement = value
+			# mainLoop sends the acknowledgement
+			WakeMainLoop ()
 		else:
 			# delay acknowledgement slightly to prevent lockups in the dbus system
 			time.sleep (0.002)
@@ -1090,44 +2475,49 @@ class DbusIfClass:
 
 	def UpdateDefaultPackages (self):
 		DbusIf.LOCK ("UpdateDefaultPackages")
-		# don't touch "new" entry (index 0)
-		index = 1
-		oldDefaultCount = len (self.defaultPackageList)
-		for default in self.rawDefaultPackages:
-			# if not in the main package list, add it to the default package list
-			name = default[0]
-			if PackageClass.LocatePackage (name) == None:
-				user = default[1]
-				branch = default[2]
-				prefix = '/Default/' + str (index) + '/'
-				# this entry already exists - update it
-				if index < oldDefaultCount:
-					# name has changed, update the entry (local and dbus)
-					if (name != self.defaultPackageList[index][0]):
-						self.defaultPackageList[index] = default
-						self.DbusService[prefix + 'PackageName'] = name
-						self.DbusService[prefix + 'GitHubUser'] = user
-						self.DbusService[prefix + 'GitHubBranch'] = branch
-				# path doesn't yet exist, add it	
-				else:
-					self.defaultPackageList.append (default)
-					self.DbusService.add_path (prefix + 'PackageName', name )
-					self.DbusService.add_path (prefix + 'GitHubUser', user )
-					self.DbusService.add_path (prefix + 'GitHubBranch', branch )
+		# all default changes are sent to the GUI together
+		self.BeginBatch ()
+		try:
+			# don't touch "new" entry (index 0)
+			index = 1
+			oldDefaultCount = len (self.defaultPackageList)
+			for default in self.rawDefaultPackages:
+				# if not in the main package list, add it to the default package list
+				name = default[0]
+				if PackageClass.LocatePackage (name) == None:
+					user = default[1]
+					branch = default[2]
+					prefix = '/Default/' + str (index) + '/'
+					# this entry already exists - update it
+					if index < oldDefaultCount:
+						# name has changed, update the entry (local and dbus)
+						if (name != self.defaultPackageList[index][0]):
+							self.defaultPackageList[index] = default
+							self.SetServiceValue (prefix + 'PackageName', name)
+							self.SetServiceValue (prefix + 'GitHubUser', user)
+							self.SetServiceValue (prefix + 'GitHubBranch', branch)
+					# path doesn't yet exist, add it	
+					else:
+						self.defaultPackageList.append (default)
+						self.AddServicePath (prefix + 'PackageName', name )
+						self.AddServicePath (prefix + 'GitHubUser', user )
+						self.AddServicePath (prefix + 'GitHubBranch', branch )
 
-				index += 1
+					index += 1
 
-		self.DbusService['/DefaultCount'] = index 
+			self.SetServiceValue ('/DefaultCount', index)
 
-		# clear out any remaining path values
-		while index < oldDefaultCount:
-			prefix = '/Default/' + str (index) + '/'
-			self.defaultPackageList[index] = ( "", "", "" )
-			self.DbusService[prefix + 'PackageName'] = ""
-			self.DbusService[prefix + 'GitHubUser'] = ""
-			self.DbusService[prefix + 'GitHubBranch'] = ""
-			index += 1
+			# clear out any remaining path values
+			while index < oldDefaultCount:
+				prefix = '/Default/' + str (index) + '/'
+				self.defaultPackageList[index] = ( "", "", "" )
+				self.SetServiceValue (prefix + 'PackageName', "")
+				self.SetServiceValue (prefix + 'GitHubUser', "")
+				self.SetServiceValue (prefix + 'GitHubBranch', "")
+				index += 1
 
+		finally:
+			self.EndBatch ()
 		DbusIf.UNLOCK ("UpdateDefaultPackages")
 
 
@@ -1140,7 +2530,7 @@ class DbusIfClass:
 	def ReadDefaultPackagelist (self):
 
 		try:
-			listFile = open ("/data/SetupHelper/defaultPackageList", 'r')
+			listFile = open (DataRoot + "/SetupHelper/defaultPackageList", 'r')
 		except:
 			logging.error ("no defaultPackageList " + listFileName)
 		else:
@@ -1163,13 +2553,15 @@ class DbusIfClass:
 	# lock requests that time out result in PackageManager exiting immediately without cleanup
 	# supervise will then restart it
 	
+	# LOCK returns the time spent waiting for the lock (seconds)
+
 	def LOCK (self, name):
 		requestTime = time.time()
 		reportTime = requestTime
 		while True:
 			if self.lock.acquire (blocking=False):
 				# here if lock was acquired
-				return
+				return time.time () - requestTime
 			else:
 				time.sleep (0.1)
 				currentTime = time.time()
@@ -1188,16 +2580,79 @@ class DbusIfClass:
 			self.lock.release ()
 		except RuntimeError:
 			logging.error ("UNLOCK when not locked - continuing " + name)
+
+
+	#	BeginBatch / EndBatch
+	#
+	# dbus service changes made with SetServiceValue and AddServicePath between
+	#	BeginBatch and EndBatch are collected and sent to the GUI by EndBatch
+	#	in a single ItemsChanged signal plus one PropertiesChanged per changed path
+	#	(see BatchContextClass)
+	#
+	# batches are per thread and may be nested - the changes are sent by the outermost EndBatch
+	# every BeginBatch must have a matching EndBatch (use try/finally) !!!!
+	#
+	# the velib "with DbusService" mechanism isn't used because it's context stack
+	#	is shared by all threads
+
+	def BeginBatch (self):
+		if getattr (self.batch, 'depth', 0) == 0:
+			self.batch.depth = 0
+			self.batch.context = BatchContextClass (self.DbusService)
+		self.batch.depth += 1
+
+	def EndBatch (self):
+		self.batch.depth -= 1
+		if self.batch.depth == 0:
+			context = self.batch.context
+			self.batch.context = None
+			context.flush ()
+
+	#	SetServiceValue / AddServicePath
+	#
+	# updates (or adds) a dbus service path
+	#	as part of a batch if one has been started by this thread
+
+	def SetServiceValue (self, path, value):
+		context = getattr (self.batch, 'context', None)
+		if context != None:
+			context[path] = value
+		else:
+			self.DbusService[path] = value
+
+	def AddServicePath (self, path, value):
+		context = getattr (self.batch, 'context', None)
+		if context != None:
+			context.add_path (path, value)
+		else:
+			self.DbusService.add_path (path, value)
+
+	#	RemoveServiceTree
+	#
+	# deletes all dbus service paths at and below root
+
+	def RemoveServiceTree (self, root):
+		context = getattr (self.batch, 'context', None)
+		if context != None:
+			context.del_tree (root)
+		else:
+			self.DbusService.del_tree (root)
 			
 
 	def __init__(self):
 		self.lock = threading.RLock()
+		# per thread batch of dbus service changes (see BeginBatch)
+		self.batch = threading.local ()
 		settingsList = {'packageCount': [ '/Settings/PackageManager/Count', 0, 0, 0 ],
 						'autoDownload': [ '/Settings/PackageManager/GitHubAutoDownload', 0, 0, 0 ],
 						'autoInstall': [ '/Settings/PackageManager/AutoInstall', 0, 0, 0 ],
+						'setupNice': [ '/Settings/PackageManager/SetupScriptNice', 10, 0, 19 ],
+						'setupIoClass': [ '/Settings/PackageManager/SetupScriptIoClass', 2, 0, 3 ],
+						'setupIoLevel': [ '/Settings/PackageManager/SetupScriptIoLevel', 7, 0, 7 ],
+						'setupTimeout': [ '/Settings/PackageManager/SetupScriptTimeout', 0, 0, 7200 ],
 						}
 		self.DbusSettings = SettingsDevice(bus=dbus.SystemBus(), supportedSettings=settingsList,
-								timeout = 30, eventCallback=None )
+								timeout = 30, eventCallback=self.settingChangedHandler )
 
 		# check firmware version and delay dbus service registration for v3.40~38 and beyond
 		global VenusVersionNumber
@@ -1257,6 +2712,228 @@ class DbusIfClass:
 	
 # end DbusIf
 
+#	PackageSettingsClass
+#	Instances:
+#		PackageSettings
+#	Methods:
+#		GetView
+#		AddSections
+#		Forget
+#		SetValue
+#		propertiesChangedHandler (dbus signal handler)
+#
+#	PackageSettingsViewClass
+#		one per package (PackageClass.DbusSettings)
+#
+# a single client for the per-package dbus Settings in /Settings/PackageManager/<section>/...
+#	replaces one SettingsDevice per package which made several blocking dbus calls per setting
+#
+# all values under /Settings/PackageManager are read with one GetItems call
+#	and kept in values {} which is updated from the PropertiesChanged signals
+#	received by a single signal receiver
+# settings that don't exist yet are created with one AddSettings call for all of them
+#	older localsettings without AddSettings get one AddSetting call per setting
+#
+# each package gets a view (PackageSettingsViewClass) that behaves like the SettingsDevice it replaces:
+#	view['packageName'] reads the local copy, view['packageName'] = x writes to dbus Settings
+#	and the package's settingChangedHandler is called when a value changes
+#
+# views are registered by path so a view created for a section replaces
+#	any previous view for that section (e.g., after a package is removed)
+
+SETTINGS_SERVICE = 'com.victronenergy.settings'
+PACKAGE_SETTINGS_PREFIX = '/Settings/PackageManager/'
+
+# setting name : path within the section
+packageSettingNames = { 'packageName': 'PackageName', 'gitHubUser': 'GitHubUser', 'gitHubBranch': 'GitHubBranch' }
+
+class PackageSettingsViewClass:
+
+	def __init__ (self, paths, eventCallback):
+		self.paths = paths
+		self.eventCallback = eventCallback
+
+	def __getitem__ (self, name):
+		return PackageSettings.values.get (self.paths[name], "")
+
+	def __setitem__ (self, name, value):
+		PackageSettings.SetValue (self.paths[name], value)
+
+
+class PackageSettingsClass:
+
+	def __init__ (self):
+		self.bus = dbus.SystemBus ()
+		self.values = {}
+		# path : ( view, setting name )
+		self.views = {}
+		self.loaded = False
+		self.addSettingsSupported = True
+
+		self.bus.add_signal_receiver (self.propertiesChangedHandler,
+				dbus_interface='com.victronenergy.BusItem', signal_name='PropertiesChanged',
+				bus_name=SETTINGS_SERVICE, path_keyword='path')
+
+
+	#	load
+	#
+	# reads all package settings from dbus
+	#	GetItems returns every setting so is filtered for the PackageManager paths
+	#	older localsettings without GetItems return the PackageManager subtree from GetValue
+	#
+	# loaded is set only if one of the reads succeeded so a failed load is tried again
+
+	def load (self):
+		try:
+			items = self.bus.call_blocking (SETTINGS_SERVICE, '/', None, 'GetItems', '', [])
+			for path, properties in items.items ():
+				path = str (path)
+				if path.startswith (PACKAGE_SETTINGS_PREFIX):
+					self.values[path] = unwrap_dbus_value (properties['Value'])
+			self.loaded = True
+			return
+		except dbus.exceptions.DBusException:
+			logging.info ("dbus Settings GetItems failed - trying GetValue")
+		try:
+			items = self.bus.call_blocking (SETTINGS_SERVICE, PACKAGE_SETTINGS_PREFIX.rstrip ('/'),
+							None, 'GetValue', '', [])
+			for path, value in items.items ():
+				self.values[PACKAGE_SETTINGS_PREFIX + str (path).lstrip ('/')] = unwrap_dbus_value (value)
+			self.loaded = True
+		except dbus.exceptions.DBusException as e:
+			logging.error ("can't read package dbus Settings " + str (e))
+
+
+	#	readValue
+	#
+	# reads one setting from dbus into the local copy
+	#	used after a setting is added without the add returning it's value
+	#	the setting may have existed already so it's value can't be assumed to be the default
+
+	def readValue (self, path):
+		try:
+			value = self.bus.call_blocking (SETTINGS_SERVICE, path, 'com.victronenergy.BusItem',
+							'GetValue', '', [])
+			self.values[path] = unwrap_dbus_value (value)
+		except dbus.exceptions.DBusException as e:
+			logging.error ("can't read dbus setting " + path + " " + str (e))
+
+
+	#	addSettings
+	#
+	# creates any of the settings in pathList that don't exist yet
+	# new settings are string settings with an empty default value
+
+	def addSettings (self, pathList):
+		if not self.loaded:
+			self.load ()
+		missing = [ path for path in pathList if path not in self.values ]
+		if len (missing) == 0:
+			return
+
+		if self.addSettingsSupported:
+			settings = [ { 'path': path, 'default': "" } for path in missing ]
+			try:
+				results = self.bus.call_blocking (SETTINGS_SERVICE, '/', 'com.victronenergy.Settings',
+								'AddSettings', 'aa{sv}', [ settings ])
+			except dbus.exceptions.DBusException:
+				logging.info ("dbus Settings AddSettings not available - adding settings one at a time")
+				self.addSettingsSupported = False
+			else:
+				for result in results:
+					path = str (result.get ('path', ""))
+					if result.get ('error', 0) != 0:
+						logging.error ("failed to add setting " + path + " error " + str (result['error']))
+					elif 'value' in result:
+						self.values[path] = unwrap_dbus_value (result['value'])
+					else:
+						self.readValue (path)
+				return
+
+		for path in missing:
+			try:
+				self.bus.call_blocking (SETTINGS_SERVICE, '/Settings', 'com.victronenergy.Settings',
+								'AddSetting', 'ssvsvv', [ '', path.replace ('/Settings/', '', 1), "", 's', 0, 0 ])
+			except dbus.exceptions.DBusException as e:
+				logging.error ("failed to add setting " + path + " " + str (e))
+				continue
+			self.readValue (path)
+
+
+	#	AddSections
+	#
+	# creates the settings for several sections at once
+	#	called before creating the packages so the packages' views don't need their own dbus calls
+
+	def AddSections (self, sections):
+		pathList = []
+		for section in sections:
+			for settingPath in packageSettingNames.values ():
+				pathList.append (PACKAGE_SETTINGS_PREFIX + str (section) + '/' + settingPath)
+		self.addSettings (pathList)
+
+
+	#	GetView
+	#
+	# returns the view used by a package to access the settings in it's section
+	#	creating any settings that don't exist yet
+
+	def GetView (self, section, eventCallback):
+		paths = {}
+		for name, settingPath in packageSettingNames.items ():
+			paths[name] = PACKAGE_SETTINGS_PREFIX + str (section) + '/' + settingPath
+		self.addSettings (paths.values ())
+		view = PackageSettingsViewClass (paths, eventCallback)
+		for name, path in paths.items ():
+			self.views[path] = ( view, name )
+		return view
+
+
+	#	Forget
+	#
+	# drops the local copy of settings that have been removed from dbus
+	#	so they will be created again if the section is reused
+
+	def Forget (self, pathList):
+		for path in pathList:
+			self.values.pop (path, None)
+			self.views.pop (path, None)
+
+
+	#	SetValue
+	#
+	# writes a value to dbus Settings and updates the local copy
+
+	def SetValue (self, path, value):
+		try:
+			self.bus.call_blocking (SETTINGS_SERVICE, path, 'com.victronenergy.BusItem',
+								'SetValue', 'v', [ wrap_dbus_value (value) ])
+		except dbus.exceptions.DBusException as e:
+			logging.error ("failed to set " + path + " " + str (e))
+		else:
+			self.values[path] = value
+
+
+	#	propertiesChangedHandler
+	#
+	# dbus signal handler for all setting changes
+	#	updates the local copy of package settings and
+	#	calls the owning package's change handler
+
+	def propertiesChangedHandler (self, changes, path=None):
+		if path == None or not path.startswith (PACKAGE_SETTINGS_PREFIX) or 'Value' not in changes:
+			return
+		path = str (path)
+		new = unwrap_dbus_value (changes['Value'])
+		old = self.values.get (path)
+		self.values[path] = new
+		if path in self.views:
+			view, name = self.views[path]
+			if view.eventCallback != None:
+				view.eventCallback (name, old, new)
+# end PackageSettingsClass
+
+
 #	PackageClass
 #	Instances:
 #		one per package
@@ -1273,14 +2950,28 @@ class DbusIfClass:
 #		AddStoredPackages (class method)
 #		AddPackage (class method)
 #		RemovePackage (class method)
+#		RemoveServicePaths ()
 #		UpdateVersionsAndFlags ()
+#		SetGitHubRefreshTime ()
+#		ExpireGitHubVersions (class method)
+#		GetActionNeeded (class method)
 #
 #	Globals:
 #		PackageList [] - list instances of all packages
-#		DbusSettings (for per-package settings)
+#		DbusSettings (view of the per-package settings - see PackageSettingsClass)
 #		DbusService (for per-package parameters)
-#		DownloadPending
-#		InstallPending
+#		DownloadPending (property)
+#		InstallPending (property)
+#		ActionNeeded (property)
+#
+# the DownloadPending, InstallPending and ActionNeeded properties maintain
+#	class-wide totals as they change so mainLoop doesn't need to scan all packages:
+#		PendingCount - number of packages with a download or install pending
+#		rebootNeeded, guiRestartNeeded - sets of packages needing these actions
+# GitHub version expiry deadlines are kept in a heap (gitHubExpiryHeap)
+#	entries are not removed when a version is refreshed again
+#	instead, entries that no longer match the package's lastGitHubRefresh are discarded
+#	when they reach the top of the heap
 #
 # a package consits of Settings and version parameters in the PackageMonitor dbus service
 # all Settings and parameters are accessible via set... and get... methods
@@ -1296,6 +2987,142 @@ class PackageClass:
 	# list of instantiated Packages
 	PackageList = []
 
+	# totals maintained by the DownloadPending, InstallPending and ActionNeeded properties
+	PendingCount = 0
+	rebootNeeded = set ()
+	guiRestartNeeded = set ()
+	actionNeededChanged = True
+
+	# ( expiry time, sequence, package, refresh time ) entries for GitHub versions
+	#	sequence prevents comparing package instances when times are equal
+	gitHubExpiryHeap = []
+	gitHubExpirySequence = 0
+
+	# changes to the pending flags update PendingCount
+	# must be called with package list LOCKED !!
+
+	def updatePending (self, downloadPending, installPending):
+		wasPending = self.downloadPending or self.installPending
+		self.downloadPending = downloadPending
+		self.installPending = installPending
+		isPending = downloadPending or installPending
+		if isPending and not wasPending:
+			PackageClass.PendingCount += 1
+		elif wasPending and not isPending:
+			PackageClass.PendingCount -= 1
+
+	@property
+	def DownloadPending (self):
+		return self.downloadPending
+
+	@DownloadPending.setter
+	def DownloadPending (self, value):
+		self.updatePending (value, self.installPending)
+
+	@property
+	def InstallPending (self):
+		return self.installPending
+
+	@InstallPending.setter
+	def InstallPending (self, value):
+		self.updatePending (self.downloadPending, value)
+
+	@property
+	def ActionNeeded (self):
+		return self.actionNeeded
+
+	@ActionNeeded.setter
+	def ActionNeeded (self, value):
+		if value == self.actionNeeded:
+			return
+		self.actionNeeded = value
+		PackageClass.rebootNeeded.discard (self)
+		PackageClass.guiRestartNeeded.discard (self)
+		if value == REBOOT_NEEDED:
+			PackageClass.rebootNeeded.add (self)
+		elif value == GUI_RESTART_NEEDED:
+			PackageClass.guiRestartNeeded.add (self)
+		PackageClass.actionNeededChanged = True
+
+
+	#	GetActionNeeded
+	#
+	# returns ( systemAction, actionsNeeded )
+	#	systemAction is REBOOT_NEEDED, GUI_RESTART_NEEDED or NONE
+	#	actionsNeeded is the text for the GUI, or None if it has not changed since the last call
+	#
+	# must be called with package list LOCKED !!
+
+	@classmethod
+	def GetActionNeeded (cls):
+		if len (cls.rebootNeeded) > 0:
+			systemAction = REBOOT_NEEDED
+		elif len (cls.guiRestartNeeded) > 0:
+			systemAction = GUI_RESTART_NEEDED
+		else:
+			systemAction = NONE
+
+		if not cls.actionNeededChanged:
+			return ( systemAction, None )
+		cls.actionNeededChanged = False
+
+		# rebuilt only when something changed - list order is kept for the GUI
+		actionsNeeded = ""
+		for package in cls.PackageList:
+			if package in cls.rebootNeeded:
+				actionsNeeded += (package.PackageName + " requires REBOOT\n")
+			elif package in cls.guiRestartNeeded:
+				actionsNeeded += (package.PackageName + " requires GUI restart\n")
+		if systemAction == REBOOT_NEEDED:
+			actionsNeeded += "REBOOT system ?"
+		elif systemAction == GUI_RESTART_NEEDED:
+			actionsNeeded += "restart GUI ?"
+		return ( systemAction, actionsNeeded )
+
+
+	#	SetGitHubRefreshTime
+	#
+	# records the time of the last GitHub version refresh
+	#	and schedules the version to expire if it is not refreshed again
+	#
+	# must be called with package list LOCKED !!
+
+	def SetGitHubRefreshTime (self, refreshTime):
+		self.lastGitHubRefresh = refreshTime
+		if refreshTime > 0:
+			PackageClass.gitHubExpirySequence += 1
+			heapq.heappush (PackageClass.gitHubExpiryHeap, ( refreshTime + GITHUB_VERSION_LIFETIME,
+							PackageClass.gitHubExpirySequence, self, refreshTime ) )
+
+
+	#	ExpireGitHubVersions
+	#
+	# clears GitHub versions that have not been refreshed within GITHUB_VERSION_LIFETIME
+	#	a version is not cleared while an operation is pending for the package
+	#	that check is repeated a few seconds later
+	#
+	# returns the time of the next expiry or None if there are none
+	#
+	# must be called with package list LOCKED !!
+
+	@classmethod
+	def ExpireGitHubVersions (cls, currentTime):
+		heap = cls.gitHubExpiryHeap
+		while len (heap) > 0 and heap[0][0] < currentTime:
+			( expiry, sequence, package, refreshTime ) = heapq.heappop (heap)
+			# version has been refreshed since or package has been removed
+			if package.lastGitHubRefresh != refreshTime or package.GitHubVersion == "":
+				continue
+			if package.DownloadPending or package.InstallPending:
+				cls.gitHubExpirySequence += 1
+				heapq.heappush (heap, ( currentTime + 10, cls.gitHubExpirySequence, package, refreshTime ) )
+				continue
+			package.SetGitHubVersion ("")
+		if len (heap) > 0:
+			return heap[0][0]
+		else:
+			return None
+
 	# search PackageList for packageName
 	# and return the package pointer if found
 	#	otherwise return None
@@ -1325,7 +3152,7 @@ class PackageClass:
 			logging.error ("GetAutoAddOk - no packageName")
 			return False
 
-		flagFile = "/data/setupOptions/" + packageName + "/DO_NOT_AUTO_ADD"
+		flagFile = DataRoot + "/setupOptions/" + packageName + "/DO_NOT_AUTO_ADD"
 		if os.path.exists (flagFile):
 			return False
 		else:
@@ -1341,7 +3168,7 @@ class PackageClass:
 		# if package options directory exists set/clear auto add flag
 		# directory may not exist if package was never downloaded or transferred from media
 		#	or if package was added manually then never acted on
-		optionsDir = "/data/setupOptions/" + packageName
+		optionsDir = DataRoot + "/setupOptions/" + packageName
 		if os.path.exists (optionsDir):
 			flagFile = optionsDir + "/DO_NOT_AUTO_ADD"
 			# permit auto add
@@ -1364,7 +3191,7 @@ class PackageClass:
 		# if package options directory exists set/clear auto install flag
 		# directory may not exist if package was never downloaded or transferred from media
 		#	or if package was added manually then never acted on
-		optionsDir = "/data/setupOptions/" + packageName
+		optionsDir = DataRoot + "/setupOptions/" + packageName
 		if os.path.exists (optionsDir):
 			flagFile = optionsDir + "/DO_NOT_AUTO_INSTALL"
 			# permit auto installs
@@ -1380,27 +3207,30 @@ class PackageClass:
 	def SetPackageName (self, newName):
 		self.DbusSettings['packageName'] = newName
 		self.PackageName = newName
+		# name is part of the /ActionNeeded text
+		if self.actionNeeded == REBOOT_NEEDED or self.actionNeeded == GUI_RESTART_NEEDED:
+			PackageClass.actionNeededChanged = True
 
 	def SetInstalledVersion (self, version):
 		global VersionToNumber
 		self.InstalledVersion = version
 		self.InstalledVersionNumber = VersionToNumber (version)
 		if self.installedVersionPath != "":
-			DbusIf.DbusService[self.installedVersionPath] = version	
+			DbusIf.SetServiceValue (self.installedVersionPath, version)
 
 	def SetPackageVersion (self, version):
 		global VersionToNumber
 		self.PackageVersion = version
 		self.PackageVersionNumber = VersionToNumber (version)
 		if self.packageVersionPath != "":
-			DbusIf.DbusService[self.packageVersionPath] = version	
+			DbusIf.SetServiceValue (self.packageVersionPath, version)
 
 	def SetGitHubVersion (self, version):
 		global VersionToNumber
 		self.GitHubVersion = version
 		self.GitHubVersionNumber = VersionToNumber (version)
 		if self.gitHubVersionPath != "":
-			DbusIf.DbusService[self.gitHubVersionPath] = version
+			DbusIf.SetServiceValue (self.gitHubVersionPath, version)
 
 	def SetGitHubUser (self, user):
 		self.GitHubUser = user
@@ -1415,14 +3245,34 @@ class PackageClass:
 		self.IncompatibleDetails = details
 		self.IncompatibleResolvable = resolvable
 		if self.incompatiblePath != "":
-			DbusIf.DbusService[self.incompatiblePath] = value	
+			DbusIf.SetServiceValue (self.incompatiblePath, value)
 		if self.incompatibleDetailsPath != "":
-			DbusIf.DbusService[self.incompatibleDetailsPath] = details
+			DbusIf.SetServiceValue (self.incompatibleDetailsPath, details)
 		if self.IncompatibleResolvablePath != "":
 			if resolvable:
-				DbusIf.DbusService[self.IncompatibleResolvablePath] = 1
+				DbusIf.SetServiceValue (self.IncompatibleResolvablePath, 1)
 			else:
-				DbusIf.DbusService[self.IncompatibleResolvablePath] = 0
+				DbusIf.SetServiceValue (self.IncompatibleResolvablePath, 0)
+
+	#	RemoveServicePaths
+	#
+	# deletes the package's /Package/<section>/... dbus service paths
+	#	called by RemovePackage when the last slot is no longer used
+	# the path variables are cleared so later Set... calls (e.g., from a thread still
+	#	holding this package) only update the local values
+	# a new package in this slot creates the paths again
+
+	def RemoveServicePaths (self):
+		if self.servicePathPrefix == "":
+			return
+		DbusIf.RemoveServiceTree (self.servicePathPrefix)
+		self.servicePathPrefix = ""
+		self.gitHubVersionPath = ""
+		self.packageVersionPath = ""
+		self.installedVersionPath = ""
+		self.incompatiblePath = ""
+		self.incompatibleDetailsPath = ""
+		self.IncompatibleResolvablePath = ""
 
 	def settingChangedHandler (self, name, old, new):
 		# when dbus information changes, need to refresh local mirrors
@@ -1438,9 +3288,11 @@ class PackageClass:
 				UpdateGitHubVersion.SetPriorityGitHubVersion ( 'package:' + self.PackageName )
 
 	def __init__( self, section, packageName = None ):
+		self.servicePathPrefix = ""
 		# add package parameters if it's a real package (not Edit)
 		if section != 'Edit':
 			section = str (section)
+			self.servicePathPrefix = '/Package/' + section
 			self.gitHubVersionPath = '/Package/' + section + '/GitHubVersion'
 			self.packageVersionPath = '/Package/' + section + '/PackageVersion'
 			self.installedVersionPath = '/Package/' + section + '/InstalledVersion'
@@ -1478,17 +3330,12 @@ class PackageClass:
 		self.gitHubUserPath = '/Settings/PackageManager/' + section + '/GitHubUser'
 		self.gitHubBranchPath = '/Settings/PackageManager/' + section + '/GitHubBranch'
 
-		# temporarily set PackageName since settingChangeHandler may be called as soon as SettingsDevice is called
+		# temporarily set PackageName since settingChangeHandler may be called as soon as the view is created
 		#	which is before actual package name is set below
 		#	so this avoids a crash
 		self.PackageName = ""
 
-		settingsList =	{'packageName': [ self.packageNamePath, '', 0, 0 ],
-						'gitHubUser': [ self.gitHubUserPath, '', 0, 0 ],
-						'gitHubBranch': [ self.gitHubBranchPath, '', 0, 0 ],
-						}
-		self.DbusSettings = SettingsDevice(bus=dbus.SystemBus(), supportedSettings=settingsList,
-				eventCallback=self.settingChangedHandler, timeout = 10)
+		self.DbusSettings = PackageSettings.GetView (section, self.settingChangedHandler)
 
 		# if packageName specified on init, use that name
 		if packageName != None:
@@ -1502,8 +3349,8 @@ class PackageClass:
 		self.GitHubBranch = self.DbusSettings['gitHubBranch']
 		
 		# these flags are used to insure multiple actions aren't executed on top of each other
-		self.DownloadPending = False
-		self.InstallPending = False
+		self.downloadPending = False
+		self.installPending = False
 		self.InstallAfterDownload = False	# used by ResolveConflicts when doing both download and install
 
 		self.AutoInstallOk = False
@@ -1512,7 +3359,7 @@ class PackageClass:
 		self.LastPatchErrorUpdate = 0
 		self.ConflictsResolvable = True
 
-		self.ActionNeeded = ''
+		self.actionNeeded = ''
 
 		self.lastScriptPrecheck = 0
 
@@ -1558,6 +3405,8 @@ class PackageClass:
 		if packageCount == None:
 			logging.critical ("dbus PackageManager Settings not set up -- can't continue")
 			return False
+		# create any missing package settings in one dbus call
+		PackageSettings.AddSections (range (packageCount))
 		i = 0
 		while i < packageCount:
 			# no package name tells PackageClas init to pull package name from dbus
@@ -1621,7 +3470,7 @@ class PackageClass:
 
 		platformIsRaspberryPi = Platform[0:4] == 'Rasp'
 
-		for packageName in os.listdir ("/data"):
+		for packageName in os.listdir (DataRoot):
 			if not PackageClass.PackageNameValid (packageName):
 				continue
 			# if package is already in the active list - skip it
@@ -1631,7 +3480,7 @@ class PackageClass:
 			if package != None:
 				continue
 
-			packageDir = "/data/" + packageName
+			packageDir = DataRoot + "/" + packageName
 
 			# skip if no setup file - also verifies packageDir is a directory!
 			if not os.path.exists (packageDir + "/setup"):
@@ -1793,53 +3642,55 @@ class PackageClass:
 			if not isDuplicate:
 				PackageClass.SetAutoAddOk (packageName, False)
 
-			# move packages after the one to be remove down one slot (copy info)
-			# each copy overwrites the lower numbered package
-			fromIndex = toIndex + 1
-			while fromIndex < listLength:
-				# dbus Settings
+			# the service changes for all moved packages are sent to the GUI together
+			DbusIf.BeginBatch ()
+			try:
+
+				# move packages after the one to be remove down one slot (copy info)
+				# each copy overwrites the lower numbered package
+				fromIndex = toIndex + 1
+				while fromIndex < listLength:
+					# dbus Settings
+					toPackage = packages[toIndex]
+					fromPackage = packages[fromIndex]
+					toPackage.SetPackageName (fromPackage.PackageName )
+					toPackage.SetGitHubUser (fromPackage.GitHubUser )
+					toPackage.SetGitHubBranch (fromPackage.GitHubBranch )
+
+					# dbus service params
+					toPackage.SetGitHubVersion (fromPackage.GitHubVersion )
+					toPackage.SetPackageVersion (fromPackage.PackageVersion )
+					toPackage.SetInstalledVersion (fromPackage.InstalledVersion )
+					toPackage.SetIncompatible (fromPackage.Incompatible, fromPackage.IncompatibleDetails,
+																fromPackage.IncompatibleResolvable )
+
+					# package variables
+					toPackage.DownloadPending = fromPackage.DownloadPending
+					toPackage.InstallPending = fromPackage.InstallPending
+					toPackage.AutoInstallOk = fromPackage.AutoInstallOk
+					toPackage.DependencyErrors = fromPackage.DependencyErrors
+					toPackage.FileConflicts = fromPackage.FileConflicts
+					toPackage.LastPatchErrorUpdate = fromPackage.LastPatchErrorUpdate
+					toPackage.lastScriptPrecheck = fromPackage.lastScriptPrecheck
+					toPackage.SetGitHubRefreshTime (fromPackage.lastGitHubRefresh)
+					toPackage.ActionNeeded = fromPackage.ActionNeeded
+
+					toIndex += 1
+					fromIndex += 1
+
+				# here, toIndex points to the last package in the old list
 				toPackage = packages[toIndex]
-				fromPackage = packages[fromIndex]
-				toPackage.SetPackageName (fromPackage.PackageName )
-				toPackage.SetGitHubUser (fromPackage.GitHubUser )
-				toPackage.SetGitHubBranch (fromPackage.GitHubBranch )
-
-				# dbus service params
-				toPackage.SetGitHubVersion (fromPackage.GitHubVersion )
-				toPackage.SetPackageVersion (fromPackage.PackageVersion )
-				toPackage.SetInstalledVersion (fromPackage.InstalledVersion )
-				toPackage.SetIncompatible (fromPackage.Incompatible, fromPackage.IncompatibleDetails,
-															fromPackage.IncompatibleResolvable )
-
-				# package variables
-				toPackage.DownloadPending = fromPackage.DownloadPending
-				toPackage.InstallPending = fromPackage.InstallPending
-				toPackage.AutoInstallOk = fromPackage.AutoInstallOk
-				toPackage.DependencyErrors = fromPackage.DependencyErrors
-				toPackage.FileConflicts = fromPackage.FileConflicts
-				toPackage.LastPatchErrorUpdate = fromPackage.LastPatchErrorUpdate
-				toPackage.lastScriptPrecheck = fromPackage.lastScriptPrecheck
-				toPackage.lastGitHubRefresh = fromPackage.lastGitHubRefresh
-				toPackage.ActionNeeded = fromPackage.ActionNeeded
 
-				toIndex += 1
-				fromIndex += 1
-
-			# here, toIndex points to the last package in the old list
-			toPackage = packages[toIndex]
-
-			# can't actually remove service paths cleanly
-			#	so just set contents to null/False
-			# 	they will disappear after PackageManager is started the next time
-			toPackage.SetGitHubVersion ("?")
-			toPackage.SetInstalledVersion ("?")
-			toPackage.SetPackageVersion ("?")
-			toPackage.SetIncompatible ("")
-			toPackage.LastPatchErrorUpdate = 0
-			toPackage.lastScriptPrecheck = 0
-			toPackage.lastGitHubRefresh = 0
-			toPackage.ActionNeeded = NONE
-			
+				# the last slot is retired - it's service paths are removed below
+				toPackage.LastPatchErrorUpdate = 0
+				toPackage.lastScriptPrecheck = 0
+				toPackage.SetGitHubRefreshTime (0)
+				toPackage.ActionNeeded = NONE
+				# remove the package from the pending totals
+				toPackage.DownloadPending = False
+				toPackage.InstallPending = False
+			finally:
+				DbusIf.EndBatch ()
 
 			# remove the Settings and service paths for the package being removed
 			DbusIf.RemoveDbusSettings ( [toPackage.packageNamePath, toPackage.gitHubUserPath, toPackage.gitHubBranchPath] )
@@ -1847,6 +3698,9 @@ class PackageClass:
 			# remove entry from package list
 			packages.pop (toIndex)
 			DbusIf.UpdatePackageCount ()
+			# remove the service paths for the retired slot (/Package/<toIndex>/...)
+			#	after the count is reduced so the GUI no longer looks at them
+			toPackage.RemoveServicePaths ()
 		DbusIf.UNLOCK ("RemovePackage")
 		# this package was manually removed so block automatic adds
 		#	in the package directory
@@ -1882,8 +3736,17 @@ class PackageClass:
 	#	to insure version information is up to date before proceeding with an operaiton
 	#
 	# must be called while LOCKED !!
+	#
+	# the resulting dbus changes are sent to the GUI as one batch
 
 	def UpdateVersionsAndFlags (self, doConflictChecks=False, doScriptPreChecks=False):
+		DbusIf.BeginBatch ()
+		try:
+			self.updateVersionsAndFlags (doConflictChecks=doConflictChecks, doScriptPreChecks=doScriptPreChecks)
+		finally:
+			DbusIf.EndBatch ()
+
+	def updateVersionsAndFlags (self, doConflictChecks=False, doScriptPreChecks=False):
 		global VersionToNumber
 		global VenusVersion
 		global VenusVersionNumber
@@ -1892,7 +3755,7 @@ class PackageClass:
 		packageName = self.PackageName
 
 		# fetch installed version
-		installedVersionFile = "/etc/venus/installedVersion-" + packageName
+		installedVersionFile = EtcVenusRoot + "/installedVersion-" + packageName
 		try:
 			versionFile = open (installedVersionFile, 'r')
 		except:
@@ -1905,7 +3768,7 @@ class PackageClass:
 				installedVersion = "unknown"
 		self.SetInstalledVersion (installedVersion)
 
-		packageDir = "/data/" + packageName
+		packageDir = DataRoot + "/" + packageName
 
 		# no package directory - null out all params
 		if not os.path.isdir (packageDir):
@@ -1934,7 +3797,7 @@ class PackageClass:
 				doConflictChecks = False
 
 		# update local auto install flag based on DO_NOT_AUTO_INSTALL
-		flagFile = "/data/setupOptions/" + packageName + "/DO_NOT_AUTO_INSTALL"
+		flagFile = DataRoot + "/setupOptions/" + packageName + "/DO_NOT_AUTO_INSTALL"
 		if os.path.exists (flagFile):
 			self.AutoInstallOk = False
 		else:
@@ -1979,8 +3842,8 @@ class PackageClass:
 		# the optionsSet flag indicates the options HAVE been set already
 		# so if optionsRequired == True and optionsSet == False, can't install from GUI
 		if compatible:
-			if os.path.exists ("/data/" + packageName + "/optionsRequired" ):
-				if not os.path.exists ( "/data/setupOptions/" + packageName + "/optionsSet"):
+			if os.path.exists (DataRoot + "/" + packageName + "/optionsRequired" ):
+				if not os.path.exists ( DataRoot + "/setupOptions/" + packageName + "/optionsSet"):
 					self.SetIncompatible ("install from command line" )
 					compatible = False
 					doConflictChecks = False
@@ -1998,7 +3861,7 @@ class PackageClass:
 		# check for package conflicts - but not if an operation is in progress
 		if doConflictChecks and not self.InstallPending and not self.DownloadPending:
 			# update dependencies
-			dependencyFile = "/data/" + packageName + "/packageDependencies"
+			dependencyFile = DataRoot + "/" + packageName + "/packageDependencies"
 			dependencyErrors = []
 			if os.path.exists (dependencyFile):
 				try:
@@ -2011,7 +3874,7 @@ class PackageClass:
 							dependencyPackage = parts [0]
 							dependencyRequirement = parts [1]
 
-							installedFile = "/etc/venus/installedVersion-" + dependencyPackage
+							installedFile = EtcVenusRoot + "/installedVersion-" + dependencyPackage
 							packageIsInstalled = os.path.exists (installedFile)
 							packageMustBeInstalled = dependencyRequirement == "installed"
 							if packageIsInstalled != packageMustBeInstalled:
@@ -2041,7 +3904,7 @@ class PackageClass:
 			fileConflicts = []
 			fileLists =  [ "fileList", "fileListVersionIndependent" ]
 			for fileList in fileLists:
-				path = "/data/" + packageName + "/FileSets/" + fileList
+				path = DataRoot + "/" + packageName + "/FileSets/" + fileList
 				if not os.path.exists (path):
 					continue
 				try:
@@ -2053,7 +3916,7 @@ class PackageClass:
 							if not entry.startswith ("/"):
 								continue
 							replacementFile = entry.split ()[0].strip ()
-							packagesList = replacementFile + ".package"
+							packagesList = SystemRoot + replacementFile + ".package"
 							if not os.path.exists ( packagesList ) :
 								continue
 							# if a package list for an active file changes,
@@ -2148,9 +4011,74 @@ class PackageClass:
 			self.SetIncompatible ("")
 
 		# run setup script to check for file conflicts (can't be checked here)
-		if doScriptPreChecks and os.path.exists ("/data/" + packageName + "/setup"):
-			PushAction ( command='check' + ':' + packageName, source='AUTO' )
+		#	unless the check has already been run with the same inputs
+		#	then a failed check is reported the same way InstallPackage reports it
+		if doScriptPreChecks and os.path.exists (DataRoot + "/" + packageName + "/setup"):
+			previousResult = ScriptCheckCache.Lookup (packageName, self.ScriptCheckKey ())
+			if previousResult == None:
+				PushAction ( command='check' + ':' + packageName, source='AUTO' )
+			else:
+				( returnCode, errorMessage ) = previousResult
+				if returnCode != EXIT_SUCCESS:
+					logging.info (packageName + " check skipped - inputs unchanged, previous check failed " + str (returnCode))
+					if errorMessage == "":
+						errorMessage = "unknown error " + str (returnCode)
+					DbusIf.UpdateStatus ( message=packageName + " check failed - " + errorMessage,
+							where='PmStatus', logLevel=INFO )
 	# end UpdateVersionsAndFlags
+
+
+	#	ScriptCheckKey
+	#
+	# returns a digest of everything the setup script check depends on:
+	#	package and installed versions, Venus OS version and platform
+	#	the content of the .package file for all files in the package's file lists
+	#		these change when other packages install or uninstall the same files
+	#	the name, size and modification time of all patch source files
+	#
+	# must be called while LOCKED !!
+
+	def ScriptCheckKey (self):
+		global VenusVersion
+		global Platform
+
+		packageName = self.PackageName
+		fileSetsDir = DataRoot + "/" + packageName + "/FileSets"
+		digest = hashlib.md5 ()
+		for item in [ self.PackageVersion, self.InstalledVersion, VenusVersion, Platform ]:
+			digest.update ( (item + "\n").encode () )
+
+		for fileList in [ "fileList", "fileListVersionIndependent", "fileListPatched" ]:
+			try:
+				with open (fileSetsDir + "/" + fileList, 'r') as file:
+					for entry in file:
+						entry = entry.strip ()
+						if not entry.startswith ("/"):
+							continue
+						packagesList = entry.split ()[0].strip () + ".package"
+						digest.update ( (packagesList + "\n").encode () )
+						try:
+							with open (SystemRoot + packagesList, 'rb') as plFile:
+								digest.update (plFile.read ())
+						except:
+							pass
+			except:
+				continue
+
+		patchSourceDir = fileSetsDir + "/PatchSource"
+		try:
+			patchSources = sorted (os.listdir (patchSourceDir))
+		except:
+			patchSources = []
+		for patchSource in patchSources:
+			try:
+				stat = os.stat (patchSourceDir + "/" + patchSource)
+			except:
+				continue
+			digest.update ( (patchSource + " " + str (stat.st_size) + " " + str (stat.st_mtime) + "\n").encode () )
+
+		return digest.hexdigest ()
+	# end ScriptCheckKey
 # end Package
 
 
@@ -2184,9 +4112,17 @@ class PackageClass:
 
 FAST_GITHUB_REFRESH = 0.25
 NORMAL_GITHUB_REFRESH = 600.0	# 10 minutes
+# GitHub versions are cleared if not refreshed within this time
+GITHUB_VERSION_LIFETIME = NORMAL_GITHUB_REFRESH + 10
 HOURLY_GITHUB_REFRESH = 60.0 * 60.0
 DAILY_GITHUB_REFRESH = HOURLY_GITHUB_REFRESH * 24.0
 
+# GitHub servers - can be replaced (e.g., by a local server for testing) with
+#	PACKAGE_MANAGER_GITHUB_URL (archives: <url>/<user>/<package>/archive/<branch>.tar.gz)
+#	PACKAGE_MANAGER_GITHUB_RAW_URL (versions: <url>/<user>/<package>/<branch>/version)
+GitHubUrl = os.environ.get ('PACKAGE_MANAGER_GITHUB_URL', "https://github.com").rstrip ('/')
+GitHubRawUrl = os.environ.get ('PACKAGE_MANAGER_GITHUB_RAW_URL', "https://raw.githubusercontent.com").rstrip ('/')
+
 class UpdateGitHubVersionClass (threading.Thread):
 
 	#	updateGitHubVersion
@@ -2212,7 +4148,7 @@ class UpdateGitHubVersionClass (threading.Thread):
 
 	def updateGitHubVersion (self, packageName, gitHubUser, gitHubBranch):
 
-		url = "https://raw.githubusercontent.com/" + gitHubUser + "/" + packageName + "/" + gitHubBranch + "/version"
+		url = GitHubRawUrl + "/" + gitHubUser + "/" + packageName + "/" + gitHubBranch + "/version"
 		try:
 			proc = subprocess.Popen (["wget", "--timeout=10", "-qO", "-", url],
 						bufsize=-1, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
@@ -2222,20 +4158,26 @@ class UpdateGitHubVersionClass (threading.Thread):
 		except:
 			logging.error ("wget for version failed " + packageName)
 			gitHubVersion = ""
+			Stats.GitHubFetch (False)
 		else:
 			if proc.returncode == 0:
 				gitHubVersion = stdout
 			else:
 				gitHubVersion = ""
+			Stats.GitHubFetch (proc.returncode == 0)
 
 		# locate the package with this name and update it's GitHubVersion
 		# if not in the list discard the information
 		DbusIf.LOCK ("updateGitHubVersion")
 		package = PackageClass.LocatePackage (packageName)
 		if package != None:
+			versionChanged = gitHubVersion != package.GitHubVersion
 			package.SetGitHubVersion (gitHubVersion)
-			package.lastGitHubRefresh = time.time ()
+			package.SetGitHubRefreshTime (time.time ())
 		DbusIf.UNLOCK ("updateGitHubVersion")
+		# a new version may trigger a download
+		if package != None and versionChanged:
+			MarkPackageDirty (packageName)
 		return gitHubVersion
 
 
@@ -2243,6 +4185,9 @@ class UpdateGitHubVersionClass (threading.Thread):
 		threading.Thread.__init__(self)
 		self.GitHubVersionQueue = queue.Queue (maxsize = 50)
 		self.threadRunning = True
+		self.tickPending = False
+		# time between background updates - set by run (), used by PostTick
+		self.tickDelay = FAST_GITHUB_REFRESH
 		# package needing immediate update
 		self.priorityPackageName = None
 
@@ -2256,6 +4201,24 @@ class UpdateGitHubVersionClass (threading.Thread):
 		self.GitHubVersionQueue.put ( (command, 'local'), block=False )
 
 
+	#	PostTick
+	#
+	# Scheduler task - wakes run () for the next background update
+	#	a tick is not posted if the last one has not been processed yet
+	#	(run () clears tickPending after the update for the last tick is done)
+	#
+	# returns the current delay so the task follows the pace set by run ()
+
+	def PostTick (self):
+		if not self.tickPending:
+			self.tickPending = True
+			try:
+				self.GitHubVersionQueue.put ( ('TICK', 'local'), block=False )
+			except queue.Full:
+				self.tickPending = False
+		return self.tickDelay
+
+
 	#	UpdateGitHubVersion run ()
 	#
 	# updates GitHub versions
@@ -2267,8 +4230,9 @@ class UpdateGitHubVersionClass (threading.Thread):
 	#	detect the stop request immediately
 	#
 	# run () blocks on reading from our queue
-	#	the timeout for the queue pull paces the version fetches
-	#	normally, the timeout will occur with the queue empty
+	#	the Scheduler posts a 'TICK' to pace the version fetches
+	#		run () sets the time of the next tick after each pass
+	#	normally, the tick will arrive with the queue otherwise empty
 	#		in which case we update the next GitHub version for the next package
 	#	the time between version fetches changes
 	#		for the first pass, a shorter delay is used
@@ -2299,6 +4263,7 @@ class UpdateGitHubVersionClass (threading.Thread):
 		forcedRefresh = True
 
 		packageListLength = 0
+		tickTaken = False
 		
 		while self.threadRunning:
 			downloadMode = DbusIf.GetAutoDownloadMode ()
@@ -2319,13 +4284,25 @@ class UpdateGitHubVersionClass (threading.Thread):
 				if packageListLength != 0:
 					delay /= packageListLength
 			# queue gets STOP and REFRESH commands or priority package name
-			# empty queue signals it's time for a background update
-			# queue timeout is used to pace background updates
+			# TICK signals it's time for a background update
+			# the Scheduler paces background updates
+			self.tickDelay = delay
+			Scheduler.Reschedule ('gitHubVersion', delay)
+			# the tick pulled on the last pass is cleared only after the next one is scheduled
+			#	so no tick is queued while the update for the last one is running
+			if tickTaken:
+				self.tickPending = False
+				tickTaken = False
 			command = ""
 			source = ""
 			packageName = ""
 			try:
-				(command, source) = self.GitHubVersionQueue.get (timeout = delay)
+				queueEntry = GetFromQueue (self.GitHubVersionQueue)
+				if queueEntry[0] == 'TICK':
+					tickTaken = True
+					queueEntry = ( '', '' )
+				command = queueEntry[0]
+				source = queueEntry[1]
 				parts = command.split (":")
 				length = len (parts)
 				if length >= 1:
@@ -2408,7 +4385,9 @@ class UpdateGitHubVersionClass (threading.Thread):
 					gitHubVersionPackageIndex = 0
 					# notify the main loop that all versions have been refreshed and
 					# download modes can now be changed if appropriate
-					WaitForGitHubVersions = False
+					if WaitForGitHubVersions:
+						WaitForGitHubVersions = False
+						MarkPackageDirty ()
 					forcedRefresh = False
 				DbusIf.UNLOCK ("UpdateGitHubVersion run 2")
 
@@ -2474,13 +4453,15 @@ class DownloadGitHubPackagesClass (threading.Thread):
 		errorMessage = None
 		errorDetails = None
 		downloadError = False
+		downloadStarted = False
+		downloadBytes = 0
 
 		if packageName == None or packageName == "":
 			logging.error ("GitHubDownload: no package name specified")
 			downloadError = True
 
 		if not downloadError:
-			packagePath = "/data/" + packageName
+			packagePath = DataRoot + "/" + packageName
 			tempPackagePath = packagePath + "-temp"
 
 			DbusIf.LOCK ("GitHubDownload - get GitHub user/branch")
@@ -2491,7 +4472,7 @@ class DownloadGitHubPackagesClass (threading.Thread):
 
 			DbusIf.UpdateStatus ( message="downloading " + packageName, where=where, logLevel=INFO )
 
-			tempDirectory = "/data/PmDownloadTemp"
+			tempDirectory = DataRoot + "/PmDownloadTemp"
 			if not os.path.exists (tempDirectory):
 				os.mkdir (tempDirectory)
 
@@ -2501,7 +4482,9 @@ class DownloadGitHubPackagesClass (threading.Thread):
 			if os.path.exists (tempArchiveFile):
 				os.remove ( tempArchiveFile )
 
-			url = "https://github.com/" + gitHubUser + "/" + packageName  + "/archive/" + gitHubBranch  + ".tar.gz"
+			url = GitHubUrl + "/" + gitHubUser + "/" + packageName  + "/archive/" + gitHubBranch  + ".tar.gz"
+			Stats.DownloadStarted ()
+			downloadStarted = True
 			try:
 				proc = subprocess.Popen ( ['wget', '--timeout=120', '-qO', tempArchiveFile, url ],
 									bufsize=-1, stdout=subprocess.PIPE, stderr=subprocess.PIPE )
@@ -2518,6 +4501,11 @@ class DownloadGitHubPackagesClass (threading.Thread):
 					if stderr != "":
 						errorDetails +=  " stderr:" + stderr
 					downloadError = True
+				else:
+					try:
+						downloadBytes = os.path.getsize (tempArchiveFile)
+					except OSError:
+						pass
 		if not downloadError:
 			try:
 				proc = subprocess.Popen ( ['tar', '-xzf', tempArchiveFile, '-C', tempDirectory ],
@@ -2580,6 +4568,9 @@ class DownloadGitHubPackagesClass (threading.Thread):
 					package.UpdateVersionsAndFlags (doConflictChecks=True, doScriptPreChecks=True)
 		DbusIf.UNLOCK ("GitHubDownload - update status")
 
+		if downloadStarted:
+			Stats.DownloadDone (not downloadError, downloadBytes)
+
 		# report errors / success
 		if errorMessage != None:
 			logging.error (errorMessage)
@@ -2658,7 +4649,7 @@ class DownloadGitHubPackagesClass (threading.Thread):
 			# process one GUI download request
 			# if there was one, skip auto downloads until next pass
 			try:
-				command = self.DownloadQueue.get () # block forever
+				command = GetFromQueue (self.DownloadQueue) # block forever
 			except:
 				logging.error ("pull from DownloadQueue queue failed")
 				time.sleep (5.0)
@@ -2666,8 +4657,12 @@ class DownloadGitHubPackagesClass (threading.Thread):
 			if command[0] == 'STOP' or self.threadRunning == False:
 				return
 
-			# separate command, source tuple
+			# separate command, source, jobId tuple
 			# and separate action and packageName
+			if len (command) >= 3:
+				jobId = command[2]
+			else:
+				jobId = None
 			if len (command) >= 2:
 				parts = command[0].split (":")
 				if len (parts) >= 2:
@@ -2675,19 +4670,26 @@ class DownloadGitHubPackagesClass (threading.Thread):
 					packageName = parts[1].strip ()
 				else:
 					logging.error ("DownloadQueue - no action and/or package name - discarding", command)
+					JobJournal.Finish (jobId)
 					continue
 				source = command[1]
 			else:
 				logging.error ("DownloadQueue - no command and/or source - discarding", command)
+				JobJournal.Finish (jobId)
 				continue
 
 			# invalid action for this queue
 			if action != 'download':
 				logging.error ("received invalid command from Install queue: ", command )
+				JobJournal.Finish (jobId)
 				continue
 
 			# do the download here
+			JobJournal.Start (jobId)
 			self.GitHubDownload (packageName=packageName, source=source )
+			JobJournal.Finish (jobId)
+			# new package version may trigger an install
+			MarkPackageDirty (packageName)
 		# end while True
 	# end run
 # end DownloadGitHubPackagesClass
@@ -2699,6 +4701,8 @@ class DownloadGitHubPackagesClass (threading.Thread):
 #
 #	Methods:
 #		InstallPackage
+#		runSetup
+#		CancelSetup
 #		ResolveConflicts
 #		run (the thread)
 #		StopThread
@@ -2707,6 +4711,12 @@ class DownloadGitHubPackagesClass (threading.Thread):
 # runs as a separate thread since the operations can take a long time
 # 	and we need to space them to avoid consuming all CPU resources
 #
+# setup scripts are run at a reduced CPU and IO priority
+#	so they don't compete with the GUI and other services on single core GX devices
+#	if a timeout is set, a setup script that runs longer is terminated (SIGTERM)
+#	then killed (SIGKILL) if it does not exit shortly after that
+#	there is no timeout by default - a script killed part way through can leave files half installed
+#
 # packages are automatically installed only
 #	if the autoInstall Setting is active
 #	package version is newer than installed version
@@ -2714,13 +4724,139 @@ class DownloadGitHubPackagesClass (threading.Thread):
 #
 #	a manual install is performed regardless of versions
 
-class InstallPackagesClass (threading.Thread):
+# seconds to wait after terminating a setup script before killing it
+SETUP_KILL_DELAY = 10.0
+
+class InstallPackagesClass (threading.Thread):
+
+	def __init__(self):
+		threading.Thread.__init__(self)
+		DbusIf.SetPmStatus ("")
+		self.threadRunning = True
+		self.InstallQueue = queue.Queue (maxsize = 10)
+		# name of the package whose setup script is running (None if idle)
+		self.setupPackageName = None
+		self.cancelSetup = False
+		# packages whose pending install/uninstall/check should be skipped
+		#	a set so adding (CancelSetup) and removing (run) are single operations in either thread
+		self.cancelPending = set ()
+		# resources used by the last setup script run for each package
+		#	packageName: ( action, returnCode, wallTime, cpuTime, maxRss )
+		self.SetupRunStats = {}
+
+
+	#	CancelSetup
+	#
+	# called from PushAction (the GuiEditAction handler thread)
+	#
+	# if the package's setup script is running, it is terminated
+	# if an install/uninstall/check for the package is waiting in the install queue
+	#	it will be skipped when it is pulled from the queue
+	#
+	# an empty packageName cancels the running setup script, whatever the package
+	#
+	# returns True if there was something to cancel
+
+	def CancelSetup (self, packageName):
+		runningPackage = self.setupPackageName
+		if runningPackage != None and ( packageName == "" or packageName == runningPackage ):
+			logging.warning ("canceling " + runningPackage + " setup script")
+			self.cancelSetup = True
+			return True
+
+		DbusIf.LOCK ("CancelSetup")
+		package = PackageClass.LocatePackage (packageName)
+		if package != None and package.InstallPending:
+			self.cancelPending.add (packageName)
+			logging.warning ("canceling pending operation for " + packageName)
+			canceled = True
+		else:
+			canceled = False
+		DbusIf.UNLOCK ("CancelSetup")
+		return canceled
+
 
-	def __init__(self):
-		threading.Thread.__init__(self)
-		DbusIf.SetPmStatus ("")
-		self.threadRunning = True
-		self.InstallQueue = queue.Queue (maxsize = 10)
+	#	runSetup
+	#
+	# runs the package's setup script with the priority and timeout from dbus Settings
+	#	stdout lines are forwarded to the log
+	#
+	# the script runs in it's own process group so that the script and
+	#	anything it started are terminated together
+	#
+	# resource usage is taken from getrusage (RUSAGE_CHILDREN) before and after the run
+	#	CPU time is the difference, so includes any other child processes
+	#	(e.g., wget) that finished during the run
+	#	max RSS is the largest of all child processes so far
+	#
+	# returns ( returnCode, stderr, stopReason )
+	#	stopReason is "" if the script exited on it's own
+	#		otherwise the reason it was stopped
+	#	exceptions from starting the script are passed to the caller
+
+	def runSetup (self, packageName, setupFile, action):
+		( nice, ioClass, ioLevel ) = DbusIf.GetSetupScriptPriority ()
+		timeout = DbusIf.GetSetupScriptTimeout ()
+
+		command = [ setupFile, action, 'runFromPm' ]
+		if nice > 0 and shutil.which ("nice") != None:
+			command = [ 'nice', '-n', str (nice) ] + command
+		if ioClass > 0 and shutil.which ("ionice") != None:
+			ioPriority = [ 'ionice', '-c', str (ioClass) ]
+			# realtime and best effort classes have a priority level
+			if ioClass < 3:
+				ioPriority += [ '-n', str (ioLevel) ]
+			command = ioPriority + command
+
+		startUsage = resource.getrusage (resource.RUSAGE_CHILDREN)
+		startTime = time.time ()
+		self.cancelSetup = False
+		self.setupPackageName = packageName
+		proc = subprocess.Popen ( command, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True,
+									start_new_session=True )
+		stopReason = ""
+		terminateTime = None
+		while True:
+			try:
+				stdout, stderr = proc.communicate (timeout=1.0)
+				break
+			except subprocess.TimeoutExpired:
+				pass
+			currentTime = time.time ()
+			if terminateTime == None:
+				if self.cancelSetup:
+					stopReason = "canceled"
+				elif timeout > 0 and currentTime - startTime > timeout:
+					stopReason = "timed out after " + str (timeout) + " seconds"
+				if stopReason != "":
+					logging.warning (packageName + " setup " + action + " " + stopReason + " - terminating")
+					terminateTime = currentTime
+					try:
+						os.killpg (proc.pid, signal.SIGTERM)
+					except ProcessLookupError:
+						pass
+			elif currentTime - terminateTime > SETUP_KILL_DELAY:
+				logging.warning (packageName + " setup " + action + " did not exit - killing")
+				try:
+					os.killpg (proc.pid, signal.SIGKILL)
+				except ProcessLookupError:
+					pass
+				# SIGKILL can't be ignored so don't send it again
+				terminateTime = float ('inf')
+		self.setupPackageName = None
+		self.cancelSetup = False
+
+		wallTime = time.time () - startTime
+		endUsage = resource.getrusage (resource.RUSAGE_CHILDREN)
+		cpuTime = ( endUsage.ru_utime + endUsage.ru_stime ) - ( startUsage.ru_utime + startUsage.ru_stime )
+		maxRss = endUsage.ru_maxrss
+		self.SetupRunStats[packageName] = ( action, proc.returncode, wallTime, cpuTime, maxRss )
+		logging.info ("%s setup %s: wall %.1f s, CPU %.1f s, max RSS %d kB" % ( packageName, action, wallTime, cpuTime, maxRss ))
+
+		# forward stdout lines from setup script to console/log file
+		for line in stdout.splitlines ():
+			logging.info ( line.strip () )
+		return ( proc.returncode, stderr, stopReason )
 
 	
 	#	InstallPackage
@@ -2768,7 +4904,7 @@ class InstallPackagesClass (threading.Thread):
 		elif source == 'AUTO':
 			sendStatusTo = 'PmStatus'
 
-		packageDir = "/data/" + packageName
+		packageDir = DataRoot + "/" + packageName
 		if not os.path.isdir (packageDir):
 			errorMessage = "no package directory " + packageName
 			logging.error ("InstallPackage - " + errorMessage)
@@ -2801,18 +4937,10 @@ class InstallPackagesClass (threading.Thread):
 		DbusIf.UNLOCK ("InstallPackage normal")
 
 		DbusIf.UpdateStatus ( message=action + "ing " + packageName, where=sendStatusTo, logLevel=INFO )
+		stopReason = ""
 		try:
-			proc = subprocess.Popen ( [ setupFile, action, 'runFromPm' ],
-										bufsize=100000, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True )
-			proc.wait ()
-			# forward stdout lines from setup script to console/log file
-			for line in proc.stdout:
-				logging.info ( line.strip () )
-			# collect stderr lines for possible use later
-			stderr = ""
-			for line in proc.stderr:
-				stderr += line
-			returnCode = proc.returncode
+			# stderr is collected for possible use later
+			returnCode, stderr, stopReason = self.runSetup (packageName, setupFile, action)
 			setupRunFail = False
 		except:
 			setupRunFail = True
@@ -2823,9 +4951,16 @@ class InstallPackagesClass (threading.Thread):
 		package = PackageClass.LocatePackage (packageName)
 		package.InstallPending = False
 
+		if setupRunFail:
+			Stats.SetupDone (action, runFailed=True)
+		else:
+			Stats.SetupDone (action, returnCode, stopped=stopReason != "")
+
 		errorMessage = ""
 		if setupRunFail:
 			errorMessage = "could not run setup"
+		elif stopReason != "":
+			errorMessage = stopReason
 		elif returnCode == EXIT_SUCCESS:
 			DbusIf.UpdateStatus ( message="", where=sendStatusTo )
 			if source == 'GUI':
@@ -2901,6 +5036,11 @@ class InstallPackagesClass (threading.Thread):
 
 		package.UpdateVersionsAndFlags ()
 
+		# save the check result so the check can be skipped until it's inputs change
+		#	(versions are refreshed above because they are part of the inputs)
+		if action == 'check' and not setupRunFail and stopReason == "":
+			ScriptCheckCache.Store (packageName, package.ScriptCheckKey (), returnCode, errorMessage)
+
 		DbusIf.UNLOCK ("InstallPackage - update status")
 	# end InstallPackage ()
 
@@ -2994,7 +5134,7 @@ class InstallPackagesClass (threading.Thread):
 	def run (self):
 		while self.threadRunning:
 			try:
-				command = self.InstallQueue.get ()
+				command = GetFromQueue (self.InstallQueue)
 			except:
 				logging.error ("pull from Install queue failed")
 				continue
@@ -3005,8 +5145,12 @@ class InstallPackagesClass (threading.Thread):
 			if command[0] == 'STOP' or self.threadRunning == False:
 				return
 
-			# separate command, source tuple
+			# separate command, source, jobId tuple
 			# and separate action and packageName
+			if len (command) >= 3:
+				jobId = command[2]
+			else:
+				jobId = None
 			if len (command) >= 2:
 				parts = command[0].split (":")
 				if len (parts) >= 2:
@@ -3014,14 +5158,29 @@ class InstallPackagesClass (threading.Thread):
 					packageName = parts[1].strip ()
 				else:
 					logging.error ("InstallQueue - no action and/or package name - discarding", command)
+					JobJournal.Finish (jobId)
 					continue
 				source = command[1]
 			else:
 				logging.error ("InstallQueue - no command and/or source - discarding", command)
+				JobJournal.Finish (jobId)
 				continue
 
+			JobJournal.Start (jobId)
+			# operation was canceled while it was waiting in the queue
+			if packageName in self.cancelPending:
+				self.cancelPending.discard (packageName)
+				logging.warning (action + " " + packageName + " canceled")
+				DbusIf.LOCK ("InstallPackages run")
+				package = PackageClass.LocatePackage (packageName)
+				if package != None:
+					package.InstallPending = False
+				DbusIf.UNLOCK ("InstallPackages run")
+				# the cancel request has already acknowledged the GUI
+				if source == 'GUI':
+					DbusIf.UpdateStatus ( message=action + " " + packageName + " canceled", where='Editor' )
 			# resolve conflicts may cause OTHER packages to install or uninstall
-			if action == 'resolveConflicts':
+			elif action == 'resolveConflicts':
 				self.ResolveConflicts (packageName=packageName, source=source)
 			# otherwise use InstallPackage to install, uninstall, or check the package
 			elif action == 'install' or action == 'uninstall' or action == 'check':
@@ -3030,7 +5189,12 @@ class InstallPackagesClass (threading.Thread):
 			# invalid action for this queue
 			else:
 				logging.error ("received invalid command from Install queue: ", command )
-				continue
+			JobJournal.Finish (jobId)
+			# resolving conflicts may change other packages so check them all
+			if action == 'resolveConflicts':
+				MarkPackageDirty ()
+			else:
+				MarkPackageDirty (packageName)
 	# end run
 # end InstallPackagesClass
 
@@ -3069,6 +5233,16 @@ class InstallPackagesClass (threading.Thread):
 #	these are described in detail at the beginning of this file
 #	scans for flag files is done in run ()
 
+# time a media transfer status message stays visible
+MEDIA_STATUS_HOLD_TIME = 5.0
+
+#	clearMediaStatus
+#
+# Scheduler task - clears the media status after a transfer
+
+def clearMediaStatus ():
+	DbusIf.UpdateStatus ( message="", where='Media')
+
 class MediaScanClass (threading.Thread):
 
 
@@ -3078,14 +5252,19 @@ class MediaScanClass (threading.Thread):
 	#
 	#	if true, autoInstallOverride causes the ONE_TIME_INSTALL flag to be set
 	#		this happens if the caller detects the AUTO_INSTALL_PACKAGES flag on removable media
+	#
+	#	the status is cleared by the Scheduler MEDIA_STATUS_HOLD_TIME after the transfer
+	#		rather than holding up the thread
 
 	def transferPackage (self, path, autoInstallOverride=False):
 		packageName = os.path.basename (path).split ('-', 1)[0]
+		# keep the status from a previous transfer from being cleared during this one
+		Scheduler.Cancel ('clearMediaStatus')
 
 		# create an empty temp directory in ram disk
 		#	for the following operations
 		# directory is unique to this process and thread
-		tempDirectory = "/var/run/packageManager" + str(os.getpid ()) + "Media"
+		tempDirectory = VarRunRoot + "/packageManager" + str(os.getpid ()) + "Media"
 		if os.path.exists (tempDirectory):
 			shutil.rmtree (tempDirectory)
 		os.mkdir (tempDirectory)
@@ -3100,16 +5279,14 @@ class MediaScanClass (threading.Thread):
 		except:
 			DbusIf.UpdateStatus ( message="tar failed for " + packageName,
 									where='Media', logLevel=ERROR)
-			time.sleep (5.0)
-			DbusIf.UpdateStatus ( message="", where='Media')
+			Scheduler.RunOnce ('clearMediaStatus', MEDIA_STATUS_HOLD_TIME, clearMediaStatus)
 			return False
 		if returnCode != 0:
 			DbusIf.UpdateStatus ( message="could not unpack " + packageName + " from SD/USB media",
 									where='Media', logLevel=ERROR)
 			logging.error ("stderr: " + stderr)
 			shutil.rmtree (tempDirectory)
-			time.sleep (5.0)
-			DbusIf.UpdateStatus ( message="", where='Media')
+			Scheduler.RunOnce ('clearMediaStatus', MEDIA_STATUS_HOLD_TIME, clearMediaStatus)
 			return False
 
 		# attempt to locate a package directory in the tree below tempDirectory
@@ -3118,12 +5295,11 @@ class MediaScanClass (threading.Thread):
 		if unpackedPath == None:
 			logging.warning (packageName + " archive doesn't contain a package directory - rejected" )
 			shutil.rmtree (tempDirectory)
-			time.sleep (5.0)
-			DbusIf.UpdateStatus ( message="", where='Media')
+			Scheduler.RunOnce ('clearMediaStatus', MEDIA_STATUS_HOLD_TIME, clearMediaStatus)
 			return False
 
 		# compare versions and proceed only if they are different
-		packagePath = "/data/" + packageName
+		packagePath = DataRoot + "/" + packageName
 		try:
 			fd = open (packagePath + "/version", 'r')
 		except:
@@ -3168,17 +5344,71 @@ class MediaScanClass (threading.Thread):
 
 		DbusIf.UNLOCK ("transferPackage")
 		shutil.rmtree (tempDirectory, ignore_errors=True)
-		time.sleep (5.0)
-		DbusIf.UpdateStatus ( message="", where='Media')
+		Scheduler.RunOnce ('clearMediaStatus', MEDIA_STATUS_HOLD_TIME, clearMediaStatus)
 		return True
 	# end transferPackage
 
 
 	def __init__(self):
 		threading.Thread.__init__(self)
-		self.MediaQueue = queue.Queue (maxsize = 10) # used only for STOP
+		self.MediaQueue = queue.Queue (maxsize = 10) # used only for STOP and TICK
 		self.threadRunning = True
+		self.tickPending = False
 		self.AutoUninstall = False
+		# settingsList file contents - reread only if the file changes
+		self.settingsList = []
+		self.settingsListTime = 0
+
+	#	readSettingsList
+	#
+	# returns the list of dbus /Settings to backup and restore (in file order)
+	#	the file is only read again if it has changed
+
+	def readSettingsList (self, settingsListFile):
+		fileTime = os.path.getmtime (settingsListFile)
+		if fileTime != self.settingsListTime:
+			# a dict drops duplicates and keeps file order
+			settings = {}
+			with open (settingsListFile, 'r') as listFile:
+				for line in listFile:
+					setting = line.strip ()
+					if setting != "":
+						settings[setting] = True
+			self.settingsList = list (settings)
+			self.settingsListTime = fileTime
+		return self.settingsList
+
+	#	readSettingsTree
+	#
+	# fetches all dbus /Settings with a single call
+	#	returns a dictionary: { path: { 'Value': value, ... } }
+	#	the properties other than 'Value' depend on the localsettings version
+	#
+	# GetItems on the root is used if localsettings supports it
+	#	otherwise GetValue on /Settings which returns values only
+	# the dbus exception is passed on if neither call works
+
+	def readSettingsTree (self, bus):
+		try:
+			items = bus.call_blocking ("com.victronenergy.settings", '/', None, 'GetItems', '', [])
+			return { str (path): properties for path, properties in items.items () }
+		except dbus.exceptions.DBusException:
+			pass
+		values = bus.call_blocking ("com.victronenergy.settings", '/Settings', None, 'GetValue', '', [])
+		return { '/Settings/' + str (path).lstrip ('/'): { 'Value': value } for path, value in values.items () }
+
+	#	getSettingAttributes
+	#
+	# returns the ( default, min, max, silent ) attributes for a setting
+	#	from the settings tree if it includes them, otherwise from dbus
+	#
+	# attributes fetched from dbus are not kept between backups
+	#	they change if a package or setup script adds the setting again with different attributes
+
+	def getSettingAttributes (self, bus, setting, properties):
+		if 'Default' in properties and 'Min' in properties and 'Max' in properties:
+			return ( properties['Default'], properties['Min'], properties['Max'], properties.get ('Silent', 0) )
+		return bus.call_blocking ("com.victronenergy.settings", setting, None, 'GetAttributes', '', [])
 
 	#
 	#	settingsBackup
@@ -3198,58 +5428,61 @@ class MediaScanClass (threading.Thread):
 		overlayCount = 0
 		logsWritten = "no logs"
 
-		settingsListFile = "/data/SetupHelper/settingsList"
+		settingsListFile = DataRoot + "/SetupHelper/settingsList"
 		backupFile = backupPath + "/settingsBackup"
+		startTime = time.time ()
 		try:
 			if not os.path.exists (settingsListFile):
 				logging.error (settingsListFile + " does not exist - can't backup settings")
 				return
 
 			# backup settings
-			backupSettings = open (backupFile, 'w')
 			bus = dbus.SystemBus()
-			with open (settingsListFile, 'r') as listFile:
-				for line in listFile:
-					setting = line.strip()
-					try:
-						value =  bus.get_object("com.victronenergy.settings", setting).GetValue()
-						attributes = bus.get_object("com.victronenergy.settings", setting).GetAttributes()
-					except:
-						continue
-					dataType = type (value)
-					if dataType is dbus.Double:
-						typeId = 'f'
-					elif dataType is dbus.Int32 or dataType is dbus.Int64:
-						typeId = 'i'
-					elif dataType is dbus.String:
-						typeId = 's'
-					else:
-						typeId = ''
-						logging.error ("settingsBackup - invalid data type " + typeId + " - can't include parameter attributes " + setting)
+			settingsList = self.readSettingsList (settingsListFile)
+			settingsTree = self.readSettingsTree (bus)
+			backupSettings = open (backupFile, 'w')
+			for setting in settingsList:
+				if setting not in settingsTree:
+					continue
+				try:
+					value = settingsTree[setting]['Value']
+					attributes = self.getSettingAttributes (bus, setting, settingsTree[setting])
+				except:
+					continue
+				dataType = type (value)
+				if dataType is dbus.Double:
+					typeId = 'f'
+				elif dataType is dbus.Int32 or dataType is dbus.Int64:
+					typeId = 'i'
+				elif dataType is dbus.String:
+					typeId = 's'
+				else:
+					typeId = ''
+					logging.error ("settingsBackup - invalid data type " + typeId + " - can't include parameter attributes " + setting)
 
-					value = str ( value )
-					default = str (attributes[0])
-					min = str (attributes[1])
-					max = str (attributes[2])
-					silent = str (attributes[3])
-					
-					# create entry with just settng path and value without a valid data type
-					if typeId == '':
-						line = ','.join ( [ setting, value ]) + '\n'
-					else:
-						line = ','.join ( [ setting, value, typeId, default, min, max, silent ]) + '\n'
+				value = str ( value )
+				default = str (attributes[0])
+				min = str (attributes[1])
+				max = str (attributes[2])
+				silent = str (attributes[3])
+				
+				# create entry with just settng path and value without a valid data type
+				if typeId == '':
+					line = ','.join ( [ setting, value ]) + '\n'
+				else:
+					line = ','.join ( [ setting, value, typeId, default, min, max, silent ]) + '\n'
 
-					backupSettings.write (line)
-					settingsCount += 1
+				backupSettings.write (line)
+				settingsCount += 1
 
 			backupSettings.close ()
-			listFile.close ()
 		except:
 			logging.error ("settings backup - settings write failure")
+		settingsTime = time.time () - startTime
 		
 		if not settingsOnly:
 			# backup logo overlays
-			overlaySourceDir = "/data/themes/overlay"
+			overlaySourceDir = DataRoot + "/themes/overlay"
 			overlayDestDir = backupPath + "/logoBackup"
 
 			
@@ -3279,7 +5512,7 @@ class MediaScanClass (threading.Thread):
 				if os.path.isdir (logDestDir):
 					shutil.rmtree (logDestDir)
 
-				proc = subprocess.Popen ( [ 'zip', '-rq', backupPath + "/logs.zip", "/data/log" ],
+				proc = subprocess.Popen ( [ 'zip', '-rq', backupPath + "/logs.zip", DataRoot + "/log" ],
 										bufsize=-1, stdout=subprocess.PIPE, stderr=subprocess.PIPE )
 				proc.commiunicate()	#output ignored
 				returnCode = proc.returncode
@@ -3291,7 +5524,7 @@ class MediaScanClass (threading.Thread):
 
 
 			# backup setup script options
-			optionsSourceDir = "/data/setupOptions"
+			optionsSourceDir = DataRoot + "/setupOptions"
 			optionsDestDir = backupPath + "/setupOptions"
 
 			try:
@@ -3305,80 +5538,179 @@ class MediaScanClass (threading.Thread):
 				logging.error ("settings backup - overlays write failure")
 		
 		logging.info ("settings backup completed - " + str(settingsCount) + " settings, " + str (overlayCount) + " logos, "
-							+ logsWritten )
+							+ logsWritten + " (settings took " + "{:.2f}".format (settingsTime) + " seconds)" )
+
+
+	#	restoreValue
+	#
+	# converts a value from the settingsBackup file (text) to the type given by typeId
+	#	'i' integer, 'f' float, 's' or '' string
+	# returns the text unchanged if it can't be converted
+
+	def restoreValue (self, text, typeId):
+		try:
+			if typeId == 'i':
+				return int (text)
+			elif typeId == 'f':
+				return float (text)
+		except ValueError:
+			pass
+		return text
+
+	#	restoreTypeId
+	#
+	# returns the typeId for the current value of a setting
+
+	def restoreTypeId (self, value):
+		if type (value) is dbus.Double:
+			return 'f'
+		elif type (value) is dbus.Int32 or type (value) is dbus.Int64:
+			return 'i'
+		else:
+			return 's'
+
+	#	createSettings
+	#
+	# creates missing settings: a list of ( path, default, typeId, min, max, silent )
+	#	with one AddSettings call if localsettings supports it
+	#	otherwise with one AddSetting / AddSilentSetting call per setting
+	# returns the list of paths that were created
 
+	def createSettings (self, bus, newSettings):
+		created = []
+		try:
+			settings = []
+			for ( path, default, typeId, min, max, silent ) in newSettings:
+				setting = { 'path': path, 'default': default, 'silent': silent }
+				if typeId != 's':
+					setting['min'] = min
+					setting['max'] = max
+				settings.append (setting)
+			results = bus.call_blocking ("com.victronenergy.settings", '/', 'com.victronenergy.Settings',
+							'AddSettings', 'aa{sv}', [ settings ])
+			for result in results:
+				path = str (result.get ('path', ""))
+				if result.get ('error', 0) != 0:
+					logging.error ("settingsRestore: settings create failed for " + path)
+				else:
+					created.append (path)
+			return created
+		except dbus.exceptions.DBusException:
+			logging.info ("settingsRestore: AddSettings not available - creating settings one at a time")
+
+		for ( path, default, typeId, min, max, silent ) in newSettings:
+			if silent:
+				method = 'AddSilentSetting'
+			else:
+				method = 'AddSetting'
+			try:
+				bus.call_blocking ("com.victronenergy.settings", '/Settings', 'com.victronenergy.Settings',
+						method, 'ssvsvv', [ '', path.replace ('/Settings/', '', 1), default, typeId, min, max ])
+				created.append (path)
+			except dbus.exceptions.DBusException:
+				logging.error ("settingsRestore: settings create failed for " + path)
+		return created
+
+	#	settingsRestore
+	#
+	# the current settings are read with one call and compared with the backup
+	#	settings that are missing are created together
+	#	then only values that differ from the current (or new default) value are written
 
 	def settingsRestore (self, backupPath, settingsOnly = False):
 		backupFile = backupPath + "/settingsBackup"
 		if not os.path.exists (backupFile):
 			logging.error (backupFile + " does not exist - can't restore settings")
+			return
 		bus = dbus.SystemBus()
-		settingsCount = 0
+		startTime = time.time ()
+		changedCount = 0
+		createdCount = 0
+		skippedCount = 0
 		overlayCount = 0
 
+		try:
+			settingsTree = self.readSettingsTree (bus)
+		except dbus.exceptions.DBusException:
+			logging.error ("settingsRestore: can't read current settings")
+			settingsTree = None
+
+		# { path: value } for settings to be written
+		newValues = {}
+		# ( path, default, typeId, min, max, silent ) for settings to be created
+		newSettings = []
+		if settingsTree != None:
+			with open (backupFile, 'r') as fd:
+				for line in fd:
+					# ( setting path, value, attributes)
+					parts = line.strip().split (',')
+					numberOfParts = len (parts)
+					# full entry with attributes
+					if numberOfParts == 7:
+						typeId = parts[2]
+						default = parts[3]
+						min = parts[4]
+						max = parts[5]
+						silent = parts[6]
+					# only path and name - old settings file format
+					elif numberOfParts == 2:
+						typeId = ''
+						default = ''
+						min = ''
+						max = ''
+						silent = ''
+					else:
+						logging.error ("settingsRestore: invalid line in file " + line)
+						continue
+					
+					path = parts[0]
+					value = parts[1]
 
-		with open (backupFile, 'r') as fd:
-			for line in fd:
-				parameterExists = False
-				# ( setting path, value, attributes)
-				parts = line.strip().split (',')
-				numberOfParts = len (parts)
-				# full entry with attributes
-				if numberOfParts == 7:
-					typeId = parts[2]
-					default = parts[3]
-					min = parts[4]
-					max = parts[5]
-					silent = parts[6]
-				# only path and name - old settings file format
-				elif numberOfParts == 2:
-					typeId = ''
-					default = ''
-					min = ''
-					max = ''
-					silent = ''
-				else:
-					logging.error ("settingsRestore: invalid line in file " + line)
-					continue
-				
-				path = parts[0]
-				value = parts[1]
-				try:
-					bus.get_object("com.victronenergy.settings", path).GetValue()
-					parameterExists = True
-				except:
-					pass
-
-				if not parameterExists:
-					if typeId == '':
-						logging.error ("settingsRestore: no attributes in settingsBackup file - can't create " + path)
+					if path in settingsTree:
+						currentValue = settingsTree[path]['Value']
+						if str (currentValue) == value:
+							skippedCount += 1
+						else:
+							newValues[path] = self.restoreValue (value, self.restoreTypeId (currentValue))
 					# parameter does not yet exist, create it
+					elif typeId == '':
+						logging.error ("settingsRestore: no attributes in settingsBackup file - can't create " + path)
 					else:
-						# silent uses a different method
-						if silent == 1:
-							method = 'AddSettingSilent'
+						if typeId != 's':
+							min = self.restoreValue (min, typeId)
+							max = self.restoreValue (max, typeId)
 						else:
-							method = 'AddSetting'
-
-						try:
-							proc = subprocess.Popen ( [ 'dbus', '-y', 'com.victronenergy.settings', '/', method, '',
-											path, default, typeId, min, max ], 
-											bufsize=-1, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
-							proc.commiunicate ()	# output ignored
-							parameterExists = True
-							logging.info ("settingsRestore: creating " + path)
-						except:
-							logging.error ("settingsRestore: settings create failed for " + path)
-
-				# update parameter's value if it exists (or was just created)
-				if parameterExists:
-					bus.get_object("com.victronenergy.settings", path).SetValue (value)
-					settingsCount += 1
+							min = 0
+							max = 0
+						newSettings.append ( ( path, self.restoreValue (default, typeId), typeId, min, max,
+												silent == '1' or silent == 'True' ) )
+						# new settings start with the default value so only need to be written if different
+						if value != default:
+							newValues[path] = self.restoreValue (value, typeId)
+
+			if len (newSettings) > 0:
+				created = self.createSettings (bus, newSettings)
+				createdCount = len (created)
+				for path in created:
+					logging.info ("settingsRestore: created " + path)
+				# don't try to write settings that couldn't be created
+				for ( path, default, typeId, min, max, silent ) in newSettings:
+					if path not in created:
+						newValues.pop (path, None)
+
+			for path, value in newValues.items ():
+				try:
+					bus.call_blocking ("com.victronenergy.settings", path, 'com.victronenergy.BusItem',
+								'SetValue', 'v', [ wrap_dbus_value (value) ])
+					changedCount += 1
+				except dbus.exceptions.DBusException:
+					logging.error ("settingsRestore: can't set " + path)
+		settingsTime = time.time () - startTime
 
 		if not settingsOnly:
 			# restore logo overlays
 			overlaySourceDir = backupPath + "/logoBackup"
-			overlayDestDir = "/data/themes/overlay"
+			overlayDestDir = DataRoot + "/themes/overlay"
 			if os.path.isdir (overlaySourceDir):
 				overlayFiles = os.listdir (overlaySourceDir)
 				if len (overlayFiles) > 0:
@@ -3396,7 +5728,7 @@ class MediaScanClass (threading.Thread):
 
 			# restore setup script options
 			optionsSourceDir = backupPath + "/setupOptions"
-			optionsDestDir = "/data/setupOptions"
+			optionsDestDir = DataRoot + "/setupOptions"
 
 			# remove any previous options backups
 			if os.path.isdir (optionsDestDir):
@@ -3408,7 +5740,9 @@ class MediaScanClass (threading.Thread):
 				except:
 					logging.error ("settingsRestore: options restore failed")
 		
-		logging.info ("settings restore completed - " + str(settingsCount) + " settings and " + str (overlayCount) + " overlays")
+		logging.info ("settings restore completed - " + str (changedCount) + " changed, " + str (createdCount) + " created, "
+						+ str (skippedCount) + " unchanged settings and " + str (overlayCount) + " overlays"
+						+ " (settings took " + "{:.2f}".format (settingsTime) + " seconds)")
 
 
 	#	Media Scan run (the thread)
@@ -3418,16 +5752,30 @@ class MediaScanClass (threading.Thread):
 	#	the main method should catch the tread with join ()
 	# StopThread () is called to shut down the thread
 	#
-	# a queue with set timeout is used to pace operations
+	# a 'TICK' posted by the Scheduler every 5 seconds is used to pace operations
 	#	 this gives other threads time away from slower media scanning operations
 
 	def StopThread (self):
 		self.threadRunning = False
 		self.MediaQueue.put  ( "STOP", block=False )
 
+	#	PostTick
+	#
+	# Scheduler task - wakes run () for the next scan
+	#	a tick is not posted if the last one has not been processed yet
+
+	def PostTick (self):
+		if self.tickPending:
+			return
+		self.tickPending = True
+		try:
+			self.MediaQueue.put ( "TICK", block=False )
+		except queue.Full:
+			self.tickPending = False
+
 	def run (self):
 		separator = '/'
-		root = "/media"
+		root = MediaRoot
 		archiveSuffix = ".tar.gz"
 		autoRestore = False
 		autoRestoreComplete = False
@@ -3443,13 +5791,13 @@ class MediaScanClass (threading.Thread):
 		# media removal removes it from this list
 		alreadyScanned = []
 		while self.threadRunning:
-			# use queue to receive stop command and also to space operations
+			# use queue to receive stop command and the Scheduler tick that spaces operations
 			command = ""
 			try:
-				command = self.MediaQueue.get (timeout = 5.0)
-			except queue.Empty:	# queue empty is OK
-				# timeout indicates it's time to make one pass through the code below
-				pass
+				command = GetFromQueue (self.MediaQueue)
+				# tick indicates it's time to make one pass through the code below
+				if command == 'TICK':
+					self.tickPending = False
 			except:
 				logging.error ("pull from MediaQueue failed")
 				time.sleep (5.0)
@@ -3467,7 +5815,7 @@ class MediaScanClass (threading.Thread):
 			automaticTransfers = False
 
 			# do local settings backup/restore
-			if os.path.exists ("/data/settingsBackup"):
+			if os.path.exists (DataRoot + "/settingsBackup"):
 				localSettingsBackupExists = True
 				DbusIf.SetBackupSettingsLocalFileExist (True)
 			else:
@@ -3477,12 +5825,12 @@ class MediaScanClass (threading.Thread):
 			backupProgress = DbusIf.GetBackupProgress ()
 			if backupProgress == 21:
 				DbusIf.SetBackupProgress (23)
-				self.settingsBackup ("/data", settingsOnly = True)
+				self.settingsBackup (DataRoot, settingsOnly = True)
 				DbusIf.SetBackupProgress (0)
 			elif backupProgress == 22:
 				if localSettingsBackupExists:
 					DbusIf.SetBackupProgress (24)
-					self.settingsRestore ("/data", settingsOnly = True)
+					self.settingsRestore (DataRoot, settingsOnly = True)
 				DbusIf.SetBackupProgress (0)
 
 
@@ -3597,6 +5945,10 @@ class MediaScanClass (threading.Thread):
 				# end for path
 			#end for drive
 
+			# let mainLoop act on transferred packages and media flag files right away
+			if automaticTransfers or self.AutoUninstall or InitializePackageManager:
+				MarkPackageDirty ()
+
 			# we have arrived at a point where all removable media has been scanned
 			# and all possible work has been done
 
@@ -3637,10 +5989,19 @@ class MediaScanClass (threading.Thread):
 #	handshakes between threads often use a global variable rather than pushing something on a queue:
 #		install/download check holdoff while waiting for GitHub version refresh
 #
-#	some operations performed in mainLoop take a while but do not need to be done every second
-#	to spread things out, and minimize impact on other tasks within Venus Os,
-#	only one package is checked each second
-# 	(it would take 10 seconds to scan 10 packages)
+#	mainLoop is event driven: it only checks packages that have been marked "dirty"
+#		by MarkPackageDirty () and sleeps until the next deadline otherwise
+#	packages are marked dirty when:
+#		a download, install or add/remove finishes
+#		a new GitHub version is received
+#		the auto install setting changes
+#		a file monitor sees a change in /data or /etc/venus
+#		removable media transfers a package
+#	all packages are also marked dirty every FALLBACK_SWEEP_INTERVAL seconds
+#		to catch changes that aren't seen by the file monitors
+#		(e.g., flag files inside a package directory)
+#	mainLoop polls every second while a reboot, GUI restart or exit is pending
+#		so pending operations can finish first
 #
 #	PackageManager is responsible for reinstalling packages following a firmware update
 #	reinstallMods is a script called from /data/rcS.local that installs the PackageManager service
@@ -3649,6 +6010,13 @@ class MediaScanClass (threading.Thread):
 #		PackageManager clears that flag when all packages have been reinstalled
 #	boot-time reinstall is done using the normal automatic install mechanism but bypasses
 #		the test for the user selectable auto install on/off
+#	rather than checking one package each second, all packages are checked at once
+#		when the flag is first seen and the resulting install plan is fed to
+#		the install queue as fast as the queue accepts them
+#	the normal scan is suspended until the plan has been pushed
+#	all planned packages are marked InstallPending right away
+#		so the GUI restart or reboot is held off until the last install finishes
+#		and only one restart/reboot occurs
 #
 #	mainLoop is resonsible for triggering GUI restarts and system reboots
 #	installs, uninstalls and downloads are handled by the package's setup script
@@ -3672,8 +6040,10 @@ class MediaScanClass (threading.Thread):
 #
 #	mainLoop is "scheduled" to run from GLib which is all set up in main()
 #		however, mainLoop is not a simple loop
-#		it is called once per second by GLib then exits True
-#		mainLoop exits by calling mainloop.quit() then returning False
+#		it is a Scheduler task (see SchedulerClass)
+#		called by runMainLoop which returns the number of seconds until it needs to run again
+#		ScheduleMainLoop () moves the next run earlier when something changes
+#		mainLoop exits by calling mainloop.quit() then returning None
 #
 #	main is tasks:
 #		instializing global variables that do not change over time
@@ -3698,21 +6068,261 @@ class MediaScanClass (threading.Thread):
 #		exit
 
 # persistent storage for mainLoop
-packageIndex = 0
 noActionCount = 0
+lastActionsNeeded = ""
 lastDownloadMode = AUTO_DOWNLOADS_OFF
 bootInstall = False
 ignoreBootInstall = False
+bootInstallPlan = []
+bootInstallStartTime = 0
 DeferredGuiEditAcknowledgement = None
-lastTimeSync = 0
+rtcSaveProc = None
 
 WaitForGitHubVersions = False
+
+# mainLoop scheduling
+#	all access to the dirty packages is protected by DirtyPackagesLock since
+#	packages are marked dirty from all threads
+FALLBACK_SWEEP_INTERVAL = 60
+BUSY_POLL_INTERVAL = 1.0
+DirtyPackagesLock = threading.Lock ()
+DirtyPackages = set ()
+AllPackagesDirty = True
+lastFullSweep = 0
+FileMonitors = []
+
+
+#	MarkPackageDirty
+#
+# marks a package for checking by mainLoop and wakes mainLoop
+#	if packageName is None, all packages are checked
+#
+# may be called from any thread
+
+def MarkPackageDirty (packageName=None):
+	global AllPackagesDirty
+	with DirtyPackagesLock:
+		if packageName == None:
+			AllPackagesDirty = True
+		else:
+			DirtyPackages.add (packageName)
+	ScheduleMainLoop (0)
+
+
+#	WakeMainLoop
+#
+# runs mainLoop as soon as possible without checking any packages
+#	used when a flag is set that mainLoop needs to act on
+
+def WakeMainLoop ():
+	ScheduleMainLoop (0)
+
+
+#	ScheduleMainLoop
+#
+# arranges for mainLoop to run within delay seconds
+#	if mainLoop is already scheduled to run sooner, nothing changes
+#
+# may be called from any thread
+
+def ScheduleMainLoop (delay):
+	Scheduler.RunBy ('mainLoop', delay)
+
+
+#	runMainLoop
+#
+# Scheduler callback for mainLoop
+# returns the delay until the next run or False to remove the task when mainLoop quits
+
+def runMainLoop ():
+	delay = mainLoop ()
+	if delay == None:
+		return False
+	return delay
+
+
+#	saveRtc
+#
+# Scheduler task
+# an unclean shutdown will not save the last known time of day
+#	which is used during the next boot until ntp can sync time
+#	so do it here every 30 seconds
+# the save is not waited for since this runs in the GLib thread
+#	a save still running from the last pass is not repeated
+
+def saveRtc ():
+	global rtcSaveProc
+	timeSyncCommand = '/etc/init.d/save-rtc.sh'
+	if rtcSaveProc != None and rtcSaveProc.poll () == None:
+		return
+	rtcSaveProc = None
+	if os.path.exists (timeSyncCommand):
+		try:
+			rtcSaveProc = subprocess.Popen ( [ timeSyncCommand ],
+						stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+		except:
+			pass
+
+
+#	expireGitHubVersions
+#
+# Scheduler task
+# clears GitHub versions that have not been refreshed in 10 minutes
+# returns the delay until the next version expires
+
+def expireGitHubVersions ():
+	DbusIf.LOCK ("expireGitHubVersions")
+	currentTime = time.time ()
+	nextExpiry = PackageClass.ExpireGitHubVersions (currentTime)
+	DbusIf.UNLOCK ("expireGitHubVersions")
+	if nextExpiry == None:
+		return GITHUB_VERSION_LIFETIME
+	return max (1.0, nextExpiry - currentTime)
+
+
+#	takeDirtyPackages
+#
+# returns the packages marked dirty since the last call and clears the marks
+#	returns ( packageNames, allPackages )
+
+def takeDirtyPackages ():
+	global AllPackagesDirty
+	global DirtyPackages
+	with DirtyPackagesLock:
+		packageNames = DirtyPackages
+		allPackages = AllPackagesDirty
+		DirtyPackages = set ()
+		AllPackagesDirty = False
+	return ( packageNames, allPackages )
+
+
+#	fileMonitorHandler
+#
+# Gio file monitor callback for /data and /etc/venus
+#	/data/<packageName> marks that package dirty
+#	/etc/venus/installedVersion-<packageName> marks that package dirty
+#	/etc/venus/REINSTALL_PACKAGES wakes mainLoop to begin the boot-time reinstall
+
+def fileMonitorHandler (monitor, file, otherFile, eventType):
+	name = file.get_basename ()
+	if name == None:
+		return
+	if name.startswith ("installedVersion-"):
+		MarkPackageDirty (name[len ("installedVersion-"):])
+	elif name == "REINSTALL_PACKAGES":
+		WakeMainLoop ()
+	# ignore temporary directories used during downloads and transfers
+	elif file.get_parent () != None and file.get_parent ().get_path () == DataRoot \
+			and not name.endswith ("-temp"):
+		if PackageClass.PackageNameValid (name):
+			MarkPackageDirty (name)
+
+
+#	StartFileMonitors
+#
+# sets up the file monitors used to mark packages dirty
+#	if a monitor can't be created, the fallback sweep still catches the changes
+
+def StartFileMonitors ():
+	for path in [ DataRoot, EtcVenusRoot ]:
+		try:
+			monitor = Gio.File.new_for_path (path).monitor_directory (Gio.FileMonitorFlags.WATCH_MOVES, None)
+		except:
+			logging.warning ("could not monitor " + path + " - relying on periodic package checks")
+			continue
+		monitor.connect ("changed", fileMonitorHandler)
+		# keep a reference so the monitor is not garbage collected
+		FileMonitors.append (monitor)
+
+
+#	checkPackage
+#
+# checks one package for automatic download or install
+# must be called with package list LOCKED !!
+#
+# returns a status message if an action was pushed, "" if not
+
+def checkPackage (package, autoDownload, autoInstall):
+	actionMessage = ""
+	packageName = package.PackageName
+	# boot-time installs use BuildBootInstallPlan which skips conflict checks
+	package.UpdateVersionsAndFlags (doConflictChecks=True)
+
+	# disallow operations on this package if anything is pending
+	packageOperationOk = not package.DownloadPending and not package.InstallPending
+	if packageOperationOk and autoDownload and DownloadGitHub.DownloadVersionCheck (package):
+		# don't allow install if download is needed - even if it has not started yet
+		packageOperationOk = False
+		actionMessage = "downloading " + packageName + " ..."
+		PushAction ( command='download' + ':' + packageName, source='AUTO' )
+
+	# validate package for install
+	if packageOperationOk and package.Incompatible == "" :
+		installOk = False
+		# one-time install flag file is set in package directory - install without further checks
+		oneTimeInstallFile = DataRoot + "/" + packageName + "/ONE_TIME_INSTALL"
+		if os.path.exists (oneTimeInstallFile):
+			os.remove (oneTimeInstallFile)
+			installOk = True
+		# auto install OK (not manually uninstalled) and versions are different
+		elif package.AutoInstallOk and package.PackageVersionNumber != package.InstalledVersionNumber:
+			if autoInstall:
+				installOk = True
+			elif os.path.exists (DataRoot + "/" + packageName + "/AUTO_INSTALL"):
+				installOk = True
+
+		if installOk:
+			packageOperationOk = False
+			actionMessage = "installing " + packageName + " ..."
+			PushAction ( command='install' + ':' + packageName, source='AUTO' )
+	return actionMessage
+
 			
 # states for package.ActionNeeded
 REBOOT_NEEDED = 2
 GUI_RESTART_NEEDED = 1
 NONE = 0
 
+
+#	BuildBootInstallPlan
+#
+# called from mainLoop when a boot-time reinstall begins
+#
+# checks all packages in one pass and returns a list of names of packages to install
+#	the same tests used by mainLoop for a boot-time install are used here
+#
+# each planned package is marked InstallPending so that the GUI restart/reboot
+#	triggered by the first installs is held off until the whole plan has run
+#	and so that mainLoop does not push it a second time
+
+def BuildBootInstallPlan ():
+	plan = []
+	DbusIf.LOCK ("BuildBootInstallPlan")
+	for package in PackageClass.PackageList:
+		packageName = package.PackageName
+		# skip conflict checks since boot-time checks are being made
+		package.UpdateVersionsAndFlags (doConflictChecks = False)
+		if package.DownloadPending or package.InstallPending or package.Incompatible != "":
+			continue
+		installOk = False
+		# one-time install flag file is set in package directory - install without further checks
+		oneTimeInstallFile = DataRoot + "/" + packageName + "/ONE_TIME_INSTALL"
+		if os.path.exists (oneTimeInstallFile):
+			os.remove (oneTimeInstallFile)
+			installOk = True
+		# the autoInstall setting is not checked here - it is ignored during a boot-time reinstall
+		elif package.AutoInstallOk and package.PackageVersionNumber != package.InstalledVersionNumber:
+			# do boot-time install only if the package is not installed
+			if package.InstalledVersion == "":
+				installOk = True
+			elif os.path.exists (DataRoot + "/" + packageName + "/AUTO_INSTALL"):
+				installOk = True
+		if installOk:
+			package.InstallPending = True
+			plan.append (packageName)
+	DbusIf.UNLOCK ("BuildBootInstallPlan")
+	return plan
+
 def mainLoop ():
 	global mainloop
 	global PushAction
@@ -3725,33 +6335,23 @@ def mainLoop ():
 	global DeferredGuiEditAcknowledgement # set in the handleGuiEditAction thread becasue the dbus paramter can't be set there
 
 	global noActionCount
-	global packageIndex
-	global noActionCount
+	global lastActionsNeeded
 	global lastDownloadMode
 	global bootInstall
 	global ignoreBootInstall
-	global lastTimeSync
+	global bootInstallPlan
+	global bootInstallStartTime
+	global lastFullSweep
 	startTime = time.time()
-
-	# an unclean shutdown will not save the last known time of day
-	#	which is used during the next boot until ntp can sync time
-	#	so do it here every 30 seconds
-	# an old RTC
-	timeSyncCommand = '/etc/init.d/save-rtc.sh'
-	if startTime > lastTimeSync + 30 and os.path.exists (timeSyncCommand):
-		try:
-			subprocess.Popen ( [ timeSyncCommand ],
-					bufsize=-1, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
-			proc.commiunicate ()	# output ignored
-		except:
-			pass
-		lastTimeSync = startTime
+	lockWait = 0.0
 
 	packageName = "none"
 
 	if DeferredGuiEditAcknowledgement != None:
 		DbusIf.AcknowledgeGuiEditAction (DeferredGuiEditAcknowledgement)
 		DeferredGuiEditAcknowledgement = None
+	phaseStart = time.time ()
+	MainLoopPerf.Record ('DeferredAck', phaseStart - startTime)
 
 
 	# auto uninstall triggered by AUTO_UNINSTALL_PACKAGES flag file on removable media
@@ -3759,7 +6359,7 @@ def mainLoop ():
 	# exit mainLoop and do uninstall in main, then reboot
 	# skip all processing below !
 	actionMessage = ""
-	bootReinstallFile="/etc/venus/REINSTALL_PACKAGES"
+	bootReinstallFile=EtcVenusRoot + "/REINSTALL_PACKAGES"
 
 	currentDownloadMode = DbusIf.GetAutoDownloadMode ()
 	emptyPackageList = False
@@ -3771,17 +6371,56 @@ def mainLoop ():
 	if len (PackageClass.PackageList) == 0:
 		emptyPackageList = True
 		checkPackages = False
-		packageIndex = 0
 
 	# if boot-time reinstall has been requiested by reinstallMods
 	#	override modes and initiate auto install of all packages
 	# ignore the boot reinstall flag if it's been done once and the flag removal failed
 	elif os.path.exists (bootReinstallFile) and not ignoreBootInstall:
-		# beginning of boot install - reset package index to insure a complete scan
+		# normal package scan is suspended until all planned installs have been pushed
+		checkPackages = False
+		# beginning of boot install - check all packages now
 		if not bootInstall:
 			bootInstall = True
-			packageIndex = 0
-			logging.info ("starting boot-time reinstall")
+			bootInstallStartTime = startTime
+			bootInstallPlan = BuildBootInstallPlan ()
+			logging.info ("starting boot-time reinstall of " + str (len (bootInstallPlan)) + " packages: "
+							+ " ".join (bootInstallPlan))
+
+		# push as many installs as the install queue will accept
+		#	any left over are pushed on the next pass
+		# an install that can't be pushed for any other reason (e.g., the package was removed)
+		#	is dropped from the plan so the plan still finishes
+		while len (bootInstallPlan) > 0 and not InstallPackages.InstallQueue.full ():
+			packageName = bootInstallPlan[0]
+			if PushAction ( command='install' + ':' + packageName, source='AUTO' ):
+				actionMessage = "installing " + packageName + " ..."
+			elif InstallPackages.InstallQueue.full ():
+				break
+			else:
+				logging.warning ("boot-time reinstall of " + packageName + " skipped - could not be queued")
+				lockWait += DbusIf.LOCK ("mainLoop boot install")
+				package = PackageClass.LocatePackage (packageName)
+				if package != None:
+					package.InstallPending = False
+				DbusIf.UNLOCK ("mainLoop boot install")
+			del bootInstallPlan[0]
+
+		# end of boot install - all installs have been pushed
+		#	GUI restart/reboot waits for them to finish (InstallPending)
+		if len (bootInstallPlan) == 0:
+			logging.info ("boot-time reinstall queued in %0.1f seconds" % ( time.time () - bootInstallStartTime ))
+			bootInstall = False
+			# check all packages again now that normal processing resumes
+			MarkPackageDirty ()
+			try:
+				os.remove (bootReinstallFile)
+			except FileNotFoundError:
+				pass
+			except:
+				# log the error and continue
+				# set flag so we don't repeat the reinstall if the flag removal fails (until next boot)
+				ignoreBootInstall = True
+				logging.critical ("could not remove the boot time reinstall flag: /etc/venus/REINSTALL_PACKAGES")
 	elif WaitForGitHubVersions:
 		checkPackages = False
 
@@ -3794,116 +6433,76 @@ def mainLoop ():
 		autoInstall = DbusIf.GetAutoInstall ()
 
 		# download mode changed
-		# restart at beginning of list and refresh all GitHub versions
+		# refresh all GitHub versions - all packages are checked when the refresh completes
 		if currentDownloadMode != lastDownloadMode and currentDownloadMode != AUTO_DOWNLOADS_OFF:
-			packageIndex = 0
 			checkPackages = False
+			# set here as well as in UpdateGitHubVersion so checks are held off
+			#	until the refresh actually begins
+			WaitForGitHubVersions = True
 			UpdateGitHubVersion.SetPriorityGitHubVersion ('REFRESH')
 		# save mode so changes can be detected on next pass
 		lastDownloadMode = currentDownloadMode
 
-	# make sure a new scan starts at beginning of list
-	if not checkPackages:
-		packageIndex = 0
-	# process one package per pass of mainloop
-	else:
-		DbusIf.LOCK ("mainLoop 1")	
-		packageListLength = len (PackageClass.PackageList)
-		# reached end of list - start over
-		if packageIndex >= packageListLength:
-			packageIndex = 0
-			# end of ONCE download - switch auto downloads off
-			if currentDownloadMode == ONE_DOWNLOAD:
-				DbusIf.SetAutoDownloadMode (AUTO_DOWNLOADS_OFF)
-				currentDownloadMode = AUTO_DOWNLOADS_OFF
-			# end of boot install
-			if bootInstall:
-				logging.info ("boot-time reinstall complete")
-				bootInstall = False
-				if os.path.exists (bootReinstallFile):
-					try:
-						os.remove (bootReinstallFile)
-					except FileNotFoundError:
-						pass
-					except:
-						# log the error and continue
-						# set flag so we don't repeat the reinstall if the flag removal fails (until next boot)
-						ignoreBootInstall = True
-						logging.critical ("could not remove the boot time reinstall flag: /etc/venus/REINSTALL_PACKAGES")
-
-		package = PackageClass.PackageList [packageIndex]
-		packageName = package.PackageName
-		packageIndex += 1
-
-		# skip conflict checks if boot-time checks are bening made
-		package.UpdateVersionsAndFlags (doConflictChecks = not bootInstall)
-
-		# disallow operations on this package if anything is pending
-		packageOperationOk = not package.DownloadPending and not package.InstallPending
-		if packageOperationOk and autoDownload and DownloadGitHub.DownloadVersionCheck (package):
-			# don't allow install if download is needed - even if it has not started yet
-			packageOperationOk = False
-			actionMessage = "downloading " + packageName + " ..."
-			PushAction ( command='download' + ':' + packageName, source='AUTO' )
-
-		# validate package for install
-		if packageOperationOk and package.Incompatible == "" :
-			installOk = False
-			# one-time install flag file is set in package directory - install without further checks
-			oneTimeInstallFile = "/data/" + packageName + "/ONE_TIME_INSTALL"
-			if os.path.exists (oneTimeInstallFile):
-				os.remove (oneTimeInstallFile)
-				installOk = True
-			# auto install OK (not manually uninstalled) and versions are different
-			elif package.AutoInstallOk and package.PackageVersionNumber != package.InstalledVersionNumber:
-				if autoInstall:
-					installOk = True
-				# do boot-time install only if the package is not installed
-				elif bootInstall and package.InstalledVersion == "":
-					installOk = True
-				elif os.path.exists ("/data/" + packageName + "/AUTO_INSTALL"):
-					installOk = True
-
-			if installOk:
-				packageOperationOk = False
-				actionMessage = "installing " + packageName + " ..."
-				PushAction ( command='install' + ':' + packageName, source='AUTO' )
+	# packages marked dirty while checks are held off remain marked until the next pass
+	if checkPackages:
+		( dirtyPackages, allPackages ) = takeDirtyPackages ()
+		# periodic check of all packages to catch changes the file monitors don't see
+		if startTime > lastFullSweep + FALLBACK_SWEEP_INTERVAL:
+			allPackages = True
+		if allPackages:
+			lastFullSweep = startTime
+
+		lockWait += DbusIf.LOCK ("mainLoop 1")
+		if allPackages:
+			packages = list (PackageClass.PackageList)
+		else:
+			packages = []
+			for packageName in dirtyPackages:
+				package = PackageClass.LocatePackage (packageName)
+				if package != None:
+					packages.append (package)
+		# changes from all package checks in this pass are sent to the GUI together
+		DbusIf.BeginBatch ()
+		try:
+			for package in packages:
+				packageName = package.PackageName
+				message = checkPackage (package, autoDownload, autoInstall)
+				if message != "":
+					actionMessage = message
+		finally:
+			DbusIf.EndBatch ()
 		DbusIf.UNLOCK ("mainLoop 1")
+
+		# end of ONCE download - switch auto downloads off after all packages have been checked
+		if allPackages and currentDownloadMode == ONE_DOWNLOAD:
+			DbusIf.SetAutoDownloadMode (AUTO_DOWNLOADS_OFF)
+			currentDownloadMode = AUTO_DOWNLOADS_OFF
 	# end if checkPackages
+	phaseEnd = time.time ()
+	MainLoopPerf.Record ('PackageCheck', phaseEnd - phaseStart)
+	phaseStart = phaseEnd
 
-	DbusIf.LOCK ("mainLoop 2")
-	actionsPending = False
-	actionsNeeded = ""
-	systemAction = NONE
+	# the totals below are maintained as package flags change
+	#	so the package list does not need to be scanned
+	lockWait += DbusIf.LOCK ("mainLoop 2")
 	# hold off reboot or GUI restart if any package has an action pending
+	actionsPending = PackageClass.PendingCount > 0
 	# collect actions needed to activage changes - only sent to GUI - no action taken
-	for package in PackageClass.PackageList:
-		if package.DownloadPending or package.InstallPending:
-			actionsPending = True
-		# clear GitHub version if not refreshed in 10 minutes
-		elif package.GitHubVersion != "" and package.lastGitHubRefresh > 0 and time.time () > package.lastGitHubRefresh + NORMAL_GITHUB_REFRESH + 10:
-			package.SetGitHubVersion ("")
-
-		if package.ActionNeeded == REBOOT_NEEDED:
-			actionsNeeded += (package.PackageName + " requires REBOOT\n")
-			systemAction = REBOOT_NEEDED
-		elif package.ActionNeeded == GUI_RESTART_NEEDED:
-			actionsNeeded += (package.PackageName + " requires GUI restart\n")
-			if systemAction != REBOOT_NEEDED:
-				systemAction = GUI_RESTART_NEEDED
-
-	if systemAction == REBOOT_NEEDED:
-		actionsNeeded += "REBOOT system ?"
-	elif systemAction == GUI_RESTART_NEEDED:
-		actionsNeeded += "restart GUI ?"
+	( systemAction, actionsNeeded ) = PackageClass.GetActionNeeded ()
+	if actionsNeeded != None:
+		lastActionsNeeded = actionsNeeded
 
 	# don't show an action needed if reboot, etc is pending
 	if SystemReboot or GuiRestart or RestartPackageManager or InitializePackageManager:
 		DbusIf.DbusService['/ActionNeeded'] = ""
 	else:
-		DbusIf.DbusService['/ActionNeeded'] = actionsNeeded
+		DbusIf.DbusService['/ActionNeeded'] = lastActionsNeeded
 
 	DbusIf.UNLOCK ("mainLoop 2")
+	phaseEnd = time.time ()
+	MainLoopPerf.Record ('Aggregation', phaseEnd - phaseStart)
+	MainLoopPerf.Record ('LockWait', lockWait)
+	phaseStart = phaseEnd
 
 	if actionsPending:
 		noActionCount = 0
@@ -3921,7 +6520,7 @@ def mainLoop ():
 			elif systemAction == GUI_RESTART_NEEDED:
 				GuiRestart = True
 			mainloop.quit()
-			return False
+			return None
 
 	if actionMessage != "":
 		DbusIf.UpdateStatus ( actionMessage, where='PmStatus' )
@@ -3942,12 +6541,20 @@ def mainLoop ():
 			idleMessage = ""
 		DbusIf.UpdateStatus ( idleMessage, where='PmStatus' )
 
-	# enable the following lines to report execution time of main loop
-	####endTime = time.time()
-	####print ("main loop time %3.1f mS" % ( (endTime - startTime) * 1000 ), packageName)
+	# report execution time of main loop - published on dbus /Perf/MainLoop/...
+	endTime = time.time()
+	MainLoopPerf.Record ('StatusUpdate', endTime - phaseStart)
+	MainLoopPerf.Record ('Total', endTime - startTime)
 
-	# to continue the main loop, must return True
-	return True
+	# poll while waiting for pending operations before a reboot, GUI restart or exit
+	#	or while boot-time installs are still waiting to be pushed
+	if SystemReboot or InitializePackageManager or GuiRestart or RestartPackageManager \
+				or MediaScan.AutoUninstall or SetupHelperUninstall or bootInstall:
+		return BUSY_POLL_INTERVAL
+
+	# otherwise sleep until the next full sweep
+	#	packages marked dirty before then will wake mainLoop early
+	return max (BUSY_POLL_INTERVAL, lastFullSweep + FALLBACK_SWEEP_INTERVAL - time.time ())
 # end mainLoop
 
 # uninstall a package with a direct call to it's setup script
@@ -3963,7 +6570,7 @@ def	directUninstall (packageName ):
 	if packageName == "SetupHelper":
 		SetupHelperUninstall = True
 
-	packageDir = "/data/" + packageName
+	packageDir = DataRoot + "/" + packageName
 	setupFile = packageDir + "/setup"
 	try:
 		if os.path.isdir (packageDir) and os.path.isfile (setupFile) \
@@ -3993,6 +6600,13 @@ def	directUninstall (packageName ):
 # TERM sets RestartPackageManager which causes mainLoop to exit and therefore main to complete
 # TERM, then CONT is issued by supervise when shutting down the service
 # CONT handler differentiates a restart vs service down for logging purposes
+#
+# these Python signal handlers can run in the middle of any GLib callback
+#	so they only set flags - nothing that takes a lock (e.g., the Scheduler)
+# once the Scheduler exists, TERM is handled by requestPmRestart from the GLib main loop instead
+#	(GLib does not handle CONT, but it's handler only sets a flag)
+# USR1 only records the request until the Profiler and worker threads exist
+#	then it is handled by startProfile from the GLib main loop
 
 def setPmRestart (signal, frame):
 	global RestartPackageManager
@@ -4004,8 +6618,32 @@ def shutdownPmRestart (signal, frame):
 	if RestartPackageManager:
 		ShutdownPackageManager = True
 
+def setProfileRequest (signal, frame):
+	global ProfileRequested
+	ProfileRequested = True
+
+ProfileRequested = False
 signal.signal (signal.SIGTERM, setPmRestart)
 signal.signal (signal.SIGCONT, shutdownPmRestart)
+signal.signal (signal.SIGUSR1, setProfileRequest)
+
+# GLib signal handlers for TERM and USR1 (added in main)
+# these are dispatched by the GLib main loop between other callbacks so can use the Scheduler
+# returning True keeps the handler installed
+
+def requestPmRestart ():
+	global RestartPackageManager
+	RestartPackageManager = True
+	WakeMainLoop ()
+	return True
+
+# profiles all threads for PROFILE_DEFAULT_TIME seconds (see ProfilerClass)
+
+def startProfile ():
+	logging.info ("received profile request from SIGUSR1")
+	if not Profiler.Start (PROFILE_DEFAULT_TIME):
+		logging.warning ("profile already in progress")
+	return True
 
 
 #	main
@@ -4034,8 +6672,20 @@ def main():
 	# set logging level to include info level entries
 	logging.basicConfig( format='%(levelname)s:%(message)s', level=logging.INFO )
 
+	# filesystem roots - see SetFileRoots
+	parser = argparse.ArgumentParser (description='SetupHelper PackageManager')
+	parser.add_argument ('--root', default=os.environ.get ('PACKAGE_MANAGER_ROOT'),
+						help='directory containing all filesystem roots (data, etc/venus, ...)')
+	parser.add_argument ('--root-path', action='append', default=[], metavar='NAME=PATH',
+						help='relocate one filesystem root: ' + ', '.join (DEFAULT_FILE_ROOTS))
+	args = parser.parse_args ()
+	rootPaths = ParseFileRootPaths (os.environ.get ('PACKAGE_MANAGER_ROOTS', "").split (','))
+	rootPaths.update (ParseFileRootPaths (args.root_path))
+	SetFileRoots (root=args.root, paths=rootPaths)
+	ReadVenusVersion ()
+
 	# fetch installed version
-	installedVersionFile = "/etc/venus/installedVersion-SetupHelper"
+	installedVersionFile = EtcVenusRoot + "/installedVersion-SetupHelper"
 	try:
 		versionFile = open (installedVersionFile, 'r')
 	except:
@@ -4056,7 +6706,7 @@ def main():
 
 	# get platform
 	global Platform
-	platformFile = "/etc/venus/machine"
+	platformFile = EtcVenusRoot + "/machine"
 	try:
 		file = open (platformFile, 'r')
 	except:
@@ -4087,6 +6737,23 @@ def main():
 			Platform = machine
 		file.close()
 
+	# restore or clean up package directories left by an interrupted download or media transfer
+	#	then pick up jobs that were not finished before PackageManager last exited
+	JobJournalClass.RepairPackageSwaps ()
+	global JobJournal
+	JobJournal = JobJournalClass ()
+	global ScriptCheckCache
+	ScriptCheckCache = ScriptCheckCacheClass ()
+
+	# all periodic work is scheduled here
+	global Scheduler
+	Scheduler = SchedulerClass ()
+	GLib.unix_signal_add (GLib.PRIORITY_HIGH, signal.SIGTERM, requestPmRestart)
+
+	# per-package dbus Settings - must exist before DbusIf creates the Edit package
+	global PackageSettings
+	PackageSettings = PackageSettingsClass ()
+
 	# initialze dbus Settings and com.victronenergy.packageManager
 	global DbusIf
 	DbusIf = DbusIfClass ()
@@ -4110,6 +6777,26 @@ def main():
 	global MediaScan
 	MediaScan = MediaScanClass ()
 
+	# periodic work for the threads - must be scheduled before the threads start
+	#	jitter spreads these out relative to other services
+	Scheduler.AddTask ('addRemove', 3.0, AddRemove.PostTick, jitter=0.5)
+	Scheduler.AddTask ('mediaScan', 5.0, MediaScan.PostTick, jitter=1.0)
+	Scheduler.AddTask ('gitHubVersion', FAST_GITHUB_REFRESH, UpdateGitHubVersion.PostTick)
+	Scheduler.AddTask ('rtcSave', 30.0, saveRtc, jitter=2.0)
+	Scheduler.AddTask ('gitHubExpiry', GITHUB_VERSION_LIFETIME, expireGitHubVersions, jitter=2.0)
+
+	global MainLoopPerf
+	MainLoopPerf = MainLoopPerfClass ()
+	Scheduler.AddTask ('perfPublish', PERF_PUBLISH_INTERVAL, MainLoopPerf.Publish, jitter=1.0)
+
+	global Profiler
+	Profiler = ProfilerClass ()
+
+	global Stats
+	Stats = StatsClass ( { 'Download': DownloadGitHub.DownloadQueue, 'Install': InstallPackages.InstallQueue,
+							'AddRemove': AddRemove.AddRemoveQueue, 'GitHubVersion': UpdateGitHubVersion.GitHubVersionQueue } )
+	Scheduler.AddTask ('statsPublish', STATS_PUBLISH_INTERVAL, Stats.Publish, jitter=1.0)
+
 	# initialze package list
 	#	and refresh versions before starting threads
 	#	and the background loop
@@ -4131,7 +6818,10 @@ def main():
 	# lock is really unecessary since threads aren't running yet
 	#
 	# if a package is removed, start at the beginning of the list again
+	#
+	# the dbus Settings for all removed packages are removed together after the loop
 
+	DbusIfClass.DeferSettingsRemoval ()
 	while True:
 		DbusIf.LOCK ("main")
 		runAgain = False
@@ -4141,11 +6831,11 @@ def main():
 			# valid package name
 			if PackageClass.PackageNameValid (packageName):
 
-				flagFile = "/data/setupOptions/" + packageName + "/FORCE_REMOVE" 
+				flagFile = DataRoot + "/setupOptions/" + packageName + "/FORCE_REMOVE" 
 				# forced removal flag
 				if os.path.exists (flagFile):
 					os.remove (flagFile)
-					if os.path.exists ("/etc/venus/installedVersion-" + packageName):
+					if os.path.exists (EtcVenusRoot + "/installedVersion-" + packageName):
 						logging.info ( "uninstalling " + packageName + " prior to forced remove" )
 						directUninstall (packageName)
 					# now remove the package from list
@@ -4173,6 +6863,7 @@ def main():
 		if not runAgain:
 			break
 	del existingPackages
+	DbusIfClass.FlushSettingsRemoval ()
 
 	DbusIf.UpdateDefaultPackages ()
 
@@ -4183,9 +6874,20 @@ def main():
 	AddRemove.start()
 	MediaScan.start ()
 
-	# call the main loop - every 1 second
+	# everything a profile needs now exists - start one if USR1 was received before now
+	GLib.unix_signal_add (GLib.PRIORITY_HIGH, signal.SIGUSR1, startProfile)
+	if ProfileRequested:
+		startProfile ()
+
+	# push jobs left unfinished by the previous run
+	JobJournal.Replay ()
+
+	# watch for package changes then run the main loop
+	#	all packages are checked on the first pass
 	# this section of code loops until mainloop quits
-	GLib.timeout_add(1000, mainLoop)
+	StartFileMonitors ()
+	MarkPackageDirty ()
+	Scheduler.AddTask ('mainLoop', None, runMainLoop, delay=0)
 	mainloop = GLib.MainLoop()
 	mainloop.run()
 
@@ -4252,7 +6954,7 @@ def main():
 	# auto uninstall triggered by AUTO_UNINSTALL_PACKAGES flag file on removable media
 	if MediaScan.AutoUninstall:
 		# uninstall all packages EXCEPT SetupHelper which is done later
-		for path in os.listdir ("/data"):
+		for path in os.listdir (DataRoot):
 			directUninstall (path)
 		SystemReboot = True
 
@@ -4278,7 +6980,8 @@ def main():
 	logging.info (">>>> PackageManager exiting")
 
 #### Initial entry point for program
-main()
+if __name__ == "__main__":
+	main()
 
 
 
@@ -0,0 +1,231 @@
+#!/usr/bin/env python3
+
+# a small stand-in for localsettings (com.victronenergy.settings)
+#
+# implements the parts of the localsettings dbus API used by SettingsDevice, DbusIfClass,
+#	PackageSettingsClass and the settings backup / restore in PackageManager:
+#
+#	/Settings				AddSetting, AddSilentSetting (com.victronenergy.Settings)
+#	/						AddSettings, RemoveSettings (com.victronenergy.Settings)
+#	/						GetItems, ItemsChanged signal (com.victronenergy.BusItem)
+#	/<group>				GetValue, GetText - dictionaries for all settings below the group
+#	/<setting>				GetValue, SetValue, GetText, PropertiesChanged signal (com.victronenergy.BusItem)
+#							GetAttributes, GetDefault, SetDefault (com.victronenergy.Settings)
+#
+# settings are kept in memory only
+#
+# run as a script it serves the settings on the system bus - normally the private bus
+#	started by privatebus.py (DBUS_SYSTEM_BUS_ADDRESS) - and prints "ready" once the
+#	service name is owned
+#
+# it runs as a separate process from the code being measured because dbus-python
+#	blocking calls to a service in the same process would deadlock
+
+import os
+import sys
+import dbus
+import dbus.service
+
+sys.path.insert (1, os.path.join (os.path.dirname (os.path.abspath (__file__)), '..', 'velib_python'))
+from ve_utils import wrap_dbus_value, unwrap_dbus_value
+
+SETTINGS_SERVICE = 'com.victronenergy.settings'
+BUSITEM_INTERFACE = 'com.victronenergy.BusItem'
+SETTINGS_INTERFACE = 'com.victronenergy.Settings'
+
+
+class Setting:
+	def __init__ (self, value, default, min, max, silent):
+		self.value = value
+		self.default = default
+		self.min = min
+		self.max = max
+		self.silent = silent
+
+
+def convert (value, typeId):
+	value = unwrap_dbus_value (value)
+	try:
+		if typeId == 'i':
+			return int (value)
+		elif typeId == 'f':
+			return float (value)
+	except (TypeError, ValueError):
+		pass
+	if typeId == 's':
+		return str (value)
+	return value
+
+def typeOf (value):
+	if isinstance (value, float):
+		return 'f'
+	elif isinstance (value, int):
+		return 'i'
+	else:
+		return 's'
+
+
+class FakeSettings (dbus.service.Object):
+
+	def __init__ (self, bus):
+		self.settings = {}
+		dbus.service.Object.__init__ (self, bus, '/', fallback=True)
+		self.busName = dbus.service.BusName (SETTINGS_SERVICE, bus, do_not_queue=True)
+
+	def unknownPath (self, path):
+		return dbus.exceptions.DBusException ("no setting " + path,
+						name='org.freedesktop.DBus.Error.UnknownObject')
+
+	# { relative path: setting } for all settings below path
+	def subtree (self, path):
+		prefix = path.rstrip ('/') + '/'
+		return { p[len (prefix):]: s for p, s in self.settings.items () if p.startswith (prefix) }
+
+	def addSetting (self, path, default, typeId, min, max, silent):
+		if typeId not in ('i', 'f', 's'):
+			typeId = typeOf (unwrap_dbus_value (default))
+		default = convert (default, typeId)
+		min = convert (min, typeId) if typeId != 's' else 0
+		max = convert (max, typeId) if typeId != 's' else 0
+		if path in self.settings:
+			setting = self.settings[path]
+			setting.default = default
+			setting.min = min
+			setting.max = max
+			setting.silent = silent
+		else:
+			setting = self.settings[path] = Setting (default, default, min, max, silent)
+			self.changed (path, setting)
+		return setting
+
+	def changed (self, path, setting):
+		changes = { 'Value': wrap_dbus_value (setting.value), 'Text': str (setting.value) }
+		self.PropertiesChanged (changes, rel_path=path)
+		self.ItemsChanged ({ path: changes }, rel_path='/')
+
+	# com.victronenergy.Settings
+
+	@dbus.service.method (SETTINGS_INTERFACE, in_signature='ssvsvv', out_signature='i', path_keyword='path')
+	def AddSetting (self, group, name, default, typeId, min, max, path=None):
+		fullPath = '/'.join (p for p in ( path.rstrip ('/'), group.strip ('/'), name.strip ('/') ) if p)
+		self.addSetting (fullPath, default, typeId, min, max, False)
+		return 0
+
+	@dbus.service.method (SETTINGS_INTERFACE, in_signature='ssvsvv', out_signature='i', path_keyword='path')
+	def AddSilentSetting (self, group, name, default, typeId, min, max, path=None):
+		fullPath = '/'.join (p for p in ( path.rstrip ('/'), group.strip ('/'), name.strip ('/') ) if p)
+		self.addSetting (fullPath, default, typeId, min, max, True)
+		return 0
+
+	@dbus.service.method (SETTINGS_INTERFACE, in_signature='aa{sv}', out_signature='aa{sv}')
+	def AddSettings (self, settings):
+		results = []
+		for entry in settings:
+			path = str (entry.get ('path', ""))
+			if not path.startswith ('/'):
+				path = '/Settings/' + path
+			if 'default' not in entry:
+				results.append ({ 'path': path, 'error': 1 })
+				continue
+			default = entry['default']
+			typeId = typeOf (unwrap_dbus_value (default))
+			setting = self.addSetting (path, default, typeId, entry.get ('min', 0), entry.get ('max', 0),
+										bool (entry.get ('silent', False)))
+			results.append ({ 'path': path, 'error': 0, 'value': wrap_dbus_value (setting.value) })
+		return results
+
+	@dbus.service.method (SETTINGS_INTERFACE, in_signature='as', out_signature='ai')
+	def RemoveSettings (self, paths):
+		results = []
+		for path in paths:
+			path = str (path)
+			if self.settings.pop (path, None) != None:
+				results.append (0)
+			else:
+				results.append (-1)
+		return results
+
+	@dbus.service.method (SETTINGS_INTERFACE, in_signature='', out_signature='vvvi', path_keyword='path')
+	def GetAttributes (self, path=None):
+		if path not in self.settings:
+			raise self.unknownPath (path)
+		s = self.settings[path]
+		return ( wrap_dbus_value (s.default), wrap_dbus_value (s.min), wrap_dbus_value (s.max), int (s.silent) )
+
+	@dbus.service.method (SETTINGS_INTERFACE, in_signature='', out_signature='v', path_keyword='path')
+	def GetDefault (self, path=None):
+		if path not in self.settings:
+			raise self.unknownPath (path)
+		return wrap_dbus_value (self.settings[path].default)
+
+	@dbus.service.method (SETTINGS_INTERFACE, in_signature='', out_signature='i', path_keyword='path')
+	def SetDefault (self, path=None):
+		if path not in self.settings:
+			return -1
+		setting = self.settings[path]
+		if setting.value != setting.default:
+			setting.value = setting.default
+			self.changed (path, setting)
+		return 0
+
+	# com.victronenergy.BusItem
+
+	@dbus.service.method (BUSITEM_INTERFACE, in_signature='', out_signature='a{sa{sv}}', path_keyword='path')
+	def GetItems (self, path=None):
+		return { p: { 'Value': wrap_dbus_value (s.value), 'Text': str (s.value) }
+						for p, s in self.settings.items () }
+
+	@dbus.service.method (BUSITEM_INTERFACE, in_signature='', out_signature='v', path_keyword='path')
+	def GetValue (self, path=None):
+		if path in self.settings:
+			return wrap_dbus_value (self.settings[path].value)
+		tree = self.subtree (path)
+		if len (tree) == 0 and path != '/':
+			raise self.unknownPath (path)
+		return dbus.Dictionary ({ p: wrap_dbus_value (s.value) for p, s in tree.items () },
+								signature='sv', variant_level=1)
+
+	@dbus.service.method (BUSITEM_INTERFACE, in_signature='', out_signature='v', path_keyword='path')
+	def GetText (self, path=None):
+		if path in self.settings:
+			return dbus.String (str (self.settings[path].value), variant_level=1)
+		tree = self.subtree (path)
+		if len (tree) == 0 and path != '/':
+			raise self.unknownPath (path)
+		return dbus.Dictionary ({ p: str (s.value) for p, s in tree.items () }, signature='ss', variant_level=1)
+
+	@dbus.service.method (BUSITEM_INTERFACE, in_signature='v', out_signature='i', path_keyword='path')
+	def SetValue (self, value, path=None):
+		if path not in self.settings:
+			return -1
+		setting = self.settings[path]
+		value = convert (value, typeOf (setting.default))
+		if typeOf (setting.default) != 's' and setting.min != setting.max:
+			if value < setting.min or value > setting.max:
+				return -1
+		if value != setting.value:
+			setting.value = value
+			self.changed (path, setting)
+		return 0
+
+	@dbus.service.signal (BUSITEM_INTERFACE, signature='a{sv}', rel_path_keyword='rel_path')
+	def PropertiesChanged (self, changes, rel_path=None):
+		pass
+
+	@dbus.service.signal (BUSITEM_INTERFACE, signature='a{sa{sv}}', rel_path_keyword='rel_path')
+	def ItemsChanged (self, items, rel_path=None):
+		pass
+
+
+def main ():
+	from dbus.mainloop.glib import DBusGMainLoop
+	from gi.repository import GLib
+
+	DBusGMainLoop (set_as_default=True)
+	settings = FakeSettings (dbus.SystemBus ())
+	print ("ready", flush=True)
+	GLib.MainLoop ().run ()
+
+
+if __name__ == "__main__":
+	main ()
@@ -0,0 +1,121 @@
+#!/usr/bin/env python3
+
+# private dbus environment for PackageManager tests and benchmarks
+#
+# PrivateBus starts a dbus-daemon of it's own and points both DBUS_SYSTEM_BUS_ADDRESS
+#	and DBUS_SESSION_BUS_ADDRESS at it so dbus.SystemBus () in the code being measured
+#	connects to the private bus instead of the real system bus
+# unless withSettings is False, the localsettings stand-in (fakesettings.py) is started
+#	on that bus and PrivateBus waits until it is ready
+#
+# the environment must be set up before the first dbus.SystemBus () call in the process
+#
+# usage:
+#	with PrivateBus ():
+#		... code using dbus.SystemBus () ...
+#
+# run as a script, the private bus is started and the addresses printed
+#	so other programs (e.g., PackageManager) can be run against it until Ctrl-C
+
+import os
+import sys
+import time
+import shutil
+import select
+import tempfile
+import subprocess
+
+BUS_CONFIG = """<!DOCTYPE busconfig PUBLIC "-//freedesktop//DTD D-Bus Bus Configuration 1.0//EN"
+ "http://www.freedesktop.org/standards/dbus/1.0/busconfig.dtd">
+<busconfig>
+	<type>session</type>
+	<listen>unix:dir={directory}</listen>
+	<policy context="default">
+		<allow send_destination="*" eavesdrop="true"/>
+		<allow eavesdrop="true"/>
+		<allow own="*"/>
+	</policy>
+</busconfig>
+"""
+
+START_TIMEOUT = 10.0
+
+class PrivateBus:
+
+	def __init__ (self, withSettings=True):
+		self.withSettings = withSettings
+		self.directory = None
+		self.daemon = None
+		self.settings = None
+		self.address = None
+		self.savedEnvironment = {}
+
+	def readLine (self, proc, what):
+		ready, _, _ = select.select ([ proc.stdout ], [], [], START_TIMEOUT)
+		line = proc.stdout.readline ().strip () if ready else ""
+		if line == "":
+			self.stop ()
+			raise RuntimeError (what + " did not start")
+		return line
+
+	def start (self):
+		self.directory = tempfile.mkdtemp (prefix='privatebus-')
+		configFile = os.path.join (self.directory, 'bus.conf')
+		with open (configFile, 'w') as file:
+			file.write (BUS_CONFIG.format (directory=self.directory))
+
+		self.daemon = subprocess.Popen ([ 'dbus-daemon', '--config-file=' + configFile, '--nofork', '--print-address' ],
+							stdout=subprocess.PIPE, universal_newlines=True)
+		self.address = self.readLine (self.daemon, "dbus-daemon")
+
+		for name in ( 'DBUS_SYSTEM_BUS_ADDRESS', 'DBUS_SESSION_BUS_ADDRESS' ):
+			self.savedEnvironment[name] = os.environ.get (name)
+			os.environ[name] = self.address
+
+		if self.withSettings:
+			script = os.path.join (os.path.dirname (os.path.abspath (__file__)), 'fakesettings.py')
+			self.settings = subprocess.Popen ([ sys.executable, script ], stdout=subprocess.PIPE, universal_newlines=True)
+			self.readLine (self.settings, "fake settings service")
+		return self
+
+	def stop (self):
+		for proc in ( self.settings, self.daemon ):
+			if proc != None and proc.poll () == None:
+				proc.terminate ()
+				try:
+					proc.wait (timeout=5)
+				except subprocess.TimeoutExpired:
+					proc.kill ()
+		self.settings = None
+		self.daemon = None
+
+		for name, value in self.savedEnvironment.items ():
+			if value == None:
+				os.environ.pop (name, None)
+			else:
+				os.environ[name] = value
+		self.savedEnvironment = {}
+
+		if self.directory != None:
+			shutil.rmtree (self.directory, ignore_errors=True)
+			self.directory = None
+
+	def __enter__ (self):
+		return self.start ()
+
+	def __exit__ (self, *exc):
+		self.stop ()
+
+
+def main ():
+	with PrivateBus () as bus:
+		print ("DBUS_SYSTEM_BUS_ADDRESS=" + bus.address, flush=True)
+		try:
+			while True:
+				time.sleep (3600)
+		except KeyboardInterrupt:
+			pass
+
+
+if __name__ == "__main__":
+	main ()
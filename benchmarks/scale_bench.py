@@ -0,0 +1,415 @@
+#!/usr/bin/env python3
+
+# PackageManager scaling with the number of packages
+#	run against a synthetic package tree (relocated filesystem roots, see SetFileRoots)
+#	and the localsettings stand-in on a private bus (see privatebus.py)
+#	GitHub versions are served by a local HTTP server (PACKAGE_MANAGER_GITHUB_RAW_URL)
+#
+# each package count is measured in a separate process so module state and peak RSS
+#	are not carried from one count to the next
+#
+# for each package count, measures:
+#	AddStoredPackages pass with an empty package list (all packages found and pushed)
+#		and with all packages in the list (the AddRemove idle pass)
+#	adding all packages to the package list
+#	UpdateVersionsAndFlags for all packages with and without conflict checks
+#	a full mainLoop sweep (all packages dirty)
+#	a GitHub version refresh pass for all packages
+#	peak RSS of the benchmark process
+#	PackageManager.py started as a service on the same tree:
+#		time until /PmStatus is on dbus and until the first status is shown
+#		and it's peak RSS
+#
+# the synthetic packages have file lists with .package sidecars (some shared with another
+#	package to create file conflicts), dependencies on other packages and FileSets
+#	half of them are installed, the others are flagged DO_NOT_AUTO_INSTALL
+#
+# the measurements that are repeated report the median
+# results are written to stdout as JSON
+#
+# usage: python3 scale_bench.py [-n counts ...] [-r repeats] [-v]
+
+import os
+import sys
+import json
+import time
+import queue
+import shutil
+import signal
+import argparse
+import logging
+import resource
+import tempfile
+import threading
+import subprocess
+import http.server
+import functools
+
+benchmarkDir = os.path.dirname (os.path.abspath (__file__))
+packageManagerDir = os.path.dirname (benchmarkDir)
+sys.path.insert (1, os.path.join (packageManagerDir, 'velib_python'))
+sys.path.insert (1, packageManagerDir)
+from privatebus import PrivateBus
+
+VENUS_VERSION = "v3.50"
+PACKAGE_VERSION = "v1.0"
+GITHUB_USER = "bench"
+GITHUB_BRANCH = "main"
+FILES_PER_LIST = 10
+CONFLICT_INTERVAL = 10		# every n-th package shares a file with the previous one
+DEPENDENCY_INTERVAL = 5		# every n-th package depends on the previous one
+STARTUP_TIMEOUT = 120.0
+
+
+def median (samples):
+	samples = sorted (samples)
+	return samples[len (samples) // 2]
+
+def timed (function):
+	startTime = time.perf_counter ()
+	result = function ()
+	return result, time.perf_counter () - startTime
+
+def writeFile (path, text, mode=None):
+	os.makedirs (os.path.dirname (path), exist_ok=True)
+	with open (path, 'w') as file:
+		file.write (text)
+	if mode != None:
+		os.chmod (path, mode)
+
+def packageNames (count):
+	return [ "Bench%04d" % index for index in range (count) ]
+
+
+#	buildTree
+#
+# creates the synthetic filesystem below root
+#	<root>/data/<package>/...	packages
+#	<root>/etc/venus/...		installed versions, machine
+#	<root>/opt/victronenergy/version
+#	<root>/<active file>.package for installed packages
+#	<root>/github/<user>/<package>/<branch>/version		served as the GitHub versions
+#
+# returns the number of files created
+
+def buildTree (root, count):
+	files = 0
+	names = packageNames (count)
+	writeFile (root + "/opt/victronenergy/version", VENUS_VERSION + "\n")
+	writeFile (root + "/etc/venus/machine", "einstein\n")
+	os.makedirs (root + "/media", exist_ok=True)
+	os.makedirs (root + "/var/run", exist_ok=True)
+	for index, name in enumerate (names):
+		packageDir = root + "/data/" + name
+		writeFile (packageDir + "/setup", "#!/bin/sh\nexit 0\n", mode=0o755)
+		writeFile (packageDir + "/version", PACKAGE_VERSION + "\n")
+		writeFile (packageDir + "/firstCompatibleVersion", "v2.90\n")
+		writeFile (root + "/github/" + GITHUB_USER + "/" + name + "/" + GITHUB_BRANCH + "/version", PACKAGE_VERSION + "\n")
+		files += 4
+
+		activeFiles = [ "/opt/victronenergy/gui/qml/" + name + "_" + str (item) + ".qml" for item in range (FILES_PER_LIST) ]
+		independentFiles = [ "/etc/" + name + "/" + name + "_" + str (item) + ".conf" for item in range (FILES_PER_LIST) ]
+		# share one file with the previous package - a file conflict if that package is installed
+		if index > 0 and index % CONFLICT_INTERVAL == 0:
+			activeFiles.append ("/opt/victronenergy/gui/qml/" + names[index - 1] + "_0.qml")
+		writeFile (packageDir + "/FileSets/fileList", "".join ([ path + "\n" for path in activeFiles ]))
+		writeFile (packageDir + "/FileSets/fileListVersionIndependent", "".join ([ path + "\n" for path in independentFiles ]))
+		files += 2
+		for path in activeFiles:
+			writeFile (packageDir + "/FileSets/" + VENUS_VERSION + "/" + os.path.basename (path), name + "\n")
+		for path in independentFiles:
+			writeFile (packageDir + "/FileSets/VersionIndependent/" + os.path.basename (path), name + "\n")
+		files += len (activeFiles) + len (independentFiles)
+
+		if index > 0 and index % DEPENDENCY_INTERVAL == 0:
+			writeFile (packageDir + "/packageDependencies", names[index - 1] + " installed\n")
+			files += 1
+
+		# even packages are installed: installed version and .package sidecars for their active files
+		if index % 2 == 0:
+			writeFile (root + "/etc/venus/installedVersion-" + name, PACKAGE_VERSION + "\n")
+			files += 1
+			for path in activeFiles + independentFiles:
+				if not os.path.exists (root + path + ".package"):
+					writeFile (root + path, name + "\n")
+					writeFile (root + path + ".package", name + "\n")
+					files += 2
+		# odd packages are not installed and must not be installed by auto install
+		else:
+			writeFile (root + "/data/setupOptions/" + name + "/DO_NOT_AUTO_INSTALL", "")
+			files += 1
+	return files
+
+
+#	GitHubServer
+#
+# serves <root>/github as the GitHub version and archive server
+
+class QuietHandler (http.server.SimpleHTTPRequestHandler):
+	def log_message (self, *args):
+		pass
+
+class GitHubServer:
+
+	def __init__ (self, directory):
+		handler = functools.partial (QuietHandler, directory=directory)
+		self.server = http.server.ThreadingHTTPServer (( '127.0.0.1', 0 ), handler)
+		self.url = "http://127.0.0.1:" + str (self.server.server_address[1])
+		self.thread = threading.Thread (target=self.server.serve_forever, daemon=True)
+
+	def __enter__ (self):
+		self.thread.start ()
+		return self
+
+	def __exit__ (self, *exc):
+		self.server.shutdown ()
+		self.server.server_close ()
+
+
+#	setUp
+#
+# the part of PackageManager main () needed to run the measured code without starting
+#	the threads or the GLib main loop
+#
+# the work queues are replaced with unbounded ones so no command is lost while nothing
+#	is pulling from them - drainQueues () empties them between measurements
+
+def setUp (pm, root):
+	from dbus.mainloop.glib import DBusGMainLoop
+	DBusGMainLoop (set_as_default=True)
+
+	pm.SetFileRoots (root=root)
+	pm.ReadVenusVersion ()
+	pm.Platform = "Cerbo GX"
+	pm.SystemReboot = False
+	pm.GuiRestart = False
+	pm.InitializePackageManager = False
+	pm.RestartPackageManager = False
+	pm.ShutdownPackageManager = False
+	pm.SetupHelperUninstall = False
+
+	pm.JobJournal = pm.JobJournalClass ()
+	pm.ScriptCheckCache = pm.ScriptCheckCacheClass ()
+	pm.Scheduler = pm.SchedulerClass ()
+	pm.PackageSettings = pm.PackageSettingsClass ()
+	pm.DbusIf = pm.DbusIfClass ()
+	pm.PackageClass.AddPackagesFromDbus ()
+	pm.UpdateGitHubVersion = pm.UpdateGitHubVersionClass ()
+	pm.DownloadGitHub = pm.DownloadGitHubPackagesClass ()
+	pm.InstallPackages = pm.InstallPackagesClass ()
+	pm.AddRemove = pm.AddRemoveClass ()
+	pm.MediaScan = pm.MediaScanClass ()
+	pm.MainLoopPerf = pm.MainLoopPerfClass ()
+
+	pm.AddRemove.AddRemoveQueue = queue.Queue ()
+	pm.DownloadGitHub.DownloadQueue = queue.Queue ()
+	pm.InstallPackages.InstallQueue = queue.Queue ()
+	pm.UpdateGitHubVersion.GitHubVersionQueue = queue.Queue ()
+	pm.Stats = pm.StatsClass ( { 'Download': pm.DownloadGitHub.DownloadQueue, 'Install': pm.InstallPackages.InstallQueue,
+							'AddRemove': pm.AddRemove.AddRemoveQueue, 'GitHubVersion': pm.UpdateGitHubVersion.GitHubVersionQueue } )
+
+#	drainQueues
+#
+# discards all queued commands, finishes their journal entries
+#	and clears the pending flags set when they were pushed
+#
+# returns the number of commands discarded
+
+def drainQueues (pm):
+	drained = 0
+	for theQueue in ( pm.AddRemove.AddRemoveQueue, pm.DownloadGitHub.DownloadQueue,
+						pm.InstallPackages.InstallQueue, pm.UpdateGitHubVersion.GitHubVersionQueue ):
+		while True:
+			try:
+				entry = theQueue.get (block=False)
+			except queue.Empty:
+				break
+			drained += 1
+			command = entry[0]
+			jobId = entry[2]
+			if jobId != None:
+				pm.JobJournal.Finish (jobId)
+			action, _, packageName = command.partition (':')
+			pm.DbusIf.LOCK ("drainQueues")
+			package = pm.PackageClass.LocatePackage (packageName)
+			if package != None:
+				if action == 'download':
+					package.DownloadPending = False
+				elif action in ( 'install', 'uninstall', 'check' ):
+					package.InstallPending = False
+			pm.DbusIf.UNLOCK ("drainQueues")
+	return drained
+
+
+def updateAllPackages (pm, doConflictChecks):
+	pm.DbusIf.LOCK ("updateAllPackages")
+	for package in pm.PackageClass.PackageList:
+		package.UpdateVersionsAndFlags (doConflictChecks=doConflictChecks, doScriptPreChecks=doConflictChecks)
+	pm.DbusIf.UNLOCK ("updateAllPackages")
+
+def mainLoopSweep (pm):
+	pm.MarkPackageDirty ()
+	pm.mainLoop ()
+
+def gitHubRefresh (pm):
+	found = 0
+	for package in list (pm.PackageClass.PackageList):
+		if pm.UpdateGitHubVersion.updateGitHubVersion (package.PackageName, package.GitHubUser, package.GitHubBranch) != "":
+			found += 1
+	return found
+
+
+#	measureStartup
+#
+# runs PackageManager.py as a service on the tree and waits for it's first /PmStatus
+#	the benchmark's own service must be removed first since both use the same name
+#
+# auto install is turned on so the first main loop pass shows "checking for installs"
+#	(installed packages are up to date, the others are DO_NOT_AUTO_INSTALL)
+
+def measureStartup (pm, root, bus, results):
+	import dbus
+
+	pm.DbusIf.DbusSettings['autoInstall'] = 1
+	pm.DbusIf.RemoveDbusService ()
+
+	environment = dict (os.environ, PACKAGE_MANAGER_ROOT=root)
+	startTime = time.perf_counter ()
+	proc = subprocess.Popen ([ sys.executable, os.path.join (packageManagerDir, 'PackageManager.py') ],
+						env=environment, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+	serviceTime = None
+	statusTime = None
+	try:
+		while statusTime == None and time.perf_counter () - startTime < STARTUP_TIMEOUT:
+			if proc.poll () != None:
+				break
+			try:
+				status = bus.call_blocking ('com.victronenergy.packageManager', '/PmStatus',
+								'com.victronenergy.BusItem', 'GetValue', '', [])
+			except dbus.exceptions.DBusException:
+				time.sleep (0.01)
+				continue
+			if serviceTime == None:
+				serviceTime = time.perf_counter () - startTime
+			if str (status) != "":
+				statusTime = time.perf_counter () - startTime
+				results['startupFirstStatus'] = str (status)
+			else:
+				time.sleep (0.01)
+	finally:
+		# TERM lets PackageManager exit normally
+		proc.send_signal (signal.SIGTERM)
+		try:
+			proc.wait (timeout=30)
+		except subprocess.TimeoutExpired:
+			proc.kill ()
+			proc.wait ()
+	results['startupToServiceSeconds'] = serviceTime
+	results['startupToFirstStatusSeconds'] = statusTime
+	# largest child waited for so far - PackageManager (the others are small helpers)
+	results['packageManagerPeakRssKb'] = resource.getrusage (resource.RUSAGE_CHILDREN).ru_maxrss
+
+
+#	run
+#
+# all measurements for one package count - runs in it's own process (see main)
+
+def run (count, repeats, withStartup):
+	results = { 'packages': count }
+	root = tempfile.mkdtemp (prefix='scalebench-')
+	try:
+		results['treeFiles'], results['treeBuildSeconds'] = timed (lambda: buildTree (root, count))
+
+		with GitHubServer (root + "/github") as gitHub, PrivateBus ():
+			# read when PackageManager is imported and by the service started in measureStartup
+			os.environ['PACKAGE_MANAGER_GITHUB_URL'] = gitHub.url
+			os.environ['PACKAGE_MANAGER_GITHUB_RAW_URL'] = gitHub.url
+			import dbus
+			import PackageManager as pm
+
+			_, results['setUpSeconds'] = timed (lambda: setUp (pm, root))
+			names = packageNames (count)
+
+			_, results['addStoredPackagesEmptyListSeconds'] = timed (pm.PackageClass.AddStoredPackages)
+			results['addStoredPackagesPushed'] = drainQueues (pm)
+
+			def addAll ():
+				for name in names:
+					pm.PackageClass.AddPackage (packageName=name, gitHubUser=GITHUB_USER,
+									gitHubBranch=GITHUB_BRANCH, source='AUTO')
+			_, results['addPackagesSeconds'] = timed (addAll)
+			drainQueues (pm)
+
+			samples = []
+			for repeat in range (repeats):
+				samples.append (timed (pm.PackageClass.AddStoredPackages)[1])
+				drainQueues (pm)
+			results['addStoredPackagesFullListSeconds'] = median (samples)
+
+			samples = []
+			for repeat in range (repeats):
+				samples.append (timed (lambda: updateAllPackages (pm, False))[1])
+				drainQueues (pm)
+			results['updateVersionsAndFlagsSeconds'] = median (samples)
+
+			samples = []
+			for repeat in range (repeats):
+				samples.append (timed (lambda: updateAllPackages (pm, True))[1])
+				results['scriptChecksPushed'] = drainQueues (pm)
+			results['updateVersionsAndFlagsConflictChecksSeconds'] = median (samples)
+			results['incompatiblePackages'] = len ([ package for package in pm.PackageClass.PackageList
+														if package.Incompatible != "" ])
+
+			samples = []
+			for repeat in range (repeats):
+				samples.append (timed (lambda: mainLoopSweep (pm))[1])
+				drainQueues (pm)
+			results['mainLoopSweepSeconds'] = median (samples)
+
+			results['gitHubVersionsFound'], results['gitHubRefreshSeconds'] = timed (lambda: gitHubRefresh (pm))
+			drainQueues (pm)
+
+			results['peakRssKb'] = resource.getrusage (resource.RUSAGE_SELF).ru_maxrss
+
+			if withStartup:
+				measureStartup (pm, root, dbus.SystemBus (), results)
+	finally:
+		shutil.rmtree (root, ignore_errors=True)
+	return results
+
+
+def main ():
+	parser = argparse.ArgumentParser (description='PackageManager scaling with the number of packages')
+	parser.add_argument ('-n', '--packages', type=int, nargs='+', default=[ 10, 100, 500 ], help='package counts')
+	parser.add_argument ('-r', '--repeats', type=int, default=3, help='repeats of the shorter measurements')
+	parser.add_argument ('--no-startup', action='store_true', help='skip starting PackageManager.py as a service')
+	parser.add_argument ('-v', '--verbose', action='store_true', help='show PackageManager log messages')
+	parser.add_argument ('--single', action='store_true', help=argparse.SUPPRESS)
+	args = parser.parse_args ()
+	repeats = max (1, args.repeats)
+
+	# one package count - called by the loop below
+	if args.single:
+		logging.basicConfig (format='%(levelname)s:%(message)s',
+								level=logging.INFO if args.verbose else logging.CRITICAL)
+		results = run (max (1, args.packages[0]), repeats, not args.no_startup)
+		print (json.dumps (results))
+		return
+
+	allResults = []
+	for count in args.packages:
+		command = [ sys.executable, os.path.abspath (__file__), '--single', '-n', str (count), '-r', str (repeats) ]
+		if args.no_startup:
+			command.append ('--no-startup')
+		if args.verbose:
+			command.append ('-v')
+		proc = subprocess.run (command, stdout=subprocess.PIPE, universal_newlines=True)
+		if proc.returncode != 0:
+			allResults.append ({ 'packages': count, 'error': "exit code " + str (proc.returncode) })
+			continue
+		allResults.append (json.loads (proc.stdout.strip ().splitlines ()[-1]))
+	print (json.dumps ({ 'results': allResults }, indent=1, sort_keys=True))
+
+
+if __name__ == "__main__":
+	main ()
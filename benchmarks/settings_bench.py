@@ -0,0 +1,91 @@
+#!/usr/bin/env python3
+
+# throughput and latency of dbus Settings access
+#	run against the localsettings stand-in on a private bus (see privatebus.py)
+#	so it can be run on any Linux machine with dbus-daemon and dbus-python
+#
+# measures:
+#	SettingsDevice creation with new settings and again when they exist
+#	AddSettings for many settings in one call
+#	GetItems for the whole settings tree
+#	SetValue round trip latency (median, 95th percentile, max)
+#	RemoveSettings for many settings in one call
+#
+# results are written to stdout as JSON
+#
+# usage: python3 settings_bench.py [-n settings] [-c SetValue calls]
+
+import os
+import sys
+import json
+import time
+import argparse
+
+sys.path.insert (1, os.path.join (os.path.dirname (os.path.abspath (__file__)), '..', 'velib_python'))
+from privatebus import PrivateBus
+
+SETTINGS_SERVICE = 'com.victronenergy.settings'
+
+
+def percentile (samples, fraction):
+	samples = sorted (samples)
+	return samples[min (len (samples) - 1, int (len (samples) * fraction))]
+
+def timed (function):
+	startTime = time.perf_counter ()
+	result = function ()
+	return result, time.perf_counter () - startTime
+
+
+def run (settingsCount, setValueCount):
+	import dbus
+	from dbus.mainloop.glib import DBusGMainLoop
+	from settingsdevice import SettingsDevice
+	from ve_utils import wrap_dbus_value
+
+	DBusGMainLoop (set_as_default=True)
+	bus = dbus.SystemBus ()
+	results = { 'settings': settingsCount }
+
+	supportedSettings = { 'setting' + str (i): [ '/Settings/Bench/Device/Setting' + str (i), i, 0, 0 ]
+								for i in range (settingsCount) }
+	_, results['settingsDeviceNewSeconds'] = timed (lambda: SettingsDevice (bus, supportedSettings, None, timeout=10))
+	_, results['settingsDeviceExistingSeconds'] = timed (lambda: SettingsDevice (bus, supportedSettings, None, timeout=10))
+
+	bulkPaths = [ '/Settings/Bench/Bulk/Setting' + str (i) for i in range (settingsCount) ]
+	bulk = [ { 'path': path, 'default': "" } for path in bulkPaths ]
+	_, results['addSettingsSeconds'] = timed (lambda: bus.call_blocking (SETTINGS_SERVICE, '/',
+							'com.victronenergy.Settings', 'AddSettings', 'aa{sv}', [ bulk ]))
+
+	items, results['getItemsSeconds'] = timed (lambda: bus.call_blocking (SETTINGS_SERVICE, '/',
+							None, 'GetItems', '', []))
+	results['getItemsCount'] = len (items)
+
+	latencies = []
+	for i in range (setValueCount):
+		path = bulkPaths[i % len (bulkPaths)]
+		_, latency = timed (lambda: bus.call_blocking (SETTINGS_SERVICE, path, 'com.victronenergy.BusItem',
+							'SetValue', 'v', [ wrap_dbus_value ("value " + str (i)) ]))
+		latencies.append (latency)
+	results['setValueMedianMs'] = percentile (latencies, 0.5) * 1000
+	results['setValueP95Ms'] = percentile (latencies, 0.95) * 1000
+	results['setValueMaxMs'] = max (latencies) * 1000
+
+	_, results['removeSettingsSeconds'] = timed (lambda: bus.call_blocking (SETTINGS_SERVICE, '/',
+							'com.victronenergy.Settings', 'RemoveSettings', 'as', [ bulkPaths ]))
+	return results
+
+
+def main ():
+	parser = argparse.ArgumentParser (description='dbus Settings benchmarks on a private bus')
+	parser.add_argument ('-n', '--settings', type=int, default=200, help='number of settings')
+	parser.add_argument ('-c', '--calls', type=int, default=500, help='number of SetValue calls')
+	args = parser.parse_args ()
+
+	with PrivateBus ():
+		results = run (max (1, args.settings), max (1, args.calls))
+	print (json.dumps (results, indent=1, sort_keys=True))
+
+
+if __name__ == "__main__":
+	main ()
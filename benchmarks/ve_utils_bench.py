@@ -0,0 +1,91 @@
+#!/usr/bin/env python3
+
+# micro-benchmarks for ve_utils.wrap_dbus_value / unwrap_dbus_value
+#
+# the shapes are the ones seen by:
+#	VeDbusRootExport.GetItems - { path: { 'Value': wrapped value, 'Text': text } } for a whole service
+#	DbusMonitor.handler_item_changes - a few changed paths from one ItemsChanged signal
+#	single values passed to SetValue / PropertiesChanged
+#
+# each case is timed with the type dispatch tables (wrap_dbus_value / unwrap_dbus_value)
+#	and with the isinstance chain used for types not in the tables
+#
+# usage: python3 ve_utils_bench.py [-n repeats]
+#	must be run where dbus-python is installed
+
+import os
+import sys
+import timeit
+import argparse
+
+sys.path.insert (1, os.path.join (os.path.dirname (os.path.abspath (__file__)), '..', 'velib_python'))
+import ve_utils
+from ve_utils import wrap_dbus_value, unwrap_dbus_value
+
+
+# a service with pathCount paths with a mix of value types
+def makeServiceValues (pathCount):
+	values = {}
+	for i in range (pathCount):
+		kind = i % 5
+		if kind == 0:
+			value = i * 1.5
+		elif kind == 1:
+			value = i
+		elif kind == 2:
+			value = "text " + str (i)
+		elif kind == 3:
+			value = None
+		else:
+			value = [ i, i + 1 ]
+		values['/Path/' + str (i)] = value
+	return values
+
+def makeItems (values):
+	return { path: { 'Value': wrap_dbus_value (value), 'Text': str (value) } for path, value in values.items () }
+
+def makeItemsChanged (values, count):
+	items = makeItems (values)
+	paths = list (items)[:count]
+	return ve_utils.dbus.Dictionary ({ path: ve_utils.dbus.Dictionary (items[path]) for path in paths })
+
+
+def main ():
+	parser = argparse.ArgumentParser (description='wrap/unwrap_dbus_value micro-benchmarks')
+	parser.add_argument ('-n', '--number', type=int, default=2000, help='calls per case')
+	args = parser.parse_args ()
+
+	serviceValues = makeServiceValues (200)
+	items = makeItems (serviceValues)
+	itemsChanged = makeItemsChanged (serviceValues, 10)
+	wrappedDouble = wrap_dbus_value (12.5)
+	wrappedInt = wrap_dbus_value (12)
+	wrappedString = wrap_dbus_value ("text")
+
+	cases = [
+		( "wrap float", lambda: wrap_dbus_value (12.5), lambda: ve_utils._wrap_dbus_value_slow (12.5) ),
+		( "wrap int", lambda: wrap_dbus_value (12), lambda: ve_utils._wrap_dbus_value_slow (12) ),
+		( "wrap str", lambda: wrap_dbus_value ("text"), lambda: ve_utils._wrap_dbus_value_slow ("text") ),
+		( "wrap GetItems (200 paths)",
+			lambda: { path: { 'Value': wrap_dbus_value (v), 'Text': str (v) } for path, v in serviceValues.items () },
+			lambda: { path: { 'Value': ve_utils._wrap_dbus_value_slow (v), 'Text': str (v) } for path, v in serviceValues.items () } ),
+		( "unwrap Double", lambda: unwrap_dbus_value (wrappedDouble), lambda: ve_utils._unwrap_dbus_value_slow (wrappedDouble) ),
+		( "unwrap Int32", lambda: unwrap_dbus_value (wrappedInt), lambda: ve_utils._unwrap_dbus_value_slow (wrappedInt) ),
+		( "unwrap String", lambda: unwrap_dbus_value (wrappedString), lambda: ve_utils._unwrap_dbus_value_slow (wrappedString) ),
+		( "unwrap GetItems (200 paths)",
+			lambda: { path: unwrap_dbus_value (item['Value']) for path, item in items.items () },
+			lambda: { path: ve_utils._unwrap_dbus_value_slow (item['Value']) for path, item in items.items () } ),
+		( "unwrap ItemsChanged (10 paths)",
+			lambda: [ unwrap_dbus_value (changes['Value']) for changes in itemsChanged.values () ],
+			lambda: [ ve_utils._unwrap_dbus_value_slow (changes['Value']) for changes in itemsChanged.values () ] ),
+	]
+
+	print ("{:32} {:>12} {:>12}".format ("case", "dispatch us", "isinstance us"))
+	for name, fast, slow in cases:
+		fastTime = min (timeit.repeat (fast, number=args.number, repeat=3)) / args.number * 1e6
+		slowTime = min (timeit.repeat (slow, number=args.number, repeat=3)) / args.number * 1e6
+		print ("{:32} {:12.3f} {:12.3f}".format (name, fastTime, slowTime))
+
+
+if __name__ == "__main__":
+	main ()
@@ -25,7 +25,7 @@ import argparse
 import pprint
 import traceback
 import os
-from collections import defaultdict
+from collections import defaultdict, deque
 from functools import partial
 
 # our own packages
@@ -81,17 +81,40 @@ class Service(object):
 
 class DbusMonitor(object):
 	## Constructor
+	# With asyncScan=True the services already on the bus are scanned with asynchronous
+	# calls, at most maxPendingScans at a time, and the constructor returns before the scan
+	# is done. scanDoneCallback() is called from the mainloop once all of them have been
+	# scanned. Services that appear while that scan is running are added to it, and
+	# deviceAddedCallback is called for them as usual. Services that disappear or change
+	# owner while being scanned are not added.
 	def __init__(self, dbusTree, valueChangedCallback=None, deviceAddedCallback=None,
-					deviceRemovedCallback=None, namespace="com.victronenergy", ignoreServices=[]):
+					deviceRemovedCallback=None, namespace="com.victronenergy", ignoreServices=[],
+					asyncScan=False, maxPendingScans=8, scanDoneCallback=None, batchChangedCallback=None):
 		# valueChangedCallback is the callback that we call when something has changed.
 		# def value_changed_on_dbus(dbusServiceName, dbusPath, options, changes, deviceInstance):
 		# in which changes is a tuple with GetText() and GetValue()
 		self.valueChangedCallback = valueChangedCallback
+		# batchChangedCallback is called once per mainloop iteration with all changes since
+		# the previous call, as a list of (dbusServiceName, dbusPath, options, changes, deviceInstance)
+		self.batchChangedCallback = batchChangedCallback
 		self.deviceAddedCallback = deviceAddedCallback
 		self.deviceRemovedCallback = deviceRemovedCallback
 		self.dbusTree = dbusTree
 		self.ignoreServices = ignoreServices
 
+		# State of the asynchronous scan. _scanQueue holds (serviceName, notify) tuples
+		# waiting to be scanned, _scanning maps the services being scanned to a token
+		# that is dropped when the service changes owner, so stale replies are ignored.
+		self._asyncScanRunning = False
+		self._maxPendingScans = max(1, maxPendingScans)
+		self._scanDoneCallback = scanDoneCallback
+		self._scanQueue = deque()
+		self._scanning = {}
+
+		# Value changes waiting for the idle callback, the last value per (serviceName, path)
+		self._pendingChanges = {}
+		self._flushScheduled = False
+
 		# Lists all tracked services. Stores name, id, device instance, value per path, and whenToLog info
 		# indexed by service name (eg. com.victronenergy.settings).
 		self.servicesByName = {}
@@ -130,11 +153,97 @@ class DbusMonitor(object):
 
 		logger.info('===== Search on dbus for services that we will monitor starting... =====')
 		serviceNames = self.dbusConn.list_names()
+		if asyncScan:
+			self._asyncScanRunning = True
+			for serviceName in serviceNames:
+				if self._service_paths(str(serviceName)) is not None:
+					self._scanQueue.append((str(serviceName), False))
+			self._scan_next()
+			return
+
 		for serviceName in serviceNames:
 			self.scan_dbus_service(serviceName)
 
 		logger.info('===== Search on dbus for services that we will monitor finished =====')
 
+	# Starts scans from the queue until maxPendingScans are running, and calls
+	# scanDoneCallback once the queue is empty and all scans have finished.
+	def _scan_next(self):
+		while self._scanQueue and len(self._scanning) < self._maxPendingScans:
+			serviceName, notify = self._scanQueue.popleft()
+			if serviceName in self.servicesByName or serviceName in self._scanning:
+				continue
+			token = object()
+			self._scanning[serviceName] = token
+			self.dbusConn.call_async('org.freedesktop.DBus', '/org/freedesktop/DBus',
+				'org.freedesktop.DBus', 'GetNameOwner', 's', [serviceName],
+				reply_handler=partial(self._scan_owner_reply, serviceName, token, notify),
+				error_handler=partial(self._scan_owner_error, serviceName, token))
+
+		if self._asyncScanRunning and not self._scanQueue and not self._scanning:
+			self._asyncScanRunning = False
+			logger.info('===== Search on dbus for services that we will monitor finished =====')
+			if self._scanDoneCallback is not None:
+				self._scanDoneCallback()
+
+	# Returns True, and forgets the scan, if token is still the current scan of serviceName.
+	def _end_scan(self, serviceName, token):
+		if self._scanning.get(serviceName) is not token:
+			return False
+		del self._scanning[serviceName]
+		return True
+
+	def _scan_owner_reply(self, serviceName, token, notify, serviceId):
+		if self._scanning.get(serviceName) is not token:
+			return
+		# Ask the owner rather than the name, so the reply is from the owner we recorded
+		serviceId = str(serviceId)
+		self.dbusConn.call_async(serviceId, '/', None, 'GetItems', '', [],
+			reply_handler=partial(self._scan_items_reply, serviceName, serviceId, token, notify),
+			error_handler=partial(self._scan_items_error, serviceName, token, notify))
+
+	def _scan_owner_error(self, serviceName, token, error):
+		# The service disappeared before the scan started
+		if self._end_scan(serviceName, token):
+			logger.debug("%s disappeared before it was scanned" % serviceName)
+			self._scan_next()
+
+	def _scan_items_reply(self, serviceName, serviceId, token, notify, values):
+		if not self._end_scan(serviceName, token):
+			return
+		logger.info("Found: %s, scanning and storing items" % serviceName)
+		try:
+			added = self.scan_dbus_service_getitems_done(serviceName, serviceId, values)
+		except:
+			logger.error("Ignoring %s because of error while scanning:" % (serviceName))
+			traceback.print_exc()
+			added = False
+		self._scan_added(serviceName, added, notify)
+
+	def _scan_items_error(self, serviceName, token, notify, error):
+		if not self._end_scan(serviceName, token):
+			return
+		# GetItems is not supported, use the (blocking) legacy methods
+		logger.info("GetItems failed, trying legacy methods")
+		added = self.scan_dbus_service(serviceName)
+		self._scan_added(serviceName, added, notify)
+
+	def _scan_added(self, serviceName, added, notify):
+		if added and notify and self.deviceAddedCallback is not None:
+			self.deviceAddedCallback(serviceName, self.get_device_instance(serviceName))
+		self._scan_next()
+
+	# Returns the paths to monitor for serviceName, or None if it is not monitored
+	def _service_paths(self, serviceName):
+		if (len(self.ignoreServices) != 0 and any(serviceName.startswith(x) for x in self.ignoreServices)):
+			logger.debug("Ignoring service %s" % serviceName)
+			return None
+
+		paths = self.dbusTree.get('.'.join(serviceName.split('.')[0:3]), None)
+		if paths is None:
+			logger.debug("Ignoring service %s, not in the tree" % serviceName)
+		return paths
+
 	@staticmethod
 	def make_service(serviceId, serviceName, deviceInstance):
 		""" Override this to use a different kind of service object. """
@@ -152,7 +261,18 @@ class DbusMonitor(object):
 		GLib.idle_add(exit_on_error, self._process_name_owner_changed, name, oldowner, newowner)
 
 	def _process_name_owner_changed(self, name, oldowner, newowner):
-		if newowner != '':
+		# A scan in progress is for the old owner: drop it, and rescan below if there is a new owner
+		if name in self._scanning:
+			del self._scanning[name]
+			if newowner == '':
+				self._scan_next()
+
+		if newowner != '' and self._asyncScanRunning:
+			if self._service_paths(name) is not None:
+				self._scanQueue.append((name, True))
+			self._scan_next()
+
+		elif newowner != '':
 			# so we found some new service. Check if we can do something with it.
 			newdeviceadded = self.scan_dbus_service(name)
 			if newdeviceadded and self.deviceAddedCallback is not None:
@@ -191,13 +311,8 @@ class DbusMonitor(object):
 		# make it a normal string instead of dbus string
 		serviceName = str(serviceName)
 
-		if (len(self.ignoreServices) != 0 and any(serviceName.startswith(x) for x in self.ignoreServices)):
-			logger.debug("Ignoring service %s" % serviceName)
-			return False
-
-		paths = self.dbusTree.get('.'.join(serviceName.split('.')[0:3]), None)
+		paths = self._service_paths(serviceName)
 		if paths is None:
-			logger.debug("Ignoring service %s, not in the tree" % serviceName)
 			return False
 
 		logger.info("Found: %s, scanning and storing items" % serviceName)
@@ -374,10 +489,31 @@ class DbusMonitor(object):
 		a.value = value
 		a.text = text
 
-		# And do the rest of the processing in on the mainloop
-		if self.valueChangedCallback is not None:
-			GLib.idle_add(exit_on_error, self._execute_value_changes, service.name, path, {
-				'Value': value, 'Text': text}, a.options)
+		# And do the rest of the processing in on the mainloop. Changes are buffered
+		# and all sent by one idle callback, where only the last change to a path counts.
+		if self.valueChangedCallback is not None or self.batchChangedCallback is not None:
+			self._pendingChanges[(service.name, path)] = ({'Value': value, 'Text': text}, a.options)
+			if not self._flushScheduled:
+				self._flushScheduled = True
+				GLib.idle_add(exit_on_error, self._flush_value_changes)
+
+	def _flush_value_changes(self):
+		pending = self._pendingChanges
+		self._pendingChanges = {}
+		self._flushScheduled = False
+
+		batch = []
+		for (serviceName, objectPath), (changes, options) in pending.items():
+			# the service might have disappeared since the change was buffered
+			if serviceName not in self.servicesByName:
+				continue
+			batch.append((serviceName, objectPath, options, changes, self.get_device_instance(serviceName)))
+			if self.valueChangedCallback is not None:
+				self._execute_value_changes(serviceName, objectPath, changes, options)
+
+		if batch and self.batchChangedCallback is not None:
+			self.batchChangedCallback(batch)
+		return False
 
 	def _execute_value_changes(self, serviceName, objectPath, changes, options):
 		# double check that the service still exists, as it might have
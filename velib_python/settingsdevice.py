@@ -2,9 +2,11 @@ import dbus
 import logging
 import time
 from functools import partial
+from gi.repository import GLib
 
 # Local imports
 from vedbus import VeDbusItemImport
+from ve_utils import add_name_owner_changed_receiver
 
 ## Indexes for the setting dictonary.
 PATH = 0
@@ -13,6 +15,45 @@ MINIMUM = 2
 MAXIMUM = 3
 SILENT = 4
 
+## Whether the settings service currently has an owner, keyed by (bus, service name).
+# Kept up to date by one NameOwnerChanged receiver per bus and service, shared by all
+# SettingsDevice instances so only the first one has to wait for or ask about the service.
+_service_owned = {}
+
+## Waits until service name has an owner on the bus, for at most timeout seconds.
+# The wait returns as soon as NameOwnerChanged reports the service. The default GLib
+# context is run while waiting, so the dbus main loop must be set up (DBusGMainLoop)
+# and this must be called from the thread that runs it. NameHasOwner is also checked
+# at least once a second in case signals are not being dispatched.
+# @return True if the service exists, False if the timeout expired
+def _wait_for_service(bus, name, timeout):
+	key = (bus.get_unique_name(), name)
+	if key not in _service_owned:
+		def name_owner_changed(changed_name, old_owner, new_owner):
+			if changed_name == name:
+				_service_owned[key] = new_owner != ''
+		add_name_owner_changed_receiver(bus, name_owner_changed, namespace=name)
+		_service_owned[key] = bool(bus.name_has_owner(name))
+
+	if _service_owned[key]:
+		return True
+
+	logging.info('waiting for settings')
+	context = GLib.MainContext.default()
+	deadline = time.monotonic() + timeout
+	while not _service_owned[key]:
+		remaining = deadline - time.monotonic()
+		if remaining <= 0:
+			return False
+		woken = []
+		timer = GLib.timeout_add(int(min(remaining, 1) * 1000) + 1, lambda: woken.append(True))
+		context.iteration(True)
+		if not woken:
+			GLib.source_remove(timer)
+		if not _service_owned[key]:
+			_service_owned[key] = bool(bus.name_has_owner(name))
+	return True
+
 ## The Settings Device class.
 # Used by python programs, such as the vrm-logger, to read and write settings they
 # need to store on disk. And since these settings might be changed from a different
@@ -43,15 +84,8 @@ class SettingsDevice(object):
 		self._values = {} # stored the values, used to pass the old value along on a setting change
 		self._settings = {}
 
-		count = 0
-		while True:
-			if 'com.victronenergy.settings' in self._bus.list_names():
-				break
-			if count == timeout:
-				raise Exception("The settings service com.victronenergy.settings does not exist!")
-			count += 1
-			logging.info('waiting for settings')
-			time.sleep(1)
+		if not _wait_for_service(self._bus, self._dbus_name, timeout):
+			raise Exception("The settings service %s does not exist!" % self._dbus_name)
 
 		# Add the items.
 		self.addSettings(supportedSettings)
@@ -201,7 +201,49 @@ def read_file(path):
 	return content
 
 
-def wrap_dbus_value(value):
+def _wrap_int(value):
+	try:
+		return dbus.Int32(value, variant_level=1)
+	except OverflowError:
+		return dbus.Int64(value, variant_level=1)
+
+def _wrap_list(value):
+	if len(value) == 0:
+		# If the list is empty we cannot infer the type of the contents. So assume unsigned integer.
+		# A (signed) integer is dangerous, because an empty list of signed integers is used to encode
+		# an invalid value.
+		return dbus.Array([], signature=dbus.Signature('u'), variant_level=1)
+	items = []
+	for x in value:
+		wrap = _wrap_types.get(type(x))
+		items.append(wrap(x) if wrap is not None else _wrap_dbus_value_slow(x))
+	return dbus.Array(items, variant_level=1)
+
+def _wrap_dict(value):
+	# Wrapping the keys of the dictionary causes D-Bus errors like:
+	# 'arguments to dbus_message_iter_open_container() were incorrect,
+	# assertion "(type == DBUS_TYPE_ARRAY && contained_signature &&
+	# *contained_signature == DBUS_DICT_ENTRY_BEGIN_CHAR) || (contained_signature == NULL ||
+	# _dbus_check_is_valid_signature (contained_signature))" failed in file ...'
+	items = {}
+	for k, v in value.items():
+		wrap = _wrap_types.get(type(v))
+		items[k] = wrap(v) if wrap is not None else _wrap_dbus_value_slow(v)
+	return dbus.Dictionary(items, variant_level=1)
+
+# Converters for the exact python types, other types (including subclasses) go
+# through the isinstance checks in _wrap_dbus_value_slow.
+_wrap_types = {
+	type(None): lambda value: VEDBUS_INVALID,
+	float: lambda value: dbus.Double(value, variant_level=1),
+	bool: lambda value: dbus.Boolean(value, variant_level=1),
+	int: _wrap_int,
+	str: lambda value: dbus.String(value, variant_level=1),
+	list: _wrap_list,
+	dict: _wrap_dict,
+}
+
+def _wrap_dbus_value_slow(value):
 	if value is None:
 		return VEDBUS_INVALID
 	if isinstance(value, float):
@@ -209,58 +251,101 @@ def wrap_dbus_value(value):
 	if isinstance(value, bool):
 		return dbus.Boolean(value, variant_level=1)
 	if isinstance(value, int):
-		try:
-			return dbus.Int32(value, variant_level=1)
-		except OverflowError:
-			return dbus.Int64(value, variant_level=1)
+		return _wrap_int(value)
 	if isinstance(value, str):
 		return dbus.String(value, variant_level=1)
 	if isinstance(value, list):
-		if len(value) == 0:
-			# If the list is empty we cannot infer the type of the contents. So assume unsigned integer.
-			# A (signed) integer is dangerous, because an empty list of signed integers is used to encode
-			# an invalid value.
-			return dbus.Array([], signature=dbus.Signature('u'), variant_level=1)
-		return dbus.Array([wrap_dbus_value(x) for x in value], variant_level=1)
+		return _wrap_list(value)
 	if isinstance(value, dict):
-		# Wrapping the keys of the dictionary causes D-Bus errors like:
-		# 'arguments to dbus_message_iter_open_container() were incorrect,
-		# assertion "(type == DBUS_TYPE_ARRAY && contained_signature &&
-		# *contained_signature == DBUS_DICT_ENTRY_BEGIN_CHAR) || (contained_signature == NULL ||
-		# _dbus_check_is_valid_signature (contained_signature))" failed in file ...'
-		return dbus.Dictionary({(k, wrap_dbus_value(v)) for k, v in value.items()}, variant_level=1)
+		return _wrap_dict(value)
 	return value
 
+def wrap_dbus_value(value):
+	wrap = _wrap_types.get(type(value))
+	if wrap is not None:
+		return wrap(value)
+	return _wrap_dbus_value_slow(value)
 
-dbus_int_types = (dbus.Int32, dbus.UInt32, dbus.Byte, dbus.Int16, dbus.UInt16, dbus.UInt32, dbus.Int64, dbus.UInt64)
 
+dbus_int_types = (dbus.Int32, dbus.UInt32, dbus.Byte, dbus.Int16, dbus.UInt16, dbus.Int64, dbus.UInt64)
 
-def unwrap_dbus_value(val):
-	"""Converts D-Bus values back to the original type. For example if val is of type DBus.Double,
-	a float will be returned."""
+def _unwrap_identity(val):
+	return val
+
+def _unwrap_list(val):
+	items = []
+	for x in val:
+		unwrap = _unwrap_types.get(type(x))
+		items.append(unwrap(x) if unwrap is not None else _unwrap_dbus_value_slow(x))
+	return items
+
+def _unwrap_array(val):
+	v = _unwrap_list(val)
+	return None if len(v) == 0 else v
+
+def _unwrap_dict(val):
+	# Do not unwrap the keys, see comment in wrap_dbus_value
+	items = {}
+	for x, y in val.items():
+		unwrap = _unwrap_types.get(type(y))
+		items[x] = unwrap(y) if unwrap is not None else _unwrap_dbus_value_slow(y)
+	return items
+
+def _unwrap_byte_array(val):
+	return "".join([bytes(x) for x in val])
+
+# Converters for the exact D-Bus (and plain python) types, other types (including
+# subclasses) go through the isinstance checks in _unwrap_dbus_value_slow.
+_unwrap_types = {
+	dbus.Double: float,
+	dbus.Array: _unwrap_array,
+	dbus.String: str,
+	dbus.Signature: str,
+	dbus.ByteArray: _unwrap_byte_array,
+	dbus.Struct: _unwrap_list,
+	dbus.Dictionary: _unwrap_dict,
+	dbus.Boolean: bool,
+	list: _unwrap_list,
+	tuple: _unwrap_list,
+	dict: _unwrap_dict,
+	int: _unwrap_identity,
+	float: _unwrap_identity,
+	str: _unwrap_identity,
+	bool: _unwrap_identity,
+	type(None): _unwrap_identity,
+}
+_unwrap_types.update((t, int) for t in dbus_int_types)
+
+def _unwrap_dbus_value_slow(val):
 	if isinstance(val, dbus_int_types):
 		return int(val)
 	if isinstance(val, dbus.Double):
 		return float(val)
 	if isinstance(val, dbus.Array):
-		v = [unwrap_dbus_value(x) for x in val]
-		return None if len(v) == 0 else v
+		return _unwrap_array(val)
 	if isinstance(val, (dbus.Signature, dbus.String)):
 		return str(val)
 	# Python has no byte type, so we convert to an integer.
 	if isinstance(val, dbus.Byte):
 		return int(val)
 	if isinstance(val, dbus.ByteArray):
-		return "".join([bytes(x) for x in val])
+		return _unwrap_byte_array(val)
 	if isinstance(val, (list, tuple)):
-		return [unwrap_dbus_value(x) for x in val]
+		return _unwrap_list(val)
 	if isinstance(val, (dbus.Dictionary, dict)):
-		# Do not unwrap the keys, see comment in wrap_dbus_value
-		return dict([(x, unwrap_dbus_value(y)) for x, y in val.items()])
+		return _unwrap_dict(val)
 	if isinstance(val, dbus.Boolean):
 		return bool(val)
 	return val
 
+def unwrap_dbus_value(val):
+	"""Converts D-Bus values back to the original type. For example if val is of type DBus.Double,
+	a float will be returned."""
+	unwrap = _unwrap_types.get(type(val))
+	if unwrap is not None:
+		return unwrap(val)
+	return _unwrap_dbus_value_slow(val)
+
 # When supported, only name owner changes for the the given namespace are reported. This
 # prevents spending cpu time at irrelevant changes, like scripts accessing the bus temporarily.
 def add_name_owner_changed_receiver(dbus, name_owner_changed, namespace="com.victronenergy"):
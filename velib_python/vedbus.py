@@ -56,9 +56,21 @@ from ve_utils import wrap_dbus_value, unwrap_dbus_value
 
 #   The signature of a variant is 'v'.
 
+# Node of the path tree kept by VeDbusService. Each node holds the exported item for its
+# path (if any) and its children by path element, so subtree queries only visit the subtree.
+class PathTreeNode(object):
+	__slots__ = ('children', 'item')
+
+	def __init__(self):
+		self.children = {}
+		self.item = None
+
 # Export ourselves as a D-Bus service.
 class VeDbusService(object):
 	def __init__(self, servicename, bus=None, register=True):
+		# the objects below indexed by path element, see _tree_add, _tree_remove and _tree_items
+		# created first as __del__ depends on it
+		self._pathtree = PathTreeNode()
 		# dict containing the VeDbusItemExport objects, with their path as the key.
 		self._dbusobjects = {}
 		self._dbusnodes = {}
@@ -90,12 +102,15 @@ class VeDbusService(object):
 	# To force immediate deregistering of this dbus service and all its object paths, explicitly
 	# call __del__().
 	def __del__(self):
+		if hasattr(self, '_pathtree'):
+			self.del_tree('/')
 		for node in list(self._dbusnodes.values()):
 			node.__del__()
 		self._dbusnodes.clear()
 		for item in list(self._dbusobjects.values()):
 			item.__del__()
 		self._dbusobjects.clear()
+		self._pathtree = PathTreeNode()
 		if self._dbusname:
 			self._dbusname.__del__()  # Forces call to self._bus.release_name(self._name), see source code
 		self._dbusname = None
@@ -122,6 +137,7 @@ class VeDbusService(object):
 			if subPath not in self._dbusnodes and subPath not in self._dbusobjects:
 				self._dbusnodes[subPath] = VeDbusTreeExport(self._dbusconn, subPath, self)
 		self._dbusobjects[path] = item
+		self._tree_add(path, item)
 		logging.debug('added %s with start value %s. Writeable is %s' % (path, value, writeable))
 		return item
 
@@ -148,16 +164,114 @@ class VeDbusService(object):
 
 		return self._onchangecallbacks[path](path, newvalue)
 
+	# Removes all objects at and below root, and the VeDbusTreeExport nodes that no longer
+	# have objects below them, with one walk over the subtree. Unlike deleting the objects
+	# one by one this doesn't look up each path in the tree again. Returns the removed paths.
+	def del_tree(self, root):
+		elements = self._path_elements(root)
+		nodes = [self._pathtree]
+		for e in elements:
+			node = nodes[-1].children.get(e)
+			if node is None:
+				return []
+			nodes.append(node)
+
+		# collect the objects and the tree node paths in the subtree
+		items = []
+		treepaths = []
+		stack = [(nodes[-1], '/' + '/'.join(elements) if elements else '')]
+		while stack:
+			node, path = stack.pop()
+			if node.item is not None:
+				items.append((path, node.item))
+			if node.children:
+				if path:
+					treepaths.append(path)
+				for e, child in node.children.items():
+					stack.append((child, path + '/' + e))
+
+		# detach the subtree, then prune the parents that are now empty
+		if elements:
+			del nodes[-2].children[elements[-1]]
+			for i in range(len(elements) - 1, 0, -1):
+				node = nodes[i]
+				if node.item is not None or node.children:
+					break
+				del nodes[i - 1].children[elements[i - 1]]
+				treepaths.append('/' + '/'.join(elements[:i]))
+		else:
+			self._pathtree = PathTreeNode()
+
+		for path, item in items:
+			self._dbusobjects.pop(path, None)
+			# already removed from the indexes above
+			item._deletecallback = None
+			item.__del__()
+		for path in treepaths:
+			node = self._dbusnodes.pop(path, None)
+			if node is not None:
+				node.__del__()
+		return [path for path, _ in items]
+
 	def _item_deleted(self, path):
 		self._dbusobjects.pop(path)
-		for np in list(self._dbusnodes.keys()):
-			if np != '/':
-				for ip in self._dbusobjects:
-					if ip.startswith(np + '/'):
-						break
-				else:
-					self._dbusnodes[np].__del__()
-					self._dbusnodes.pop(np)
+		# tree nodes that no longer have any objects below them are removed
+		for np in self._tree_remove(path):
+			node = self._dbusnodes.pop(np, None)
+			if node is not None:
+				node.__del__()
+
+	# Path tree helpers. Paths are split on '/', the root node is the path '/'.
+	@staticmethod
+	def _path_elements(path):
+		return [e for e in path.split('/') if e]
+
+	def _tree_add(self, path, item):
+		node = self._pathtree
+		for e in self._path_elements(path):
+			child = node.children.get(e)
+			if child is None:
+				child = node.children[e] = PathTreeNode()
+			node = child
+		node.item = item
+
+	# Removes the item at path, and returns the paths of the nodes that became empty (no item
+	# and no children) and were pruned from the tree, deepest first.
+	def _tree_remove(self, path):
+		elements = self._path_elements(path)
+		nodes = [self._pathtree]
+		for e in elements:
+			node = nodes[-1].children.get(e)
+			if node is None:
+				return []
+			nodes.append(node)
+		nodes[-1].item = None
+		pruned = []
+		for i in range(len(elements), 0, -1):
+			node = nodes[i]
+			if node.item is not None or node.children:
+				break
+			del nodes[i - 1].children[elements[i - 1]]
+			if i < len(elements):
+				pruned.append('/' + '/'.join(elements[:i]))
+		return pruned
+
+	# Generates (relative path, item) for every item below path, not including path itself
+	def _tree_items(self, path):
+		node = self._pathtree
+		for e in self._path_elements(path):
+			node = node.children.get(e)
+			if node is None:
+				return
+		stack = [(node, '')]
+		while stack:
+			node, prefix = stack.pop()
+			for e, child in node.children.items():
+				p = prefix + e
+				if child.item is not None:
+					yield p, child.item
+				if child.children:
+					stack.append((child, p + '/'))
 
 	def __getitem__(self, path):
 		return self._dbusobjects[path].local_get_value()
@@ -218,10 +332,13 @@ class ServiceContext(object):
 
 	def del_tree(self, root):
 		root = root.rstrip('/')
-		for p in list(self.parent._dbusobjects.keys()):
-			if p == root or p.startswith(root + '/'):
-				self[p] = None
-				self.parent._dbusobjects[p].__del__()
+		paths = [root + '/' + p for p, _ in self.parent._tree_items(root)]
+		if root in self.parent._dbusobjects:
+			paths.append(root)
+		# the objects are invalidated, then all removed together
+		for p in paths:
+			self[p] = None
+		self.parent.del_tree(root)
 
 	def get_name(self):
 		return self.parent.get_name()
@@ -447,13 +564,9 @@ class VeDbusTreeExport(dbus.service.Object):
 	def _get_value_handler(self, path, get_text=False):
 		logging.debug("_get_value_handler called for %s" % path)
 		r = {}
-		px = path
-		if not px.endswith('/'):
-			px += '/'
-		for p, item in self._service._dbusobjects.items():
-			if p.startswith(px):
-				v = item.GetText() if get_text else wrap_dbus_value(item.local_get_value())
-				r[p[len(px):]] = v
+		for p, item in self._service._tree_items(path):
+			v = item.GetText() if get_text else wrap_dbus_value(item.local_get_value())
+			r[p] = v
 		logging.debug(r)
 		return r
 